@@ -32,11 +32,12 @@ import os
 
 
 from flask_mail import Mail
-from flask_sqlalchemy import SQLAlchemy
 from flask_security import Security
 from flask_oauthlib.provider import OAuth2Provider
 
 
+from . import cache
+from . import replicas
 from . import responses
 
 
@@ -63,7 +64,8 @@ logger = logging.getLogger(__name__)
 """Setup Database.
 
 Initializes the object relational mapper (ORM) that allows the application to
-communicate directly with the database.
+communicate directly with the database. Reads of read only requests are
+routed to the replicas listed in `SQLALCHEMY_REPLICA_URIS`, if any.
 
 :param object db:
     The instantiated SQLAlchemy instance
@@ -71,7 +73,7 @@ communicate directly with the database.
 See the official SQLAlchemy documentation for more information
 http://docs.sqlalchemy.org/en/latest/
 """
-db = SQLAlchemy()
+db = replicas.RoutingSQLAlchemy()
 
 
 """OAuth Authorization.
@@ -93,6 +95,15 @@ No official documentation yet exists.
 responses = responses.Responses()
 
 
+"""Data Endpoint Response Cache.
+
+Initializes the in-process cache that allows data endpoints to answer
+repeated GET requests without querying the database. Collections opt in
+through the `cache` endpoint option.
+"""
+cache = cache.ResponseCache()
+
+
 def create_application(environment='production'):
     """Production Application Runner."""
     from . import application
@@ -18,6 +18,7 @@ under the License.
 
 import io
 import json
+import sys
 
 
 from datetime import datetime
@@ -29,15 +30,35 @@ from flask_restless import APIManager
 from flask_security.signals import user_registered
 
 
+from . import cache
+from . import compression
+from . import conditional
 from . import db
+from . import encoder
+from . import events
 from . import flask
+from . import governor
+from . import hooks
 from . import imp
+from . import includes
 from . import logger
 from . import logging
 from . import Mail
+from . import metrics
 from . import oauth
 from . import os
+from . import pagination
+from . import profiler
+from . import replicas
+from . import scope
 from . import Security
+from . import serializers
+from . import slowlog
+from . import updates
+from . import upgrade
+
+
+from .endpoint import Endpoint
 
 
 CORE_MODULES = [
@@ -95,12 +116,64 @@ class Application(object):
         logger.info('Application loading configuration from %s', config_)
         self.app.config.from_json(config_)
 
+        """Record request metrics, when enabled, before any other hook runs
+        """
+        metrics.init_app(self.app)
+
+        """Encode every JSON response (i.e., responses, module views, and
+        Flask Restless) with the fastest encoder installed, unless the
+        configuration sets `JSON_ACCELERATED` to false
+        """
+        self.app.json_encoder = encoder.select_encoder(
+            self.app.config.get('JSON_ACCELERATED', True))
+
+        """Setup response compression, Flask runs `after_request` hooks in
+        reverse order, registering it first compresses the final response
+        """
+        self.app.after_request(compression.compress_response)
+
+        """Serve precompressed static model definitions
+        """
+        self.app.before_request(compression.serve_precompressed)
+
         """Setup Cross Site Origin header rules
         """
         self.app.after_request(self.setup_default_cors)
 
+        """Setup entity tags for conditional data endpoint requests
+        """
+        self.app.after_request(conditional.apply_etag)
+
+        """Store data endpoint responses that missed the response cache
+        """
+        self.app.after_request(cache.store_response)
+
+        """Profile the SQL statements of every request, when enabled
+        """
+        profiler.init_app(self.app)
+
+        """Record slow SQL statements, when enabled
+        """
+        slowlog.init_app(self.app)
+
         self.manager = APIManager(self.app, flask_sqlalchemy_db=db)
 
+        """Allow data endpoints to approximate their pagination totals
+        """
+        pagination.install()
+
+        """Allow data endpoints to eager load the relationships they include
+        """
+        includes.install()
+
+        """Restrict data endpoints to the rows that have not been deleted
+        """
+        scope.install()
+
+        """Serialize data endpoint rows with compiled serializers
+        """
+        serializers.install()
+
         """Load system extensions
         """
         self.load_extensions()
@@ -228,12 +301,23 @@ class Application(object):
         db.app = self.app
         db.init_app(self.app)
 
+        """Setup the read replicas, if any are configured
+        """
+        replicas.init_app(self.app)
+
+        """Publish and listen for change events, when enabled
+        """
+        events.init_app(self.app)
+
         """Create all database tables
 
-        Create all of the database tables defined with the modules.
+        Create all of the database tables defined with the modules. Tables
+        that already exist are upgraded with the `flask upgrade` command.
         """
         db.create_all()
 
+        self.app.cli.add_command(upgrade.upgrade_command)
+
     def assign_default_user_role(self, app, db, user_datastore, role):
         r"""Ensure that users are assigned the app-defined role by default.
 
@@ -276,12 +360,12 @@ class Application(object):
 
             if hasattr(Module, 'Model'):
 
-                module_arguments = Module.endpoints.Seed().__arguments__
+                module_seed = Module.endpoints.Seed()
 
-                with self.app.app_context():
-                    self.manager.create_api(Module.Model, **module_arguments)
-                    logger.info('`%s` module endpoints loaded' %
-                                (Module.__name__))
+                self.create_endpoint(Module.Model, module_seed.__arguments__,
+                                     module_seed.__options__)
+                logger.info('`%s` module endpoints loaded' %
+                            (Module.__name__))
             else:
                 logger.error('`%s` module has endpoints, but is missing '
                              'Model' % (Module.__name__))
@@ -290,12 +374,13 @@ class Application(object):
 
             if hasattr(Module, 'Model'):
 
-                module_arguments = Module.__arguments__
+                module_options = getattr(Module, '__options__',
+                                         Endpoint.__options__)
 
-                with self.app.app_context():
-                    self.manager.create_api(Module.Model, **module_arguments)
-                    logger.info('`%s` module endpoints loaded' %
-                                (Module.__name__))
+                self.create_endpoint(Module.Model, Module.__arguments__,
+                                     module_options)
+                logger.info('`%s` module endpoints loaded' %
+                            (Module.__name__))
             else:
                 logger.error('`%s` module has endpoints, but is missing '
                              'Model' % (Module.__name__))
@@ -303,6 +388,140 @@ class Application(object):
             logger.info('`%s` module did not contain any endpoints.' %
                         (Module.__name__))
 
+    def create_endpoint(self, Model, arguments, options):
+        r"""Create a single Flask Restless endpoint.
+
+        Copy the module arguments so that the module definition is never
+        altered, wrap them with the endpoint layers enabled by the module
+        options, and register the resulting endpoint with Flask Restless.
+
+        :param object self: The Application class
+        :param object Model: The SQLAlchemy model served by the endpoint
+        :param dict arguments: The module Flask Restless arguments
+        :param dict options: The module endpoint options
+        """
+        options_ = dict(Endpoint.__options__, **options)
+        collection_ = arguments.get('collection_name', Model.__tablename__)
+
+        """Register the collection so that other system endpoints (e.g.,
+        aggregation) can find its model and authorize requests with the
+        module preprocessors.
+        """
+        self.app.extensions.setdefault('collections', {})[collection_] = {
+            'model': Model,
+            'arguments': arguments,
+            'options': options_
+        }
+
+        arguments_ = dict(arguments)
+        for group_ in ['preprocessors', 'postprocessors']:
+            arguments_[group_] = dict([
+                (method_, list(processors_)) for method_, processors_ in
+                arguments.get(group_, {}).items()
+            ])
+
+        """The query governor inspects searches right after authorization and
+        before any other layer queries the database.
+        """
+        governor_ = options_.get('query_governor')
+        if governor_:
+            self.extend_processors(arguments_['preprocessors'],
+                                   governor.preprocessors(Model, **governor_))
+
+        """The live row scope is selected before any layer lists rows, so
+        that entity tags and cached responses describe the scoped rows.
+        """
+        if options_.get('live_scope'):
+            self.extend_processors(arguments_['preprocessors'],
+                                   scope.preprocessors(Model))
+
+        """Conditional requests run after the module preprocessors so that
+        authorization is always enforced before a 304 is returned. Endpoints
+        approximating their totals only count their entity tags up to the
+        same cap.
+        """
+        if options_.get('conditional_requests'):
+            approximate_ = options_.get('approximate_count')
+            cap_ = approximate_.get('cap', pagination.CAP) \
+                if approximate_ else None
+            self.extend_processors(arguments_['preprocessors'],
+                                   conditional.preprocessors(Model, cap_))
+
+        """The response cache is consulted last, a cached response is only
+        served once authorization and conditional requests have been handled.
+        """
+        if options_.get('cache'):
+            cache.register(Model, collection_, **options_['cache'])
+
+            self.extend_processors(arguments_['preprocessors'],
+                                   cache.preprocessors(collection_))
+
+        """Relationship includes are resolved once the request has been
+        authorized, and excluded relationships are removed from the result
+        before any other postprocessor sees it.
+        """
+        if options_.get('includes'):
+            preprocessors_, postprocessors_ = \
+                includes.processors(Model, arguments_,
+                                    **options_['includes'])
+
+            self.extend_processors(arguments_['preprocessors'],
+                                   preprocessors_)
+            for method_, processors_ in postprocessors_.items():
+                arguments_['postprocessors'].setdefault(method_, [])
+                arguments_['postprocessors'][method_][:0] = processors_
+
+        """Approximate totals are requested by a GET_MANY preprocessor and
+        flagged on the response by a GET_MANY postprocessor.
+        """
+        if options_.get('approximate_count'):
+            preprocessors_, postprocessors_ = \
+                pagination.processors(Model, **options_['approximate_count'])
+
+            self.extend_processors(arguments_['preprocessors'],
+                                   preprocessors_)
+            self.extend_processors(arguments_['postprocessors'],
+                                   postprocessors_)
+
+        """Diffed updates run after every other preprocessor, so that fields
+        stamped by the module hooks are compared with the stored values too.
+        """
+        if options_.get('diff_updates'):
+            self.extend_processors(arguments_['preprocessors'],
+                                   updates.preprocessors(Model))
+
+        """Hooks that only log are left out of the chain and the remaining
+        hooks report their execution time.
+        """
+        if options_.get('compile_hooks'):
+            for group_ in ['preprocessors', 'postprocessors']:
+                arguments_[group_] = \
+                    hooks.compile_processors(arguments_[group_])
+
+        with self.app.app_context():
+            blueprint_ = self.manager.create_api_blueprint(Model, app=self.app,
+                                                           **arguments_)
+
+            if governor_:
+                blueprint_.before_request(governor.statement_timeout(
+                    governor_.get('statement_timeout')))
+
+            self.app.register_blueprint(blueprint_)
+
+        self.app.extensions.setdefault('blueprints', {})[blueprint_.name] = \
+            collection_
+
+    def extend_processors(self, processors, additional):
+        r"""Append processors to a Flask Restless processor dictionary.
+
+        :param object self: The Application class
+        :param dict processors: The processors keyed by method to extend
+        :param dict additional: The processors keyed by method to append
+        """
+        for method_, processors_ in additional.items():
+            processors.setdefault(method_, [])
+            processors[method_].extend(processors_)
+
     def load_architecture(self, Module):
         r"""Load the architecture for a single module.
 
@@ -330,6 +549,8 @@ class Application(object):
                 data_ = json.dumps(filedata_, ensure_ascii=False, indent=4)
                 file_.write(str(data_))
 
+            compression.precompress(filepath_)
+
             return filedata_
 
         else:
@@ -364,7 +585,15 @@ class Application(object):
                module_name not in SYSTEM_FILES:
 
                 """Locate and load the module into our module_list
+
+                Forget the module loaded for a previous application, so that
+                its views are routed on the Blueprint created for this one.
                 """
+                for name_ in [name_ for name_ in sys.modules
+                              if name_ == module_name or
+                              name_.startswith(module_name + '.')]:
+                    del sys.modules[name_]
+
                 try:
                     f, filename, descr = imp.find_module(module_name,
                                                          [modules_path])
@@ -433,6 +662,8 @@ class Application(object):
             with io.open(filepath_, "w", encoding="utf-8") as file_:
                 data_ = json.dumps(filedata_, ensure_ascii=False, indent=4)
                 file_.write(str(data_))
+
+            compression.precompress(filepath_)
         except FileNotFoundError:
             print("Please create a `static/models` folder.")
         except Exception:
@@ -0,0 +1,270 @@
+"""Arithmetic Data Endpoint Response Cache.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+import threading
+import time
+
+
+from collections import OrderedDict
+
+
+from flask import abort
+from flask import current_app
+from flask import g
+from flask import request
+from sqlalchemy import event
+from sqlalchemy import inspect
+from sqlalchemy.orm import object_session
+from sqlalchemy.orm import Session
+
+
+"""Response headers retained alongside a cached response body."""
+CACHED_HEADERS = [
+    'Content-Type',
+    'Link',
+    'Location',
+]
+
+
+"""Mapper events that invalidate every collection depending on a model."""
+INVALIDATING_EVENTS = [
+    'after_insert',
+    'after_update',
+    'after_delete',
+]
+
+
+class ResponseCache(object):
+    """Cache serialized Flask Restless GET responses in process memory.
+
+    Responses are keyed by collection, request path, normalized query string
+    and the permission class (i.e., the sorted role names) of the principal
+    making the request. Each collection keeps its own least recently used
+    store with a time to live and a maximum size.
+
+    Writes to a model, or to any model it serializes as a relationship,
+    invalidate the collection when the change is flushed and again once it is
+    committed. Invalidation is local to the worker process, the time to live
+    bounds how long other workers may serve a stale response.
+
+    Requests setting `g.cache_bypass` (e.g., the sub-requests of an atomic
+    batch, which read rows that may yet be rolled back) neither read nor
+    store cached responses.
+    """
+
+    def __init__(self):
+        """Initialize top level variables."""
+        self.lock = threading.Lock()
+        self.stores = {}
+        self.settings = {}
+        self.dependencies = {}
+
+    def __repr__(self):
+        """Display of ResponseCache when inspected."""
+        return '<ResponseCache %d collections>' % (len(self.stores))
+
+    def register(self, Model, collection, ttl=30, max_size=256):
+        """Enable caching for a collection.
+
+        :param object Model: The SQLAlchemy model served by the collection
+        :param string collection: The Flask Restless collection name
+        :param int ttl: Seconds a cached response remains valid
+        :param int max_size: Maximum number of responses kept for collection
+        """
+        with self.lock:
+            self.stores[collection] = OrderedDict()
+            self.settings[collection] = {
+                'ttl': ttl,
+                'max_size': max_size
+            }
+
+        models_ = [Model] + [relationship_.mapper.class_ for relationship_
+                             in inspect(Model).relationships]
+
+        for model_ in models_:
+            self.dependencies.setdefault(model_, set()).add(collection)
+
+            for event_ in INVALIDATING_EVENTS:
+                if not event.contains(model_, event_, self.invalidate_model):
+                    event.listen(model_, event_, self.invalidate_model)
+
+        commit_ = (Session, 'after_commit', self.invalidate_session)
+        if not event.contains(*commit_):
+            event.listen(*commit_)
+
+    def invalidate(self, collection):
+        """Remove every cached response for a collection.
+
+        :param string collection: The Flask Restless collection name
+        """
+        with self.lock:
+            if collection in self.stores:
+                self.stores[collection].clear()
+
+    def invalidate_model(self, mapper, connection, target):
+        """Invalidate the collections depending on a flushed model instance.
+
+        :param object mapper: The SQLAlchemy mapper of the changed instance
+        :param object connection: The connection used by the flush
+        :param object target: The changed model instance
+        """
+        collections_ = self.dependencies.get(mapper.class_, set())
+
+        for collection_ in collections_:
+            self.invalidate(collection_)
+
+        session_ = object_session(target)
+        if session_ is not None:
+            session_.info.setdefault('cache_collections', set()).\
+                update(collections_)
+
+    def invalidate_session(self, session):
+        """Invalidate collections changed by a session once it commits.
+
+        :param object session: The SQLAlchemy session that was committed
+        """
+        for collection_ in session.info.pop('cache_collections', set()):
+            self.invalidate(collection_)
+
+    def principal(self):
+        """Describe the permission class of the current request principal.
+
+        :return string: Sorted role names, or `anonymous`
+        """
+        oauth_ = getattr(request, 'oauth', None)
+        user_ = getattr(oauth_, 'user', None)
+
+        if user_ is None:
+            return 'anonymous'
+
+        return ','.join(sorted([role_.name for role_ in user_.roles]))
+
+    def key(self):
+        """Create the cache key of the current request.
+
+        :return tuple: The path, normalized query string, and principal
+        """
+        from .conditional import normalized_arguments
+
+        return (request.path, normalized_arguments(), self.principal())
+
+    def get(self, collection, key):
+        """Retrieve a cached response.
+
+        :param string collection: The Flask Restless collection name
+        :param tuple key: The cache key of the request
+
+        :return tuple: The cached body and headers, or None
+        """
+        with self.lock:
+            store_ = self.stores.get(collection)
+            if store_ is None or key not in store_:
+                return None
+
+            expires_, data_, headers_ = store_[key]
+            if expires_ < time.monotonic():
+                del store_[key]
+                return None
+
+            store_.move_to_end(key)
+            return data_, headers_
+
+    def set(self, collection, key, data, headers):
+        """Store a response, evicting the least recently used when full.
+
+        :param string collection: The Flask Restless collection name
+        :param tuple key: The cache key of the request
+        :param bytes data: The serialized response body
+        :param list headers: The response headers to replay
+        """
+        with self.lock:
+            store_ = self.stores.get(collection)
+            if store_ is None:
+                return
+
+            settings_ = self.settings[collection]
+            store_[key] = (time.monotonic() + settings_['ttl'], data, headers)
+            store_.move_to_end(key)
+
+            while len(store_) > settings_['max_size']:
+                store_.popitem(last=False)
+
+    def preprocessors(self, collection):
+        """Create the cache lookup preprocessors for a collection.
+
+        :param string collection: The Flask Restless collection name
+
+        :return dict: Flask Restless preprocessors keyed by method
+        """
+        from . import logger
+
+        def lookup():
+            if getattr(g, 'cache_bypass', False):
+                return
+
+            key_ = self.key()
+            cached_ = self.get(collection, key_)
+
+            if cached_ is None:
+                g.data_cache = (collection, key_)
+                return
+
+            logger.info('`%s` response served from cache' % (collection))
+
+            data_, headers_ = cached_
+            abort(current_app.response_class(data_, status=200,
+                                             headers=headers_))
+
+        def cache_preprocessor_get_single(instance_id=None, **kw):
+            """Create a cache GET_SINGLE preprocessor.
+
+            Accepts a single argument, `instance_id`, the primary key of the
+            instance of the model to get.
+            """
+            lookup()
+
+        def cache_preprocessor_get_many(search_params=None, **kw):
+            """Create a cache GET_MANY preprocessor.
+
+            Accepts a single argument, `search_params`, which is a dictionary
+            containing the search parameters for the request.
+            """
+            lookup()
+
+        return {
+            'GET_SINGLE': [cache_preprocessor_get_single],
+            'GET_MANY': [cache_preprocessor_get_many]
+        }
+
+    def store_response(self, response):
+        """Store the response of a request that missed the cache.
+
+        :param object response: The response about to be returned
+
+        :return object response: The unaltered response
+        """
+        pending_ = getattr(g, 'data_cache', None)
+
+        if pending_ and response.status_code == 200 and \
+                not response.is_streamed:
+            collection_, key_ = pending_
+            headers_ = [(name_, response.headers[name_]) for name_ in
+                        CACHED_HEADERS if name_ in response.headers]
+            self.set(collection_, key_, response.get_data(), headers_)
+
+        return response
@@ -0,0 +1,202 @@
+"""Arithmetic Response Compression.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+import gzip
+import io
+import os
+
+
+from flask import current_app
+from flask import request
+from flask import safe_join
+from flask import send_file
+
+
+from . import logger
+
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+"""Responses smaller than this many bytes are sent uncompressed, the
+encoding overhead outweighs the savings."""
+MINIMUM_SIZE = 1024
+
+
+"""Compression level used for responses, static files use the maximum."""
+COMPRESSION_LEVEL = 6
+
+
+"""Mimetypes worth compressing."""
+COMPRESSIBLE_MIMETYPES = [
+    'application/javascript',
+    'application/json',
+    'text/css',
+    'text/csv',
+    'text/html',
+    'text/plain',
+]
+
+
+"""File extensions of the precompressed variants, keyed by encoding."""
+EXTENSIONS = {
+    'br': '.br',
+    'gzip': '.gz',
+}
+
+
+def available_encodings():
+    """List the encodings the server supports, in order of preference.
+
+    :return list: The names of the `Content-Encoding` values
+    """
+    if brotli is not None:
+        return ['br', 'gzip']
+
+    return ['gzip']
+
+
+def negotiate(encodings=None):
+    """Select the encoding best matching the `Accept-Encoding` header.
+
+    :param list encodings: The encodings to choose from, defaults to every
+        available encoding
+
+    :return string: The selected encoding, or None for the identity encoding
+    """
+    encodings = encodings or available_encodings()
+
+    return request.accept_encodings.best_match(encodings)
+
+
+def compress(data, encoding, level=COMPRESSION_LEVEL):
+    """Compress data with an encoding.
+
+    The gzip modification time is fixed, so that equal data always produces
+    equal bytes.
+
+    :param bytes data: The data to compress
+    :param string encoding: The `Content-Encoding` to use
+    :param int level: The compression level, from 1 to 9
+
+    :return bytes: The compressed data
+    """
+    if encoding == 'br':
+        return brotli.compress(data, quality=min(11, level + 2))
+
+    buffer_ = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer_, mode='wb', compresslevel=level,
+                       mtime=0) as file_:
+        file_.write(data)
+
+    return buffer_.getvalue()
+
+
+def compress_response(response):
+    """Compress a response the client accepts compressed.
+
+    Registered as a Flask `after_request` hook running after every other
+    hook, so that the response cache stores and entity tags describe the
+    uncompressed body.
+
+    :param object response: The Flask response
+
+    :return object: The Flask response
+    """
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    if response.status_code < 200 or response.status_code in [204, 304] or \
+            response.direct_passthrough or response.is_streamed or \
+            'Content-Encoding' in response.headers:
+        return response
+
+    data_ = response.get_data()
+    if len(data_) < MINIMUM_SIZE:
+        return response
+
+    encoding_ = negotiate()
+    if encoding_ is None:
+        return response
+
+    response.set_data(compress(data_, encoding_))
+    response.headers['Content-Encoding'] = encoding_
+
+    """A compressed body is no longer byte for byte equal to the
+    uncompressed one, only weak entity tags still hold."""
+    etag_, weak_ = response.get_etag()
+    if etag_ and not weak_:
+        response.set_etag(etag_, weak=True)
+
+    return response
+
+
+def precompress(filepath):
+    """Write a compressed variant of a static file for every encoding.
+
+    :param string filepath: The path of the static file
+    """
+    with io.open(filepath, 'rb') as file_:
+        data_ = file_.read()
+
+    for encoding_ in available_encodings():
+        with io.open(filepath + EXTENSIONS[encoding_], 'wb') as file_:
+            file_.write(compress(data_, encoding_, level=9))
+
+    logger.debug('Precompressed `%s`' % (filepath))
+
+
+def serve_precompressed():
+    """Serve the precompressed variant of a static model definition.
+
+    Registered as a Flask `before_request` hook, requests for anything
+    other than `static/models/*.json` continue to the static file view.
+
+    :return object: The Flask response, or None to continue the request
+    """
+    filename_ = (request.view_args or {}).get('filename', '')
+
+    if request.endpoint != 'static' or \
+            not filename_.startswith('models/') or \
+            not filename_.endswith('.json'):
+        return None
+
+    filepath_ = safe_join(current_app.static_folder, filename_)
+    if not os.path.isfile(filepath_):
+        return None
+
+    variants_ = [encoding_ for encoding_ in available_encodings()
+                 if os.path.isfile(filepath_ + EXTENSIONS[encoding_]) and
+                 os.path.getmtime(filepath_ + EXTENSIONS[encoding_]) >=
+                 os.path.getmtime(filepath_)]
+
+    encoding_ = negotiate(variants_) if variants_ else None
+    if encoding_ is None:
+        return None
+
+    response_ = send_file(filepath_ + EXTENSIONS[encoding_],
+                          mimetype='application/json', conditional=True)
+    response_.headers['Content-Encoding'] = encoding_
+    response_.vary.add('Accept-Encoding')
+
+    return response_
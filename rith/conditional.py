@@ -0,0 +1,206 @@
+"""Arithmetic Conditional Request Handling.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+import hashlib
+
+
+from flask import abort
+from flask import g
+from flask import request
+from flask_restless.search import create_query
+from sqlalchemy import func
+from sqlalchemy import select
+
+
+from . import db
+from . import logger
+from . import responses
+
+
+"""Query string arguments that never change the representation.
+
+The `access_token` may be supplied in the query string by clients that cannot
+set an `Authorization` header, it has no bearing on the payload returned.
+"""
+IGNORED_ARGUMENTS = [
+    'access_token',
+    'callback',
+]
+
+
+def normalized_arguments():
+    """Create a stable representation of the request query string.
+
+    :return string: Sorted `key=value` pairs joined by an ampersand
+    """
+    pairs_ = []
+
+    for key_, values_ in sorted(request.args.lists()):
+        if key_ in IGNORED_ARGUMENTS:
+            continue
+        for value_ in sorted(values_):
+            pairs_.append('%s=%s' % (key_, value_))
+
+    return '&'.join(pairs_)
+
+
+def weak_etag(*parts):
+    """Create an opaque weak entity tag value from a list of parts.
+
+    :param list parts: Values that together identify a representation
+
+    :return string: The unquoted entity tag value
+    """
+    fingerprint_ = '|'.join([str(part_) for part_ in parts])
+
+    return hashlib.sha256(fingerprint_.encode('utf-8')).hexdigest()[:32]
+
+
+def single_etag(Model, instance_id):
+    """Derive the entity tag of a single resource.
+
+    The tag is built from the `id` and `modified_on` of the requested row,
+    which only requires a primary key lookup of a single column.
+
+    :param object Model: The SQLAlchemy model being requested
+    :param int instance_id: The primary key of the requested instance
+
+    :return string: The entity tag, or None if the row does not exist
+    """
+    modified_on = db.session.query(Model.modified_on).\
+        filter(Model.id == instance_id).first()
+
+    if modified_on is None:
+        return None
+
+    return weak_etag(Model.__tablename__, instance_id, modified_on[0],
+                     normalized_arguments())
+
+
+def collection_etag(Model, search_params, cap=None):
+    """Derive the entity tag of a collection page.
+
+    The tag is built from the most recent `modified_on` and the number of rows
+    matching the search parameters, plus the query string so that each page
+    and each filter receives its own tag.
+
+    When a `cap` is given the rows are only counted up to the cap, so that
+    endpoints approximating their totals never count the full collection.
+    Beyond the cap the tag relies on `modified_on` alone, a hard delete of an
+    older row is then only noticed once another row changes.
+
+    :param object Model: The SQLAlchemy model being requested
+    :param dict search_params: The Flask Restless search parameters
+    :param int cap: The largest number of rows that will be counted
+
+    :return string: The entity tag, or None if the search is invalid
+    """
+    try:
+        query_ = create_query(db.session, Model, search_params or {},
+                              _ignore_order_by=True)
+    except Exception:
+        logger.debug('`collection_etag` skipped an invalid search')
+        return None
+
+    if cap is None:
+        latest_, count_ = query_.from_self(func.max(Model.modified_on),
+                                           func.count(Model.id)).one()
+    else:
+        rows_ = query_.with_entities(Model.id).limit(cap + 1).subquery()
+
+        latest_, count_ = db.session.query(
+            query_.with_entities(func.max(Model.modified_on)).as_scalar(),
+            select([func.count()]).select_from(rows_).as_scalar()).one()
+
+    return weak_etag(Model.__tablename__, latest_, count_,
+                     normalized_arguments())
+
+
+def not_modified(etag):
+    """Respond with a 304 when the client already holds the representation.
+
+    :param string etag: The entity tag of the current representation
+    """
+    g.data_etag = etag
+
+    if request.if_none_match.contains_weak(etag):
+        logger.info('Conditional request matched entity tag %s' % (etag))
+
+        response_ = responses.status_304()
+        response_.status_code = 304
+        response_.set_etag(etag, weak=True)
+
+        abort(response_)
+
+
+def preprocessors(Model, cap=None):
+    """Create the conditional request preprocessors for a model.
+
+    Conditional requests are only available for models that track their
+    `modified_on` timestamp (e.g., those extending `BaseMixin`).
+
+    :param object Model: The SQLAlchemy model being requested
+    :param int cap: Collection tags count rows up to this number only
+
+    :return dict: Flask Restless preprocessors keyed by method
+    """
+    if not hasattr(Model, 'modified_on'):
+        return {}
+
+    def conditional_preprocessor_get_single(instance_id=None, **kw):
+        """Create a conditional GET_SINGLE preprocessor.
+
+        Accepts a single argument, `instance_id`, the primary key of the
+        instance of the model to get.
+        """
+        etag_ = single_etag(Model, instance_id)
+
+        if etag_:
+            not_modified(etag_)
+
+    def conditional_preprocessor_get_many(search_params=None, **kw):
+        """Create a conditional GET_MANY preprocessor.
+
+        Accepts a single argument, `search_params`, which is a dictionary
+        containing the search parameters for the request.
+        """
+        etag_ = collection_etag(Model, search_params, cap)
+
+        if etag_:
+            not_modified(etag_)
+
+    return {
+        'GET_SINGLE': [conditional_preprocessor_get_single],
+        'GET_MANY': [conditional_preprocessor_get_many]
+    }
+
+
+def apply_etag(response):
+    """Attach the entity tag computed during the request to the response.
+
+    :param object response: The response about to be returned
+
+    :return object response: The response with validators attached
+    """
+    etag_ = getattr(g, 'data_etag', None)
+
+    if etag_ and response.status_code in [200, 304]:
+        response.set_etag(etag_, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+
+    return response
@@ -0,0 +1,100 @@
+"""Arithmetic JSON Encoder.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+import uuid
+
+
+from datetime import date
+from datetime import time
+
+
+from flask import json
+
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class JSONEncoder(json.JSONEncoder):
+    """Encode JSON with the standard library.
+
+    Dates and times are encoded in ISO 8601, the format Flask Restless uses
+    for model columns, so that every endpoint describes a row the same way.
+    """
+
+    def default(self, o):
+        """Encode the objects the standard library cannot.
+
+        :param object o: The object to encode
+
+        :return object: A JSON serializable representation of the object
+        """
+        if isinstance(o, (date, time)):
+            return o.isoformat()
+
+        if isinstance(o, uuid.UUID):
+            return str(o)
+
+        return super(JSONEncoder, self).default(o)
+
+
+class AcceleratedJSONEncoder(JSONEncoder):
+    """Encode JSON with `orjson`.
+
+    Falls back to the standard library for output `orjson` cannot produce,
+    such as indentation other than two spaces or integers beyond 64 bits.
+    """
+
+    def encode(self, o):
+        """Encode an object as a JSON string.
+
+        :param object o: The object to encode
+
+        :return string: The JSON document
+        """
+        if self.indent not in [None, 2]:
+            return super(AcceleratedJSONEncoder, self).encode(o)
+
+        option_ = orjson.OPT_NON_STR_KEYS
+
+        if self.indent:
+            option_ |= orjson.OPT_INDENT_2
+
+        if self.sort_keys:
+            option_ |= orjson.OPT_SORT_KEYS
+
+        try:
+            return orjson.dumps(o, default=self.default,
+                                option=option_).decode('utf-8')
+        except TypeError:
+            return super(AcceleratedJSONEncoder, self).encode(o)
+
+
+def select_encoder(accelerated=True):
+    """Select the fastest JSON encoder installed.
+
+    :param bool accelerated: Use `orjson` when it is installed
+
+    :return class: The JSON encoder class
+    """
+    if accelerated and orjson is not None:
+        return AcceleratedJSONEncoder
+
+    return JSONEncoder
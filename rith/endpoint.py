@@ -214,3 +214,50 @@ class Endpoint(object):
         'allow_functions': True,
         'allow_patch_many': False
     }
+
+    """Arithmetic Endpoint Options.
+
+    These options enable the layers the Application wraps around each
+    Flask-Restless endpoint. They are not passed to Flask-Restless. Modules may
+    override any of these defaults by defining their own `__options__`.
+
+    :param bool conditional_requests: Answer `If-None-Match` requests with a
+        304 when the `modified_on` derived entity tag has not changed
+    :param dict cache: Cache GET responses in process memory, accepts `ttl`
+        seconds and `max_size` responses, None disables the cache
+    :param dict approximate_count: Estimate `num_results` beyond `cap` rows
+        from table statistics, or a count bounded by `cap` when filtered,
+        None always counts exactly. The `reltuples` statistic counts every
+        row of the table, ignoring the live scope, so archived and deleted
+        rows are included in the estimate
+    :param dict includes: Eager load the serialized relationships and accept
+        an `include` argument, `default` lists the relationships serialized
+        when `include` is absent, None serializes every relationship
+    :param bool compile_hooks: Leave hooks that only log (or are marked with
+        `rith.hooks.trivial`) out of the chain and time the remaining hooks
+    :param dict query_governor: Limit every statement to `statement_timeout`
+        milliseconds, reject searches planned above `max_cost`, and, when a
+        module opts in with `restrict_columns`, reject searches using fields
+        that are neither indexed nor flagged `is_filterable`/`is_sortable` in
+        the model `__def__`, None disables the governor
+    :param bool live_scope: Leave deleted and archived rows out of GET
+        requests, clients list archived rows with `?scope=archived`
+    :param bool diff_updates: Write only the fields a PATCH_SINGLE or
+        PUT_SINGLE changes, and skip the write entirely when nothing changes
+    """
+    __options__ = {
+        'conditional_requests': True,
+        'cache': None,
+        'approximate_count': None,
+        'includes': {
+            'default': None
+        },
+        'compile_hooks': True,
+        'query_governor': {
+            'statement_timeout': 10000,
+            'restrict_columns': False,
+            'max_cost': None
+        },
+        'live_scope': True,
+        'diff_updates': True
+    }
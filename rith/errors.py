@@ -23,6 +23,7 @@ from . import responses
 from werkzeug.exceptions import BadRequestKeyError
 
 
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.exc import ProgrammingError
 
 
@@ -170,6 +171,17 @@ class ErrorHandlers(object):
 
             return responses.status_500(message), 500
 
+        @app.errorhandler(503)
+        @app.errorhandler(OperationalError)
+        def internal_error(error):
+            logger.error('ErrorHandler Exception %s', error)
+
+            message = self.find_message(error)
+            # if sentry:
+            #     sentry.captureException()
+
+            return responses.status_503(message), 503
+
         @app.errorhandler(TokenExpiredError)
         @app.errorhandler(InsecureTransportError)
         @app.errorhandler(MismatchingStateError)
@@ -0,0 +1,344 @@
+"""Arithmetic Change Events.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+import json
+import os
+import queue
+import select
+import threading
+import time
+
+
+from flask import current_app
+from flask import has_app_context
+from sqlalchemy import create_engine
+from sqlalchemy import event
+from sqlalchemy import inspect
+from sqlalchemy import text
+from sqlalchemy.pool import NullPool
+
+
+from . import logger
+from . import scope
+from .replicas import RoutingSession
+
+
+"""The Postgres channel change events are published on."""
+CHANNEL = 'rith_changes'
+
+
+"""Primary keys per notification, keeping every payload well below the
+8000 byte limit of Postgres."""
+IDS_PER_NOTIFICATION = 500
+
+
+"""Events waiting to be sent to a single client, a client falling further
+behind is asked to resynchronize."""
+QUEUE_SIZE = 100
+
+
+"""Seconds the listener waits for a notification before checking whether
+it still has subscribers."""
+POLL_SECONDS = 5
+
+
+"""Seconds the listener waits before connecting again after an error."""
+RECONNECT_SECONDS = 5
+
+
+"""The event sent to clients that may have missed changes."""
+RESET = {
+    'operation': 'reset'
+}
+
+
+def published_tables():
+    """List the tables of the collections whose changes are published.
+
+    :return set: The names of the tables
+    """
+    if not has_app_context() or \
+            'events' not in current_app.extensions:
+        return set()
+
+    return set([collection_['model'].__tablename__ for collection_ in
+                current_app.extensions.get('collections', {}).values()])
+
+
+def operation(session, instance):
+    """Name the change made to an instance by a flush.
+
+    Rows flagged `has_been_deleted` are reported as deleted.
+
+    :param object session: The SQLAlchemy session
+    :param object instance: The flushed instance
+
+    :return string: The `create`, `update` or `delete` operation
+    """
+    if instance in session.new:
+        return 'create'
+
+    if instance in session.deleted or \
+            (scope.is_scoped(type(instance)) and instance.has_been_deleted):
+        return 'delete'
+
+    return 'update'
+
+
+def collect_changes(session, flush_context):
+    """Record the rows of published tables changed by a flush."""
+    tables_ = published_tables()
+    if not tables_:
+        return
+
+    changes_ = session.info.setdefault('events', {})
+
+    for instance_ in list(session.new) + list(session.dirty) + \
+            list(session.deleted):
+        table_ = getattr(type(instance_), '__tablename__', None)
+
+        if table_ not in tables_ or (instance_ in session.dirty and
+                                     not session.is_modified(instance_)):
+            continue
+
+        key_ = (table_, operation(session, instance_))
+        changes_.setdefault(key_, []).append(instance_)
+
+
+def publish_changes(session, flush_context):
+    """Publish the rows changed by a flush with `NOTIFY`.
+
+    Notifications are sent within the transaction, Postgres delivers them
+    once the transaction commits and discards them when it rolls back.
+    """
+    changes_ = session.info.pop('events', None)
+    if not changes_:
+        return
+
+    connection_ = session.connection()
+    if connection_.dialect.name != 'postgresql':
+        return
+
+    for (table_, operation_), instances_ in changes_.items():
+        ids_ = sorted(set([inspect(instance_).identity[0]
+                           for instance_ in instances_
+                           if inspect(instance_).identity]))
+
+        for index_ in range(0, len(ids_), IDS_PER_NOTIFICATION):
+            connection_.execute(
+                text('SELECT pg_notify(:channel, :payload)'),
+                channel=CHANNEL, payload=json.dumps({
+                    'table': table_,
+                    'operation': operation_,
+                    'ids': ids_[index_:index_ + IDS_PER_NOTIFICATION]
+                }))
+
+
+class Subscription(object):
+    """The events of a set of tables waiting to be sent to a client."""
+
+    def __init__(self, tables):
+        """Create an empty subscription.
+
+        :param list tables: The names of the subscribed tables
+        """
+        self.tables = set(tables)
+        self.events = queue.Queue(QUEUE_SIZE)
+        self.stale = False
+
+    def put(self, event_):
+        """Queue an event, or a reset when the client fell behind."""
+        if self.stale:
+            return
+
+        try:
+            self.events.put_nowait(event_)
+        except queue.Full:
+            self.reset()
+
+    def reset(self):
+        """Replace the queued events with a single reset event."""
+        self.stale = True
+
+        while True:
+            try:
+                self.events.get_nowait()
+            except queue.Empty:
+                break
+
+        try:
+            self.events.put_nowait(RESET)
+        except queue.Full:
+            logger.debug('Subscription already holds a reset event')
+
+
+class Listener(object):
+    """A single `LISTEN` connection per worker, fanning out to clients.
+
+    The connection is opened in a background thread by the first
+    subscription and closed once the last subscription is cancelled.
+    """
+
+    def __init__(self, uri, channel=CHANNEL):
+        """Create a listener without connecting.
+
+        :param string uri: The database the listener connects to
+        :param string channel: The channel listened to
+        """
+        self.uri = uri
+        self.channel = channel
+        self.lock = threading.Lock()
+        self.subscriptions = set()
+        self.thread = None
+        self.pid = None
+
+    def subscribe(self, tables):
+        """Subscribe to the changes of a set of tables.
+
+        :param list tables: The names of the subscribed tables
+
+        :return object: The Subscription
+        """
+        subscription_ = Subscription(tables)
+
+        with self.lock:
+            self.subscriptions.add(subscription_)
+
+            if self.thread is None or not self.thread.is_alive() or \
+                    self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.thread = threading.Thread(target=self.run,
+                                               name='rith-events')
+                self.thread.daemon = True
+                self.thread.start()
+
+        return subscription_
+
+    def unsubscribe(self, subscription):
+        """Cancel a subscription.
+
+        :param object subscription: The Subscription
+        """
+        with self.lock:
+            self.subscriptions.discard(subscription)
+
+    def dispatch(self, payload):
+        """Queue a notification for every subscription to its table.
+
+        :param string payload: The JSON payload of the notification
+        """
+        try:
+            event_ = json.loads(payload)
+        except ValueError:
+            logger.warning('Ignored malformed change event %r' % (payload))
+            return
+
+        with self.lock:
+            subscriptions_ = list(self.subscriptions)
+
+        for subscription_ in subscriptions_:
+            if event_.get('table') in subscription_.tables:
+                subscription_.put(event_)
+
+    def reset(self):
+        """Ask every client to resynchronize, events may have been lost."""
+        with self.lock:
+            subscriptions_ = list(self.subscriptions)
+
+        for subscription_ in subscriptions_:
+            subscription_.reset()
+
+    def is_wanted(self):
+        """Determine whether any subscription is left."""
+        with self.lock:
+            if self.subscriptions:
+                return True
+            self.thread = None
+            return False
+
+    def listen(self):
+        """Deliver notifications until the last subscription is cancelled."""
+        engine_ = create_engine(self.uri, poolclass=NullPool)
+        connection_ = engine_.raw_connection()
+
+        try:
+            connection_.connection.autocommit = True
+            cursor_ = connection_.cursor()
+            cursor_.execute('LISTEN %s' % (self.channel))
+
+            logger.info('Listening for change events on `%s`' %
+                        (self.channel))
+
+            while self.is_wanted():
+                readable_, _, _ = select.select([connection_.connection],
+                                                [], [], POLL_SECONDS)
+                if not readable_:
+                    continue
+
+                connection_.connection.poll()
+                while connection_.connection.notifies:
+                    notify_ = connection_.connection.notifies.pop(0)
+                    self.dispatch(notify_.payload)
+        finally:
+            connection_.close()
+            engine_.dispose()
+
+    def run(self):
+        """Listen, connecting again after errors, while there are clients."""
+        while True:
+            try:
+                self.listen()
+                return
+            except Exception as error:
+                logger.error('Change event listener failed: %s' % (error))
+
+            self.reset()
+            time.sleep(RECONNECT_SECONDS)
+
+            if not self.is_wanted():
+                return
+
+
+def init_app(app):
+    """Publish and listen for change events when `EVENTS_ENABLED` is set.
+
+    The listener connects to `EVENTS_DATABASE_URI`, or to the primary
+    database when it is not set. `LISTEN` does not work through PgBouncer in
+    transaction pooling mode, set `EVENTS_DATABASE_URI` to a direct
+    connection when `SQLALCHEMY_PGBOUNCER` is set.
+
+    :param object app: The Flask application
+    """
+    if not app.config.get('EVENTS_ENABLED', False):
+        return
+
+    uri_ = app.config.get('EVENTS_DATABASE_URI')
+
+    if not uri_ and app.config.get('SQLALCHEMY_PGBOUNCER', False):
+        logger.warning('Change events need `EVENTS_DATABASE_URI` to reach'
+                       ' Postgres directly when `SQLALCHEMY_PGBOUNCER` is'
+                       ' set, change events are disabled')
+        return
+
+    app.extensions['events'] = Listener(
+        uri_ or app.config['SQLALCHEMY_DATABASE_URI'])
+
+    for name_, listener_ in [('after_flush', collect_changes),
+                             ('after_flush_postexec', publish_changes)]:
+        if not event.contains(RoutingSession, name_, listener_):
+            event.listen(RoutingSession, name_, listener_)
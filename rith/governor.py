@@ -0,0 +1,222 @@
+"""Arithmetic Query Governor.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+from flask import abort
+from flask_restless.search import create_query
+from sqlalchemy import inspect
+from sqlalchemy import PrimaryKeyConstraint
+from sqlalchemy import UniqueConstraint
+from sqlalchemy.exc import SQLAlchemyError
+
+
+from . import db
+from . import logger
+
+
+"""Filter operators that compare against a related model."""
+RELATIONSHIP_OPERATORS = [
+    'any',
+    'has',
+]
+
+
+def indexed_columns(Model):
+    """List the columns that lead an index of the model table.
+
+    :param object Model: The SQLAlchemy model being requested
+
+    :return set: The names of the indexed columns
+    """
+    table_ = Model.__table__
+    columns_ = set()
+
+    for index_ in table_.indexes:
+        columns_.add(list(index_.columns)[0].name)
+
+    for constraint_ in table_.constraints:
+        if isinstance(constraint_, (PrimaryKeyConstraint, UniqueConstraint)) \
+                and len(constraint_.columns):
+            columns_.add(list(constraint_.columns)[0].name)
+
+    mapper_ = inspect(Model)
+
+    return set([attribute_.key for attribute_ in mapper_.column_attrs
+                if attribute_.columns[0].name in columns_])
+
+
+def allowed_fields(Model, flag):
+    """Create the allow-list of fields for a model.
+
+    Indexed columns are always allowed, other fields must be flagged in the
+    model `__def__` (e.g., `"is_filterable": True` or `"is_sortable": True`).
+
+    :param object Model: The SQLAlchemy model being requested
+    :param string flag: The `__def__` field flag granting access
+
+    :return set: The names of the allowed fields
+    """
+    fields_ = getattr(Model, '__def__', {}).get('fields', {})
+
+    flagged_ = set([name_ for name_, field_ in fields_.items()
+                    if field_.get(flag)])
+
+    return indexed_columns(Model) | flagged_
+
+
+def filter_fields(filters):
+    """List every field referenced by a list of search filters.
+
+    :param list filters: The Flask Restless search filters
+
+    :return list: The referenced field names
+    """
+    fields_ = []
+
+    for filter_ in filters or []:
+        if not isinstance(filter_, dict):
+            continue
+
+        for junction_ in ['or', 'and']:
+            if junction_ in filter_:
+                fields_.extend(filter_fields(filter_[junction_]))
+
+        name_ = filter_.get('name')
+        if name_ is None:
+            continue
+
+        if filter_.get('op') in RELATIONSHIP_OPERATORS or '__' in name_:
+            fields_.append(name_.split('__')[0])
+        else:
+            fields_.append(name_)
+
+        if filter_.get('field'):
+            fields_.append(filter_['field'])
+
+    return fields_
+
+
+def ordering_fields(search_params):
+    """List every field the search orders or groups by.
+
+    :param dict search_params: The Flask Restless search parameters
+
+    :return list: The referenced field names
+    """
+    fields_ = []
+
+    for key_ in ['order_by', 'group_by']:
+        for ordering_ in search_params.get(key_) or []:
+            if isinstance(ordering_, dict) and ordering_.get('field'):
+                fields_.append(ordering_['field'].split('__')[0])
+
+    return fields_
+
+
+def is_postgresql():
+    """Determine whether the session is bound to PostgreSQL.
+
+    :return bool: True when the database is PostgreSQL
+    """
+    return db.session.get_bind().dialect.name == 'postgresql'
+
+
+def plan_cost(Model, search_params):
+    """Estimate the cost of a search using the query planner.
+
+    :param object Model: The SQLAlchemy model being requested
+    :param dict search_params: The Flask Restless search parameters
+
+    :return float: The total cost of the plan, or None when unavailable
+    """
+    try:
+        query_ = create_query(db.session, Model, search_params)
+    except Exception:
+        logger.debug('`plan_cost` skipped an invalid search')
+        return None
+
+    compiled_ = query_.statement.compile(dialect=db.session.get_bind().dialect)
+
+    try:
+        with db.session.begin_nested():
+            plan_ = db.session.connection().execute(
+                'EXPLAIN (FORMAT JSON) %s' % (compiled_), compiled_.params
+            ).scalar()
+    except SQLAlchemyError as error:
+        logger.warning('`plan_cost` could not explain search: %s' % (error))
+        return None
+
+    return plan_[0]['Plan']['Total Cost']
+
+
+def statement_timeout(milliseconds):
+    """Create a request hook limiting the duration of every statement.
+
+    :param int milliseconds: The longest a single statement may run
+
+    :return function: A Flask `before_request` hook
+    """
+    def governor_statement_timeout():
+        if milliseconds and is_postgresql():
+            db.session.execute('SET LOCAL statement_timeout = %d' %
+                               (int(milliseconds)))
+
+    return governor_statement_timeout
+
+
+def preprocessors(Model, restrict_columns=False, max_cost=None, **kw):
+    """Create the query governor preprocessors for a model.
+
+    :param object Model: The SQLAlchemy model being requested
+    :param bool restrict_columns: Reject searches that filter, order or group
+        by fields outside of the allow-list
+    :param float max_cost: Reject searches whose planner cost is higher
+
+    :return dict: Flask Restless preprocessors keyed by method
+    """
+    filterable_ = allowed_fields(Model, 'is_filterable')
+    sortable_ = allowed_fields(Model, 'is_sortable')
+
+    def governor_preprocessor_search(search_params=None, **kw):
+        """Create a query governor GET_MANY and DELETE_MANY preprocessor.
+
+        Accepts a single argument, `search_params`, which is a dictionary
+        containing the search parameters for the request.
+        """
+        search_params = search_params or {}
+
+        if restrict_columns:
+            for field_ in filter_fields(search_params.get('filters')):
+                if field_ not in filterable_:
+                    abort(400, 'Filtering by `%s` is not allowed' % (field_))
+
+            for field_ in ordering_fields(search_params):
+                if field_ not in sortable_:
+                    abort(400, 'Ordering by `%s` is not allowed' % (field_))
+
+        if max_cost and is_postgresql():
+            cost_ = plan_cost(Model, search_params)
+
+            if cost_ is not None and cost_ > max_cost:
+                logger.warning('Search of `%s` rejected with cost %.0f' %
+                               (Model.__tablename__, cost_))
+                abort(503, 'The search is too expensive, please narrow it')
+
+    return {
+        'GET_MANY': [governor_preprocessor_search],
+        'DELETE_MANY': [governor_preprocessor_search]
+    }
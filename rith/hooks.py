@@ -0,0 +1,163 @@
+"""Arithmetic Endpoint Hook Pipeline.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+import ast
+import functools
+import inspect
+import textwrap
+import threading
+import time
+
+
+from . import logger
+
+
+"""Hooks taking longer than this many seconds are logged as slow."""
+SLOW_HOOK_SECONDS = 0.05
+
+
+"""Execution statistics of every timed hook, keyed by qualified name."""
+statistics_lock = threading.Lock()
+statistics = {}
+
+
+def trivial(function):
+    """Mark a pre or postprocessor as having no effect on the request.
+
+    Trivial hooks are left out of the Flask Restless processor chain.
+
+    :param function function: The pre or postprocessor
+
+    :return function: The marked pre or postprocessor
+    """
+    function.__trivial__ = True
+    return function
+
+
+def trivial_statement(node):
+    """Determine whether a statement has no effect on the request.
+
+    Docstrings, `pass`, and calls to the `logger` have no effect.
+
+    :param object node: The statement of the hook body
+
+    :return bool: True when the statement has no effect
+    """
+    if isinstance(node, ast.Pass):
+        return True
+
+    if not isinstance(node, ast.Expr):
+        return False
+
+    value_ = node.value
+
+    if isinstance(getattr(value_, 's', getattr(value_, 'value', None)), str):
+        return True
+
+    return isinstance(value_, ast.Call) and \
+        isinstance(value_.func, ast.Attribute) and \
+        isinstance(value_.func.value, ast.Name) and \
+        value_.func.value.id == 'logger'
+
+
+def is_trivial(function):
+    """Determine whether a pre or postprocessor can be left out.
+
+    Decorated functions are never trivial, the decorator may do more than
+    the body (e.g., enforce authorization).
+
+    :param function function: The pre or postprocessor
+
+    :return bool: True when marked trivial or only logs
+    """
+    if getattr(function, '__trivial__', False):
+        return True
+
+    try:
+        source_ = textwrap.dedent(inspect.getsource(function))
+        definition_ = ast.parse(source_).body[0]
+    except (IndentationError, OSError, SyntaxError, TypeError):
+        return False
+
+    if not isinstance(definition_, ast.FunctionDef) or \
+            definition_.decorator_list:
+        return False
+
+    return all([trivial_statement(node_) for node_ in definition_.body])
+
+
+def timed(function):
+    """Record the execution time of a pre or postprocessor.
+
+    :param function function: The pre or postprocessor
+
+    :return function: The timed pre or postprocessor
+    """
+    name_ = '%s.%s' % (function.__module__, function.__qualname__)
+
+    @functools.wraps(function)
+    def timed_hook(*args, **kw):
+        started_ = time.perf_counter()
+        try:
+            return function(*args, **kw)
+        finally:
+            elapsed_ = time.perf_counter() - started_
+
+            with statistics_lock:
+                calls_, total_, slowest_ = statistics.get(name_, (0, 0.0, 0.0))
+                statistics[name_] = (calls_ + 1, total_ + elapsed_,
+                                     max(slowest_, elapsed_))
+
+            if elapsed_ > SLOW_HOOK_SECONDS:
+                logger.warning('Hook `%s` took %.1fms' %
+                               (name_, elapsed_ * 1000))
+
+    return timed_hook
+
+
+def snapshot():
+    """Summarize the execution statistics of every timed hook.
+
+    :return dict: The calls, total, mean and slowest seconds of every hook,
+        keyed by qualified name
+    """
+    with statistics_lock:
+        recorded_ = dict(statistics)
+
+    return dict([(name_, {
+        'calls': calls_,
+        'total_seconds': total_,
+        'mean_seconds': total_ / calls_ if calls_ else 0.0,
+        'slowest_seconds': slowest_
+    }) for name_, (calls_, total_, slowest_) in recorded_.items()])
+
+
+def compile_processors(processors):
+    """Compile a Flask Restless processor dictionary.
+
+    :param dict processors: The processors keyed by method
+
+    :return dict: The non-trivial processors, timed, keyed by method
+    """
+    compiled_ = {}
+
+    for method_, processors_ in processors.items():
+        compiled_[method_] = [timed(processor_) for processor_ in processors_
+                              if not is_trivial(processor_)]
+
+    return compiled_
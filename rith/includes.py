@@ -0,0 +1,202 @@
+"""Arithmetic Relationship Includes and Eager Loading.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+from flask import abort
+from flask import g
+from flask import has_request_context
+from flask import request
+from sqlalchemy import event
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import noload
+from sqlalchemy.orm import Query
+from sqlalchemy.orm import selectinload
+
+
+def available_relationships(Model, arguments):
+    """List the relationships Flask Restless serializes for an endpoint.
+
+    :param object Model: The SQLAlchemy model served by the endpoint
+    :param dict arguments: The Flask Restless arguments of the endpoint
+
+    :return list: The names of the serialized relationships
+    """
+    include_columns_ = arguments.get('include_columns')
+    exclude_columns_ = arguments.get('exclude_columns') or []
+
+    relationships_ = []
+
+    for relationship_ in inspect(Model).relationships:
+        if include_columns_ is not None and \
+                relationship_.key not in include_columns_:
+            continue
+        if relationship_.key in exclude_columns_:
+            continue
+        relationships_.append(relationship_.key)
+
+    return relationships_
+
+
+def loader_options(Model, included):
+    """Create the loader options for a set of included relationships.
+
+    Collections are loaded with a single `SELECT ... IN` per page, scalar
+    relationships are joined to the page query, and relationships that will
+    not be serialized are never loaded.
+
+    :param object Model: The SQLAlchemy model being requested
+    :param list included: The names of the relationships to serialize
+
+    :return list: SQLAlchemy loader options
+    """
+    options_ = []
+
+    for relationship_ in inspect(Model).relationships:
+        if relationship_.lazy == 'dynamic':
+            continue
+
+        attribute_ = getattr(Model, relationship_.key)
+
+        if relationship_.key not in included:
+            options_.append(noload(attribute_))
+        elif relationship_.uselist:
+            options_.append(selectinload(attribute_))
+        else:
+            options_.append(joinedload(attribute_))
+
+    return options_
+
+
+def apply_loader_options(query):
+    """Apply the loader options of the current request to a query.
+
+    Only queries selecting the requested model itself are altered, queries
+    for single columns, aggregates, and subqueries are left untouched.
+
+    :param object query: The SQLAlchemy query about to be compiled
+
+    :return object query: The query with loader options applied
+    """
+    loader_ = getattr(g, 'data_loader', None) if has_request_context() \
+        else None
+
+    if not loader_ or not query._enable_eagerloads:
+        return query
+
+    Model, options_ = loader_
+    descriptions_ = query.column_descriptions
+
+    if len(descriptions_) != 1 or descriptions_[0]['type'] is not Model:
+        return query
+
+    return query.enable_assertions(False).options(*options_)
+
+
+def install():
+    """Listen for queries compiled during data endpoint requests."""
+    listener_ = (Query, 'before_compile', apply_loader_options)
+
+    if not event.contains(*listener_):
+        event.listen(*listener_, retval=True)
+
+
+def processors(Model, arguments, default=None):
+    """Create the relationship include processors for a model.
+
+    Clients name the relationships to serialize in the comma separated
+    `include` argument (e.g., `?include=created_by,last_modified_by`).
+
+    :param object Model: The SQLAlchemy model being requested
+    :param dict arguments: The Flask Restless arguments of the endpoint
+    :param list default: Relationships serialized when `include` is absent,
+        None serializes every relationship
+
+    :return tuple: Flask Restless preprocessors and postprocessors
+    """
+    available_ = available_relationships(Model, arguments)
+
+    def load():
+        include_ = request.args.get('include')
+
+        if include_ is not None:
+            included_ = [name_.strip() for name_ in include_.split(',')
+                         if name_.strip()]
+        elif default is not None:
+            included_ = list(default)
+        else:
+            included_ = list(available_)
+
+        for name_ in included_:
+            if name_ not in available_:
+                abort(400, 'Cannot include unknown relationship `%s`' %
+                      (name_))
+
+        g.data_loader = (Model, loader_options(Model, included_))
+        g.data_excluded = [name_ for name_ in available_
+                           if name_ not in included_]
+
+    def strip(result):
+        for name_ in getattr(g, 'data_excluded', []):
+            result.pop(name_, None)
+
+    def include_preprocessor_get_single(instance_id=None, **kw):
+        """Create an include GET_SINGLE preprocessor.
+
+        Accepts a single argument, `instance_id`, the primary key of the
+        instance of the model to get.
+        """
+        load()
+
+    def include_preprocessor_get_many(search_params=None, **kw):
+        """Create an include GET_MANY preprocessor.
+
+        Accepts a single argument, `search_params`, which is a dictionary
+        containing the search parameters for the request.
+        """
+        load()
+
+    def include_postprocessor_get_single(result=None, **kw):
+        """Create an include GET_SINGLE postprocessor.
+
+        Accepts a single argument, `result`, which is the dictionary
+        representation of the requested instance of the model.
+        """
+        strip(result)
+
+    def include_postprocessor_get_many(result=None, search_params=None,
+                                       **kw):
+        """Create an include GET_MANY postprocessor.
+
+        Accepts two arguments, `result`, which is the dictionary
+        representation of the JSON response which will be returned to the
+        client, and `search_params`, which is a dictionary containing the
+        search parameters for the request.
+        """
+        for object_ in result.get('objects', []):
+            strip(object_)
+
+    return (
+        {
+            'GET_SINGLE': [include_preprocessor_get_single],
+            'GET_MANY': [include_preprocessor_get_many]
+        },
+        {
+            'GET_SINGLE': [include_postprocessor_get_single],
+            'GET_MANY': [include_postprocessor_get_many]
+        }
+    )
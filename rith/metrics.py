@@ -0,0 +1,393 @@
+"""Arithmetic Metrics Registry.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+import io
+import json
+import os
+import threading
+import time
+
+
+from flask import current_app
+from flask import g
+from flask import request
+
+
+from . import pool
+
+
+"""Upper bounds, in seconds, of the request latency histogram buckets."""
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0]
+
+
+"""Seconds between writes of the statistics of a worker to the shared
+metrics directory."""
+FLUSH_SECONDS = 1.0
+
+
+"""Prefix of the files holding the statistics of each worker."""
+FILE_PREFIX = 'metrics_'
+
+
+def new_series():
+    """Create the empty statistics of a series.
+
+    :return dict: The latency histogram, status counts and in-flight gauge
+    """
+    return {
+        'buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+        'sum': 0.0,
+        'count': 0,
+        'statuses': {},
+        'in_flight': 0
+    }
+
+
+class Registry(object):
+    """The request statistics of a worker process.
+
+    Series are keyed by their labels, e.g., `endpoint=core.core_index_get`
+    or `collection=file,method=GET_MANY`.
+    """
+
+    def __init__(self):
+        """Start with no series."""
+        self.lock = threading.Lock()
+        self.series = {}
+        self.flushed_at = 0.0
+
+    def start(self, keys):
+        """Record that a request started.
+
+        :param list keys: The series the request belongs to
+        """
+        with self.lock:
+            for key_ in keys:
+                self.series.setdefault(key_, new_series())['in_flight'] += 1
+
+    def finish(self, keys, seconds, status):
+        """Record that a request completed.
+
+        :param list keys: The series the request belongs to
+        :param float seconds: The duration of the request
+        :param int status: The status code of the response
+        """
+        bucket_ = len(LATENCY_BUCKETS)
+        for index_, bound_ in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound_:
+                bucket_ = index_
+                break
+
+        with self.lock:
+            for key_ in keys:
+                series_ = self.series.setdefault(key_, new_series())
+                series_['in_flight'] -= 1
+                series_['buckets'][bucket_] += 1
+                series_['sum'] += seconds
+                series_['count'] += 1
+                series_['statuses'][str(status)] = \
+                    series_['statuses'].get(str(status), 0) + 1
+
+    def snapshot(self):
+        """Copy the statistics of the worker.
+
+        :return dict: The series and connection pools of the worker
+        """
+        with self.lock:
+            series_ = json.loads(json.dumps(self.series))
+
+        return {
+            'pid': os.getpid(),
+            'series': series_,
+            'pools': pool.snapshot()
+        }
+
+    def flush(self, directory, force=False):
+        """Write the statistics of the worker to the metrics directory.
+
+        :param string directory: The directory shared by every worker
+        :param bool force: Write even when written less than `FLUSH_SECONDS`
+            ago
+        """
+        now_ = time.monotonic()
+        if not force and now_ - self.flushed_at < FLUSH_SECONDS:
+            return
+
+        self.flushed_at = now_
+
+        filepath_ = os.path.join(directory, '%s%d.json' %
+                                 (FILE_PREFIX, os.getpid()))
+
+        with io.open(filepath_ + '.tmp', 'w', encoding='utf-8') as file_:
+            file_.write(json.dumps(self.snapshot()))
+
+        os.replace(filepath_ + '.tmp', filepath_)
+
+
+"""The statistics of this worker process."""
+registry = Registry()
+
+
+def is_running(pid):
+    """Determine whether a worker process is still running.
+
+    :param int pid: The process id of the worker
+
+    :return bool: True unless the process has exited
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+
+    return True
+
+
+def collect(directory=None):
+    """Collect the statistics of every worker.
+
+    :param string directory: The directory shared by every worker, None
+        collects the statistics of this worker only
+
+    :return list: The statistics of every worker
+    """
+    if not directory:
+        return [registry.snapshot()]
+
+    registry.flush(directory, force=True)
+
+    snapshots_ = []
+
+    for filename_ in sorted(os.listdir(directory)):
+        if not filename_.startswith(FILE_PREFIX) or \
+                not filename_.endswith('.json'):
+            continue
+
+        try:
+            with io.open(os.path.join(directory, filename_),
+                         encoding='utf-8') as file_:
+                snapshot_ = json.loads(file_.read())
+        except (OSError, ValueError):
+            continue
+
+        """The requests of an exited worker are no longer in flight."""
+        if not is_running(snapshot_['pid']):
+            for series_ in snapshot_['series'].values():
+                series_['in_flight'] = 0
+
+        snapshots_.append(snapshot_)
+
+    return snapshots_
+
+
+def aggregate(snapshots):
+    """Sum the statistics of many workers.
+
+    :param list snapshots: The statistics of every worker
+
+    :return dict: The summed series and connection pools
+    """
+    series_ = {}
+    pools_ = {}
+
+    for snapshot_ in snapshots:
+        for key_, statistics_ in snapshot_['series'].items():
+            total_ = series_.setdefault(key_, new_series())
+            total_['buckets'] = [a_ + b_ for a_, b_ in
+                                 zip(total_['buckets'],
+                                     statistics_['buckets'])]
+
+            for name_ in ['sum', 'count', 'in_flight']:
+                total_[name_] += statistics_[name_]
+
+            for status_, count_ in statistics_['statuses'].items():
+                total_['statuses'][status_] = \
+                    total_['statuses'].get(status_, 0) + count_
+
+        for name_, statistics_ in snapshot_['pools'].items():
+            total_ = pools_.setdefault(name_, {})
+
+            for field_, value_ in statistics_.items():
+                if isinstance(value_, dict):
+                    histogram_ = total_.setdefault(field_, {})
+                    for bound_, count_ in value_.items():
+                        histogram_[bound_] = histogram_.get(bound_, 0) + \
+                            count_
+                else:
+                    total_[field_] = total_.get(field_, 0) + value_
+
+    return {
+        'series': series_,
+        'pools': pools_
+    }
+
+
+def labels(key, **extra):
+    """Format the labels of a series for the text exposition format.
+
+    :param string key: The labels of the series, e.g., `endpoint=name`
+    :param dict extra: Additional labels
+
+    :return string: The labels, e.g., `{endpoint="name",le="0.5"}`
+    """
+    pairs_ = [pair_.split('=', 1) for pair_ in key.split(',') if pair_]
+    pairs_.extend(sorted(extra.items()))
+
+    return '{%s}' % (','.join(['%s="%s"' % (name_, str(value_).
+                                            replace('"', '\\"'))
+                               for name_, value_ in pairs_]))
+
+
+def exposition(aggregated):
+    """Render metrics in the Prometheus text exposition format.
+
+    :param dict aggregated: The summed statistics, see `aggregate`
+
+    :return string: The metrics document
+    """
+    lines_ = [
+        '# TYPE rith_request_duration_seconds histogram',
+        '# TYPE rith_requests_total counter',
+        '# TYPE rith_requests_in_flight gauge',
+    ]
+
+    for key_, series_ in sorted(aggregated['series'].items()):
+        cumulative_ = 0
+        for bound_, count_ in zip(LATENCY_BUCKETS + ['+Inf'],
+                                  series_['buckets']):
+            cumulative_ += count_
+            lines_.append('rith_request_duration_seconds_bucket%s %d' %
+                          (labels(key_, le=bound_), cumulative_))
+
+        lines_.append('rith_request_duration_seconds_sum%s %f' %
+                      (labels(key_), series_['sum']))
+        lines_.append('rith_request_duration_seconds_count%s %d' %
+                      (labels(key_), series_['count']))
+
+        for status_, count_ in sorted(series_['statuses'].items()):
+            lines_.append('rith_requests_total%s %d' %
+                          (labels(key_, status=status_), count_))
+
+        lines_.append('rith_requests_in_flight%s %d' %
+                      (labels(key_), series_['in_flight']))
+
+    for name_, statistics_ in sorted(aggregated['pools'].items()):
+        key_ = 'pool=%s' % (name_)
+
+        for field_, value_ in sorted(statistics_.items()):
+            if field_ == 'wait_histogram':
+                for bound_, count_ in sorted(
+                        value_.items(), key=lambda item_: float(item_[0])):
+                    lines_.append('rith_pool_wait_seconds_bucket%s %d' %
+                                  (labels(key_, le=bound_), count_))
+            elif field_ == 'wait_seconds':
+                lines_.append('rith_pool_wait_seconds_sum%s %s' %
+                              (labels(key_), value_))
+            elif field_ in pool.new_statistics():
+                lines_.append('rith_pool_%s_total%s %s' %
+                              (field_, labels(key_), value_))
+            else:
+                lines_.append('rith_pool_%s%s %s' %
+                              (field_, labels(key_), value_))
+
+    return '\n'.join(lines_) + '\n'
+
+
+def request_keys():
+    """List the series of the current request.
+
+    Every request belongs to the series of its endpoint. Flask Restless
+    requests also belong to the series of their collection and method.
+
+    :return list: The labels of each series
+    """
+    keys_ = ['endpoint=%s' % (request.endpoint or 'unmatched')]
+
+    collection_ = current_app.extensions.get('blueprints', {}).\
+        get(request.blueprint)
+
+    if collection_:
+        method_ = request.method
+        if method_ not in ['POST', 'OPTIONS']:
+            method_ += '_SINGLE' if (request.view_args or {}).\
+                get('instid') is not None else '_MANY'
+
+        keys_.append('collection=%s,method=%s' % (collection_, method_))
+
+    return keys_
+
+
+def start_request():
+    """Start timing a request, registered as a `before_request` hook."""
+    g.metrics_keys = request_keys()
+    g.metrics_started = time.perf_counter()
+
+    registry.start(g.metrics_keys)
+
+
+def record_status(response):
+    """Remember the status of a response, registered as `after_request`.
+
+    :param object response: The Flask response
+
+    :return object: The Flask response
+    """
+    g.metrics_status = response.status_code
+    return response
+
+
+def finish_request(exception=None):
+    """Record a completed request, registered as `teardown_request`.
+
+    :param object exception: The unhandled exception, if any
+    """
+    started_ = g.pop('metrics_started', None)
+    if started_ is None:
+        return
+
+    registry.finish(g.pop('metrics_keys', []),
+                    time.perf_counter() - started_,
+                    g.pop('metrics_status', 500))
+
+    directory_ = current_app.config.get('METRICS_DIRECTORY')
+    if directory_:
+        registry.flush(directory_)
+
+
+def init_app(app):
+    """Record the requests of an application when `METRICS_ENABLED` is set.
+
+    Registered before every other request hook, so that the time they take
+    is recorded. Workers share their statistics through the files they write to
+    `METRICS_DIRECTORY`, when set, so that any worker reports the totals.
+
+    :param object app: The Flask application
+    """
+    if not app.config.get('METRICS_ENABLED', False):
+        return
+
+    directory_ = app.config.get('METRICS_DIRECTORY')
+    if directory_ and not os.path.isdir(directory_):
+        os.makedirs(directory_)
+
+    app.before_request(start_request)
+    app.after_request(record_status)
+    app.teardown_request(finish_request)
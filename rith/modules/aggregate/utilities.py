@@ -0,0 +1,196 @@
+"""Arithmetic Aggregate Utilities.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+from datetime import date
+from datetime import datetime
+from decimal import Decimal
+
+
+from flask import abort
+from flask_restless.search import create_query
+from sqlalchemy import Date
+from sqlalchemy import DateTime
+from sqlalchemy import Float
+from sqlalchemy import func
+from sqlalchemy import inspect
+from sqlalchemy import Integer
+from sqlalchemy import Numeric
+
+
+from rith import db
+from rith import governor
+from rith import scope
+
+
+"""Aggregate functions and the column types each accepts."""
+AGGREGATE_FUNCTIONS = {
+    'sum': (Integer, Numeric, Float),
+    'avg': (Integer, Numeric, Float),
+    'min': (Integer, Numeric, Float, Date, DateTime),
+    'max': (Integer, Numeric, Float, Date, DateTime),
+}
+
+
+"""Precisions a date or time may be grouped by."""
+GRANULARITIES = [
+    'year',
+    'quarter',
+    'month',
+    'week',
+    'day',
+    'hour',
+]
+
+
+def flagged_fields(Model, flag):
+    """List the `__def__` fields of a model with a flag set.
+
+    :param object Model: The SQLAlchemy model being aggregated
+    :param string flag: The `__def__` field flag
+
+    :return list: The names of the flagged fields
+    """
+    fields_ = getattr(Model, '__def__', {}).get('fields', {})
+
+    return [name_ for name_, field_ in fields_.items() if field_.get(flag)]
+
+
+def group_columns(Model, group_by):
+    """Create the grouping columns of an aggregation.
+
+    Each group is a field flagged `is_groupable`, dates and times may be
+    truncated to a precision (e.g., `created_on:month`).
+
+    :param object Model: The SQLAlchemy model being aggregated
+    :param list group_by: The requested groups
+
+    :return list: Labeled SQLAlchemy column expressions
+    """
+    groupable_ = flagged_fields(Model, 'is_groupable')
+    columns_ = []
+
+    for group_ in group_by:
+        name_, _, granularity_ = group_.partition(':')
+
+        if name_ not in groupable_:
+            abort(400, 'Grouping by `%s` is not allowed' % (name_))
+
+        column_ = getattr(Model, name_)
+
+        if granularity_:
+            if granularity_ not in GRANULARITIES or \
+                    not isinstance(column_.type, (Date, DateTime)):
+                abort(400, 'Cannot group `%s` by `%s`' % (name_,
+                                                          granularity_))
+            column_ = func.date_trunc(granularity_, column_)
+
+        columns_.append(column_.label(name_))
+
+    return columns_
+
+
+def aggregate_columns(Model, aggregates):
+    """Create the aggregate columns of an aggregation.
+
+    Rows are counted with `count`, other aggregates name a function and a
+    field flagged `is_aggregatable` (e.g., `max:created_on`).
+
+    :param object Model: The SQLAlchemy model being aggregated
+    :param list aggregates: The requested aggregates
+
+    :return list: Labeled SQLAlchemy aggregate expressions
+    """
+    aggregatable_ = flagged_fields(Model, 'is_aggregatable')
+    columns_ = []
+
+    for aggregate_ in aggregates:
+        if aggregate_ == 'count':
+            primary_key_ = inspect(Model).primary_key[0]
+            columns_.append(func.count(primary_key_).label('count'))
+            continue
+
+        function_, _, name_ = aggregate_.partition(':')
+
+        if name_ not in aggregatable_:
+            abort(400, 'Aggregating `%s` is not allowed' % (name_))
+
+        column_ = getattr(Model, name_)
+
+        if function_ not in AGGREGATE_FUNCTIONS or \
+                not isinstance(column_.type, AGGREGATE_FUNCTIONS[function_]):
+            abort(400, 'Cannot aggregate `%s` with `%s`' % (name_,
+                                                            function_))
+
+        columns_.append(getattr(func, function_)(column_).
+                        label('%s_%s' % (function_, name_)))
+
+    return columns_
+
+
+def serialize(value):
+    """Convert an aggregated value into a JSON compatible value.
+
+    :param object value: The value returned by the database
+
+    :return object: The JSON compatible value
+    """
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def aggregate(Model, search_params, group_by, aggregates, limit=1000):
+    """Run a single GROUP BY over the live rows of a model.
+
+    :param object Model: The SQLAlchemy model being aggregated
+    :param dict search_params: Flask Restless search parameters, only the
+        `filters` are used
+    :param list group_by: The requested groups
+    :param list aggregates: The requested aggregates
+    :param int limit: The largest number of groups returned
+
+    :return list: One dictionary per group
+    """
+    filterable_ = governor.allowed_fields(Model, 'is_filterable')
+
+    for field_ in governor.filter_fields(search_params.get('filters')):
+        if field_ not in filterable_:
+            abort(400, 'Filtering by `%s` is not allowed' % (field_))
+
+    groups_ = group_columns(Model, group_by)
+    columns_ = groups_ + aggregate_columns(Model, aggregates)
+
+    try:
+        query_ = create_query(db.session, Model, {
+            'filters': search_params.get('filters', [])
+        }, _ignore_order_by=True)
+    except Exception:
+        abort(400, 'Unable to construct query')
+
+    if scope.is_scoped(Model):
+        query_ = query_.filter(scope.criterion(Model, 'live'))
+
+    rows_ = query_.with_entities(*columns_).\
+        group_by(*groups_).\
+        order_by(*groups_).\
+        limit(limit).all()
+
+    return [dict([(key_, serialize(value_)) for key_, value_ in
+                  zip(row_.keys(), row_)]) for row_ in rows_]
@@ -0,0 +1,106 @@
+"""Arithmetic Aggregate Module.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+from flask import abort
+from flask import json
+from flask import jsonify
+from flask import request
+
+
+from rith import governor
+from rith import logger
+from rith.permissions import verify_collection
+
+
+from . import module
+
+
+from .utilities import aggregate
+
+
+"""The largest number of groups returned by a single aggregation."""
+MAX_GROUPS = 1000
+
+
+def split_argument(name):
+    """Split a comma separated query string argument.
+
+    :param string name: The name of the query string argument
+
+    :return list: The non-empty values of the argument
+    """
+    return [value_.strip() for value_ in request.args.get(name, '').split(',')
+            if value_.strip()]
+
+
+@module.route('/v1/aggregate/<string:collection>', methods=['OPTIONS'])
+def aggregate_options(collection):
+    """Define default aggregate preflight check."""
+    return jsonify(**{
+        'meta': {
+            'status': 200
+        }
+    })
+
+
+@module.route('/v1/aggregate/<string:collection>', methods=['GET'])
+def aggregate_get(collection):
+    """Aggregate the rows of a collection.
+
+    The request is authorized by the GET_MANY preprocessors of the module
+    that defines the collection, exactly as a list request would be, and
+    governed by its `statement_timeout`.
+
+    :param string collection: The name of the collection to aggregate
+    :param string group_by: Comma separated `is_groupable` fields
+    :param string aggregate: Comma separated aggregates, `count` or
+        `<function>:<field>` for `is_aggregatable` fields
+    :param string q: Flask Restless search parameters, only the `filters`
+        are used
+
+    :return object: One result per group
+    """
+    try:
+        search_params_ = json.loads(request.args.get('q', '{}'))
+    except ValueError:
+        abort(400, 'Unable to decode data')
+
+    if not isinstance(search_params_, dict):
+        abort(400, 'Unable to decode data')
+
+    collection_ = verify_collection(collection, search_params=search_params_)
+
+    governor_ = collection_['options'].get('query_governor')
+    if governor_:
+        governor.statement_timeout(governor_.get('statement_timeout'))()
+
+    group_by_ = split_argument('group_by')
+    aggregates_ = split_argument('aggregate') or ['count']
+
+    logger.debug('Aggregating `%s` by %s' % (collection, group_by_))
+
+    objects_ = aggregate(collection_['model'], search_params_, group_by_,
+                         aggregates_, MAX_GROUPS)
+
+    return jsonify(**{
+        'meta': {
+            'status': 200
+        },
+        'num_results': len(objects_),
+        'objects': objects_
+    }), 200
@@ -0,0 +1,130 @@
+"""Arithmetic Batch Utilities.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+from contextlib import contextmanager
+
+
+from flask import current_app
+from flask import g
+from flask import json
+
+
+from rith import logger
+
+
+"""Methods a sub-request may use."""
+METHODS = [
+    'GET',
+    'POST',
+    'PATCH',
+    'PUT',
+    'DELETE',
+]
+
+
+"""Request headers every sub-request inherits from the batch request."""
+INHERITED_HEADERS = [
+    'Accept-Language',
+    'Authorization',
+    'User-Agent',
+]
+
+
+"""Response headers describing the transport of a sub-request, which the
+batch response does not repeat."""
+TRANSPORT_HEADERS = [
+    'Access-Control-Allow-Credentials',
+    'Access-Control-Allow-Headers',
+    'Access-Control-Allow-Methods',
+    'Access-Control-Allow-Origin',
+    'Access-Control-Max-Age',
+    'Content-Encoding',
+    'Content-Length',
+    'Vary',
+]
+
+
+@contextmanager
+def isolated_globals():
+    """Restore the application globals once a sub-request completes.
+
+    Sub-requests share the application context, and its `g`, with the batch
+    request. State a sub-request leaves on `g` (e.g., its entity tag or
+    cache key) must not leak into the next one, while state of the batch
+    request itself (e.g., the authorized access token) remains available.
+    """
+    saved_ = dict(vars(g))
+    try:
+        yield
+    finally:
+        vars(g).clear()
+        vars(g).update(saved_)
+
+
+def dispatch(item, headers):
+    """Run a single sub-request through the full Flask request cycle.
+
+    :param dict item: The `method`, `path`, optional `headers` and optional
+        JSON `body` of the sub-request
+    :param dict headers: The headers inherited from the batch request
+
+    :return dict: The `status`, `headers` and JSON `body` of the response
+    """
+    headers_ = dict(headers, **(item.get('headers') or {}))
+
+    """The batch response is compressed as a whole, sub-responses are always
+    returned in the identity encoding so that their bodies can be decoded.
+    """
+    headers_['Accept-Encoding'] = 'identity'
+
+    options_ = {
+        'method': item['method'],
+        'headers': headers_
+    }
+
+    if item.get('body') is not None:
+        options_['data'] = json.dumps(item['body'])
+        options_['content_type'] = 'application/json'
+
+    with isolated_globals(), \
+            current_app.test_request_context(item['path'], **options_):
+        try:
+            response_ = current_app.full_dispatch_request()
+
+            response_.direct_passthrough = False
+            data_ = response_.get_data(as_text=True)
+
+            body_ = data_ or None
+            if data_ and response_.is_json:
+                body_ = json.loads(data_)
+        except Exception as error:
+            logger.exception('Batch sub-request `%s %s` failed: %s' %
+                             (item['method'], item['path'], error))
+            return {
+                'status': 500,
+                'headers': {},
+                'body': None
+            }
+
+    return {
+        'status': response_.status_code,
+        'headers': dict([(name_, value_) for name_, value_ in
+                         response_.headers.items()
+                         if name_ not in TRANSPORT_HEADERS]),
+        'body': body_
+    }
@@ -0,0 +1,166 @@
+"""Arithmetic Batch Module.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+from flask import abort
+from flask import g
+from flask import jsonify
+from flask import request
+
+
+from rith import db
+from rith import logger
+from rith import oauth
+
+
+from . import module
+
+
+from .utilities import dispatch
+from .utilities import INHERITED_HEADERS
+from .utilities import METHODS
+
+
+"""The number of sub-requests a single batch request may contain."""
+MAX_REQUESTS = 25
+
+
+def verify_requests(requests):
+    """Validate the sub-requests of a batch request.
+
+    :param list requests: The sub-requests submitted by the client
+
+    :return list: The validated sub-requests or abort
+    """
+    if not isinstance(requests, list) or not requests:
+        abort(400, 'Please provide the sub-requests as a list `requests`')
+
+    if len(requests) > MAX_REQUESTS:
+        abort(413, 'A batch may contain at most %d requests' %
+              (MAX_REQUESTS))
+
+    for item_ in requests:
+        if not isinstance(item_, dict) or \
+                not isinstance(item_.get('path'), str):
+            abort(400, 'Every request needs a `method` and a `path`')
+
+        item_['method'] = str(item_.get('method', 'GET')).upper()
+
+        if item_['method'] not in METHODS:
+            abort(400, 'The `%s` method cannot be batched' %
+                  (item_['method']))
+
+        if not item_['path'].startswith('/v1/') or \
+                item_['path'].startswith('/v1/batch'):
+            abort(400, 'The `%s` path cannot be batched' % (item_['path']))
+
+        if item_.get('headers') is not None and \
+                not isinstance(item_['headers'], dict):
+            abort(400, 'The `headers` of a request must be an object')
+
+    return requests
+
+
+@module.route('/v1/batch', methods=['OPTIONS'])
+def batch_options():
+    """Define default batch preflight check."""
+    return jsonify(**{
+        'meta': {
+            'status': 200
+        }
+    })
+
+
+@module.route('/v1/batch', methods=['POST'])
+@oauth.require_oauth()
+def batch_post(oauth_request):
+    """Run many API requests in a single round trip.
+
+    Sub-requests run in order, inherit the authorization of the batch
+    request, and are authorized by their own endpoints exactly as they would
+    be on their own.
+
+    :param list requests: The sub-requests, each with a `method`, a `path`
+        (including any query string), and optionally `headers` and a JSON
+        `body`
+    :param bool atomic: Run every sub-request in one database transaction,
+        which is only committed when every sub-request succeeds
+
+    :return object: The response of every sub-request, in order
+    """
+    content_ = request.get_json(silent=True) or {}
+
+    requests_ = verify_requests(content_.get('requests'))
+    atomic_ = bool(content_.get('atomic', False))
+
+    headers_ = dict([(name_, request.headers[name_])
+                     for name_ in INHERITED_HEADERS
+                     if name_ in request.headers])
+
+    logger.debug('Running a batch of %d requests' % (len(requests_)))
+
+    """Savepoints of an atomic batch are released as commits, the cache must
+    not serve or store rows the batch may still roll back.
+    """
+    if atomic_:
+        g.cache_bypass = True
+
+    responses_ = []
+    committed_ = True
+
+    for item_ in requests_:
+
+        """Flask Restless commits every write, in an atomic batch that only
+        releases the savepoint of the sub-request.
+        """
+        savepoint_ = db.session.begin_nested() if atomic_ else None
+
+        response_ = dispatch(item_, headers_)
+        responses_.append(response_)
+
+        if not atomic_:
+            continue
+
+        if response_['status'] < 400:
+            if savepoint_.is_active:
+                savepoint_.commit()
+            continue
+
+        if savepoint_.is_active:
+            savepoint_.rollback()
+        db.session.rollback()
+
+        logger.info('Batch rolled back after `%s %s` responded %d' %
+                    (item_['method'], item_['path'], response_['status']))
+
+        committed_ = False
+        break
+
+    if atomic_ and committed_:
+        db.session.commit()
+
+    result_ = {
+        'meta': {
+            'status': 200
+        },
+        'responses': responses_
+    }
+
+    if atomic_:
+        result_['committed'] = committed_
+
+    return jsonify(**result_), 200
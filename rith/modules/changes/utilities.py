@@ -0,0 +1,150 @@
+"""Arithmetic Changes Utilities.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+import base64
+import json
+
+
+from datetime import datetime
+from datetime import timedelta
+
+
+from sqlalchemy import tuple_
+
+
+from rith import db
+from rith.serializers import to_dict
+
+
+"""Rows modified more recently than this are left for the next request, so
+that transactions committing shortly after they set `modified_on` are not
+skipped by clients that have already moved past them. The feed reads from
+the primary, the window does not cover replication lag."""
+SETTLE_SECONDS = 5
+
+
+"""The `isoformat` of a timestamp leaves out microseconds when they are 0."""
+CURSOR_FORMATS = [
+    '%Y-%m-%dT%H:%M:%S.%f',
+    '%Y-%m-%dT%H:%M:%S',
+]
+
+
+def is_tracked(Model):
+    """Determine whether a model records its changes.
+
+    :param object Model: The SQLAlchemy model being requested
+
+    :return bool: True when the model extends `BaseMixin`
+    """
+    return hasattr(Model, 'modified_on') and \
+        hasattr(Model, 'has_been_deleted')
+
+
+def encode_cursor(modified_on, instance_id):
+    """Encode the position of the last change of a page.
+
+    :param datetime modified_on: The `modified_on` of the last change
+    :param int instance_id: The primary key of the last change
+
+    :return string: An opaque, URL safe, cursor
+    """
+    position_ = json.dumps([modified_on.isoformat(), instance_id])
+
+    return base64.urlsafe_b64encode(position_.encode('utf-8')).\
+        decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Decode the position encoded by `encode_cursor`.
+
+    :param string cursor: The opaque cursor supplied by the client
+
+    :return tuple: The `modified_on` and primary key, or None when invalid
+    """
+    try:
+        modified_on_, instance_id_ = json.loads(
+            base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        instance_id_ = int(instance_id_)
+    except (TypeError, ValueError):
+        return None
+
+    for format_ in CURSOR_FORMATS:
+        try:
+            return (datetime.strptime(modified_on_, format_), instance_id_)
+        except (TypeError, ValueError):
+            continue
+
+    return None
+
+
+def changes(Model, cursor=None, limit=100, exclude=None):
+    """List the rows of a model changed after a cursor.
+
+    Rows are walked in `(modified_on, id)` order using the composite change
+    feed index. Deleted rows are returned as tombstones holding only their
+    primary key and `modified_on`.
+
+    :param object Model: The SQLAlchemy model being requested
+    :param tuple cursor: The `modified_on` and primary key of the last change
+        the client has seen, None starts from the first change
+    :param int limit: The number of changes per page
+    :param list exclude: The columns never returned for the collection
+
+    :return dict: The changes, tombstones, and cursor of the next page
+    """
+    settled_ = datetime.now() - timedelta(seconds=SETTLE_SECONDS)
+
+    query_ = db.session.query(Model).\
+        filter(Model.modified_on.isnot(None)).\
+        filter(Model.modified_on < settled_)
+
+    if cursor is not None:
+        query_ = query_.filter(
+            tuple_(Model.modified_on, Model.id) > tuple_(*cursor))
+
+    rows_ = query_.order_by(Model.modified_on, Model.id).\
+        limit(limit + 1).all()
+
+    has_more_ = len(rows_) > limit
+    rows_ = rows_[:limit]
+
+    objects_ = []
+    tombstones_ = []
+
+    for row_ in rows_:
+        if row_.has_been_deleted:
+            tombstones_.append({
+                'id': row_.id,
+                'modified_on': row_.modified_on.isoformat()
+            })
+        else:
+            objects_.append(to_dict(row_, exclude=exclude))
+
+    next_cursor_ = None
+    if rows_:
+        next_cursor_ = encode_cursor(rows_[-1].modified_on, rows_[-1].id)
+    elif cursor is not None:
+        next_cursor_ = encode_cursor(*cursor)
+
+    return {
+        'objects': objects_,
+        'tombstones': tombstones_,
+        'next_cursor': next_cursor_,
+        'has_more': has_more_
+    }
@@ -0,0 +1,99 @@
+"""Arithmetic Changes Module.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+from flask import abort
+from flask import jsonify
+from flask import request
+
+
+from rith import db
+from rith import logger
+from rith import replicas
+from rith.permissions import verify_collection
+
+
+from . import module
+
+
+from .utilities import changes
+from .utilities import decode_cursor
+from .utilities import is_tracked
+
+
+"""The number of changes per page, unless the client requests fewer."""
+MAX_RESULTS_PER_PAGE = 500
+
+
+@module.route('/v1/changes/<string:collection>', methods=['OPTIONS'])
+def changes_options(collection):
+    """Define default changes preflight check."""
+    return jsonify(**{
+        'meta': {
+            'status': 200
+        }
+    })
+
+
+@module.route('/v1/changes/<string:collection>', methods=['GET'])
+def changes_get(collection):
+    """List the changes made to a collection after a cursor.
+
+    The request is authorized by the GET_MANY preprocessors of the module
+    that defines the collection, exactly as a list request would be. The
+    feed always reads from the primary, a replica lagging further behind
+    than the settle window would let clients move past unreplayed rows.
+
+    :param string collection: The name of the collection
+    :param string cursor: The `next_cursor` of the previous page, omit to
+        start from the first change
+    :param int limit: The number of changes per page
+
+    :return object: The changed rows and tombstones of deleted rows
+    """
+    replicas.pin(db.session)
+
+    collection_ = verify_collection(collection, search_params={})
+
+    if not is_tracked(collection_['model']):
+        abort(404, 'The `%s` collection does not record changes' %
+              (collection))
+
+    try:
+        limit_ = int(request.args.get('limit', 100))
+    except ValueError:
+        abort(400, 'The `limit` must be a number')
+
+    limit_ = max(1, min(limit_, MAX_RESULTS_PER_PAGE))
+
+    cursor_ = None
+    if request.args.get('cursor'):
+        cursor_ = decode_cursor(request.args.get('cursor'))
+        if cursor_ is None:
+            abort(400, 'The `cursor` is invalid')
+
+    logger.debug('Listing changes to `%s` after %s' % (collection, cursor_))
+
+    changes_ = changes(collection_['model'], cursor_, limit_,
+                       collection_['arguments'].get('exclude_columns'))
+
+    return jsonify(**dict({
+        'meta': {
+            'status': 200
+        },
+        'num_results': len(changes_['objects']) + len(changes_['tombstones'])
+    }, **changes_)), 200
@@ -20,7 +20,10 @@ from flask import jsonify
 from flask import redirect
 
 
+from rith import hooks
 from rith import oauth
+from rith import pool
+from rith.permissions import verify_roles
 
 
 from . import module
@@ -56,3 +59,41 @@ def core_index_get():
                        ' support@rith.io.'
         }
     })
+
+
+@module.route('/v1/system/pools', methods=['GET'])
+@oauth.require_oauth()
+def core_pools_get(oauth_request):
+    """Describe the database connection pools.
+
+    Reports, for every pool, the checkouts, timeouts, connections opened
+    and closed, the cumulative checkout wait histogram, and the current
+    size and checked out connections. Only administrators may read it.
+    """
+    verify_roles(oauth_request.user, 'admin')
+
+    return jsonify(**{
+        'meta': {
+            'status': 200
+        },
+        'pools': pool.snapshot()
+    })
+
+
+@module.route('/v1/system/hooks', methods=['GET'])
+@oauth.require_oauth()
+def core_hooks_get(oauth_request):
+    """Describe the execution time of the timed pre and postprocessors.
+
+    Reports, for every hook compiled with `compile_hooks`, the number of
+    calls and the total, mean and slowest execution time in seconds. Only
+    administrators may read it.
+    """
+    verify_roles(oauth_request.user, 'admin')
+
+    return jsonify(**{
+        'meta': {
+            'status': 200
+        },
+        'hooks': hooks.snapshot()
+    })
@@ -0,0 +1,149 @@
+"""Arithmetic Events Module.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+import json
+import queue
+import time
+
+
+from flask import abort
+from flask import current_app
+from flask import jsonify
+from flask import Response
+
+
+from rith import db
+from rith import logger
+from rith import replicas
+from rith.permissions import verify_collection
+
+
+from . import module
+
+
+"""Seconds between the comments that keep idle connections open."""
+KEEPALIVE_SECONDS = 15
+
+
+"""Seconds a client waits before reconnecting a closed stream."""
+RETRY_SECONDS = 5
+
+
+"""Seconds a stream stays open, reconnecting authorizes the client again."""
+STREAM_SECONDS = 900
+
+
+def message(collection, event_):
+    """Format a change event as a server-sent event.
+
+    :param string collection: The name of the subscribed collection
+    :param dict event_: The change event
+
+    :return string: The server-sent event
+    """
+    data_ = {
+        'collection': collection,
+        'operation': event_['operation'],
+        'ids': event_.get('ids', [])
+    }
+
+    return 'event: %s\ndata: %s\n\n' % (
+        'reset' if event_['operation'] == 'reset' else 'change',
+        json.dumps(data_))
+
+
+def stream(listener, subscription, collection):
+    """Send the events of a subscription until the stream expires.
+
+    A `reset` event closes the stream, the client may have missed changes
+    and resynchronizes with the change feed before subscribing again.
+
+    :param object listener: The Listener of the worker
+    :param object subscription: The Subscription of the client
+    :param string collection: The name of the subscribed collection
+    """
+    expires_ = time.monotonic() + STREAM_SECONDS
+
+    try:
+        yield 'retry: %d\n\n' % (RETRY_SECONDS * 1000)
+
+        while time.monotonic() < expires_:
+            try:
+                event_ = subscription.events.get(timeout=KEEPALIVE_SECONDS)
+            except queue.Empty:
+                yield ': keepalive\n\n'
+                continue
+
+            yield message(collection, event_)
+
+            if event_['operation'] == 'reset':
+                return
+    finally:
+        listener.unsubscribe(subscription)
+
+
+@module.route('/v1/events/<string:collection>', methods=['OPTIONS'])
+def events_options(collection):
+    """Define default events preflight check."""
+    return jsonify(**{
+        'meta': {
+            'status': 200
+        }
+    })
+
+
+@module.route('/v1/events/<string:collection>', methods=['GET'])
+def events_get(collection):
+    """Stream the changes made to a collection as server-sent events.
+
+    The request is authorized by the GET_MANY preprocessors of the module
+    that defines the collection, exactly as a list request would be. Events
+    carry the operation and the primary keys of the changed rows, clients
+    read the rows themselves from the data endpoints or the change feed.
+
+    Streams hold a connection open, serve them from a worker class that
+    handles concurrent connections (e.g., gevent or threads). Like the change
+    feed, the stream reads from the primary only.
+
+    :param string collection: The name of the collection
+
+    :return object: The `text/event-stream` response
+    """
+    listener_ = current_app.extensions.get('events')
+    if listener_ is None:
+        abort(404)
+
+    replicas.pin(db.session)
+
+    collection_ = verify_collection(collection, search_params={})
+
+    subscription_ = listener_.subscribe(
+        [collection_['model'].__tablename__])
+
+    """Return the connection used for authorization to the pool before the
+    stream starts.
+    """
+    db.session.close()
+
+    logger.debug('Streaming changes to `%s`' % (collection))
+
+    return Response(stream(listener_, subscription_, collection),
+                    mimetype='text/event-stream', headers={
+                        'Cache-Control': 'no-cache',
+                        'X-Accel-Buffering': 'no'
+                    })
@@ -240,7 +240,9 @@ class Seed(Endpoint):
     __arguments__ = {
         'collection_name': 'file',
         'url_prefix': '/v1/data',
-        'exclude_columns': [],
+        'exclude_columns': [
+            'search_vector'
+        ],
         'max_results_per_page': 25,
         'methods': [
             'GET',
@@ -267,3 +269,15 @@ class Seed(Endpoint):
         'allow_delete_many': False,
         'allow_patch_many': False
     }
+
+    """Arithmetic Endpoint Options.
+
+    These options enable the layers the Application wraps around the
+    Flask-Restless endpoint. See `Endpoint.__options__` for the defaults.
+    """
+    __options__ = {
+        'conditional_requests': True,
+        'approximate_count': {
+            'cap': 10000
+        }
+    }
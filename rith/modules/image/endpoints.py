@@ -0,0 +1,108 @@
+"""Arithmetic Image Module.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+from flask import abort
+from flask import request
+
+
+from rith import logger
+from rith.endpoint import Endpoint
+from rith.permissions import *
+
+
+class Seed(Endpoint):
+    """Instantiate the Image Endpoints.
+
+    Images are created by the media module, the data endpoint only reads
+    them, so that other system endpoints (e.g., search) can authorize
+    requests for the `image` collection.
+
+    :param class Endpoint: The Endpoint base class
+
+    See the official Flask Restless documentation for more information
+    https://flask-restless.readthedocs.org/en/latest/
+    """
+
+    """Define all base preprocessors.
+
+    See the official Flask Restless documentation for more information
+    https://flask-restless.readthedocs.org/en/latest/customizing.html\
+    #request-preprocessors-and-postprocessors
+    """
+
+    def image_preprocessor_get_single(instance_id=None, **kw):
+        """Create an Image specific GET_SINGLE preprocessor.
+
+        Accepts a single argument, `instance_id`, the primary key of the
+        instance of the model to get.
+        """
+        logger.info('`image_preprocessor_get_single` responded to request')
+
+        if request.args.get('access_token', '') or \
+                request.headers.get('Authorization'):
+
+            authorization = verify_authorization()
+
+        else:
+            abort(403)
+
+    def image_preprocessor_get_many(search_params=None, **kw):
+        """Create an Image specific GET_MANY preprocessor.
+
+        Accepts a single argument, `search_params`, which is a dictionary
+        containing the search parameters for the request.
+        """
+        logger.info('`image_preprocessor_get_many` responded to request')
+
+        if request.args.get('access_token', '') or \
+                request.headers.get('Authorization'):
+
+            authorization = verify_authorization()
+
+        else:
+            abort(403)
+
+    """Flask-Restless Endpoint Arguments.
+
+    These arguments define how the endpoint will be setup. These are the
+    defaults that we will use. These arguments can be overridden once a new
+    Endpoint class has been instantiated.
+
+    See the official Flask-Restless documentation for more information
+    https://flask-restless.readthedocs.org/en/latest/api.html#\
+    flask.ext.restless.APIManager.create_api_blueprint
+    """
+    __arguments__ = {
+        'collection_name': 'image',
+        'url_prefix': '/v1/data',
+        'exclude_columns': [
+            'search_vector'
+        ],
+        'max_results_per_page': 25,
+        'methods': [
+            'GET'
+        ],
+        'preprocessors': {
+            'GET_SINGLE': [image_preprocessor_get_single],
+            'GET_MANY': [image_preprocessor_get_many]
+        },
+        'postprocessors': {},
+        'allow_functions': False,
+        'allow_delete_many': False,
+        'allow_patch_many': False
+    }
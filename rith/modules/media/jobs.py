@@ -0,0 +1,287 @@
+"""Arithmetic Media Module.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+import os
+import threading
+
+
+from datetime import datetime
+from datetime import timedelta
+from uuid import uuid4
+
+
+from flask import current_app
+from sqlalchemy import and_
+from sqlalchemy import or_
+from werkzeug.datastructures import FileStorage
+from werkzeug import secure_filename
+
+
+from rith import db
+from rith import logger
+
+
+from rith.schema.image import Image
+from rith.schema.image_job import ImageJob
+
+
+from . import module
+
+
+from .utilities import upload_image
+
+
+"""Seconds an idle job runner waits before looking for new jobs."""
+POLL_SECONDS = 5
+
+
+"""Seconds after which a job still `processing` is assumed to have been
+abandoned by its runner, and is claimed again."""
+STALE_SECONDS = 600
+
+
+"""Jobs failing, or abandoned, this many times are marked as `failed`."""
+MAX_ATTEMPTS = 3
+
+
+"""Seconds a failed job waits before its first retry, doubled after every
+further attempt."""
+RETRY_SECONDS = 30
+
+
+"""The job runner of this process, created by `start_runner`."""
+runners = {}
+runners_lock = threading.Lock()
+
+
+def enqueue(source_file, user):
+    """Persist an upload and create the pending Image and its ImageJob.
+
+    :param object source_file: The uploaded FileStorage
+    :param object user: The User uploading the image
+
+    :return object: The committed ImageJob
+    """
+    directory_ = os.path.join(current_app.config['MEDIA_DIRECTORY'],
+                              'pending')
+    if not os.path.isdir(directory_):
+        os.makedirs(directory_)
+
+    extension_ = os.path.splitext(secure_filename(source_file.filename))[1]
+    source_ = os.path.join(directory_, uuid4().hex + extension_)
+    source_file.save(source_)
+
+    image_ = Image(**{
+        'filename': source_file.filename,
+        'filetype': source_file.mimetype,
+        'filesize': source_file.content_length,
+        'created_on': datetime.now(),
+        'creator_id': user.id,
+        'status': 'pending'
+    })
+
+    job_ = ImageJob(**{
+        'image': image_,
+        'creator_id': user.id,
+        'source': source_,
+        'status': 'pending',
+        'progress': 0,
+        'attempts': 0,
+        'created_on': datetime.now()
+    })
+
+    db.session.add(job_)
+    db.session.commit()
+
+    runner_ = runners.get(os.getpid())
+    if runner_ is not None:
+        runner_.wake.set()
+
+    return job_
+
+
+def remove_source(job):
+    """Remove the uploaded file of a finished job."""
+    try:
+        os.remove(job.source)
+    except OSError as error:
+        logger.warning('Could not remove upload `%s`: %s' %
+                       (job.source, error))
+
+
+def fail(job, error):
+    """Retry a job after a delay, or fail it and its Image.
+
+    Jobs are retried until they were attempted `MAX_ATTEMPTS` times, each
+    retry waiting twice as long as the previous one.
+
+    :param object job: The ImageJob that failed
+    :param string error: The reason the job failed
+    """
+    job.error = error
+
+    if (job.attempts or 0) >= MAX_ATTEMPTS:
+        job.status = 'failed'
+        job.finished_on = datetime.now()
+        job.image.status = 'failed'
+        remove_source(job)
+    else:
+        job.status = 'pending'
+        job.not_before = datetime.now() + timedelta(
+            seconds=RETRY_SECONDS * 2 ** ((job.attempts or 1) - 1))
+
+    db.session.commit()
+
+
+def claim():
+    """Claim the oldest job no other runner is processing.
+
+    Pending jobs due for an attempt, and jobs abandoned by their runner, are
+    selected with `FOR UPDATE SKIP LOCKED` so that concurrent runners never
+    claim the same job. Abandoned jobs out of attempts are failed instead.
+
+    :return object: The claimed ImageJob, or None
+    """
+    while True:
+        now_ = datetime.now()
+        stale_ = now_ - timedelta(seconds=STALE_SECONDS)
+
+        job_ = ImageJob.query.filter(or_(
+            and_(ImageJob.status == 'pending',
+                 or_(ImageJob.not_before.is_(None),
+                     ImageJob.not_before <= now_)),
+            and_(ImageJob.status == 'processing',
+                 ImageJob.started_on < stale_)
+        )).order_by(ImageJob.id).with_for_update(skip_locked=True).first()
+
+        if job_ is None:
+            db.session.rollback()
+            return None
+
+        if job_.status == 'pending' or \
+                (job_.attempts or 0) < MAX_ATTEMPTS:
+            break
+
+        logger.error('Image job %d was abandoned %d times' %
+                     (job_.id, job_.attempts))
+        fail(job_, 'The job was abandoned by its runner')
+
+    job_.status = 'processing'
+    job_.progress = 0
+    job_.attempts = (job_.attempts or 0) + 1
+    job_.started_on = datetime.now()
+    job_.not_before = None
+    db.session.commit()
+
+    return job_
+
+
+def process(job):
+    """Create the renditions of a claimed job and complete its Image.
+
+    Failed jobs are retried later, see `fail`.
+
+    :param object job: The claimed ImageJob
+    """
+    def progress(saved, total):
+        job.progress = int(100 * saved / total)
+        db.session.commit()
+
+    try:
+        with open(job.source, 'rb') as stream_:
+            output_ = upload_image(FileStorage(stream=stream_,
+                                               filename=job.image.filename),
+                                   progress=progress)
+    except Exception as error:
+        db.session.rollback()
+        logger.error('Image job %d failed: %s' % (job.id, error))
+
+        fail(job, str(error))
+        return
+
+    for key_, value_ in output_.items():
+        setattr(job.image, key_, value_)
+
+    job.image.status = 'complete'
+    job.status = 'complete'
+    job.progress = 100
+    job.error = None
+    job.finished_on = datetime.now()
+    db.session.commit()
+
+    remove_source(job)
+
+
+class JobRunner(object):
+    """Process image jobs in a background thread of this process."""
+
+    def __init__(self, app):
+        """Start the runner.
+
+        :param object app: The Flask application
+        """
+        self.app = app
+        self.wake = threading.Event()
+        self.thread = threading.Thread(target=self.run,
+                                       name='rith-image-jobs')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run_once(self):
+        """Process a single job.
+
+        :return bool: True when a job was claimed
+        """
+        with self.app.app_context():
+            job_ = claim()
+            if job_ is None:
+                return False
+
+            logger.info('Processing image job %d' % (job_.id))
+            process(job_)
+            return True
+
+    def run(self):
+        """Process jobs as long as the process runs."""
+        while True:
+            try:
+                if self.run_once():
+                    continue
+            except Exception as error:
+                logger.error('Image job runner failed: %s' % (error))
+
+            self.wake.wait(POLL_SECONDS)
+            self.wake.clear()
+
+
+@module.before_app_request
+def start_runner():
+    """Start the job runner of this process when `MEDIA_ASYNC` is set.
+
+    Runners are started by the first request a process serves, so that
+    every worker forked by the server processes jobs.
+    """
+    if not current_app.config.get('MEDIA_ASYNC', False) or \
+            os.getpid() in runners:
+        return
+
+    with runners_lock:
+        if os.getpid() not in runners:
+            runners.clear()
+            runners[os.getpid()] = JobRunner(
+                current_app._get_current_object())
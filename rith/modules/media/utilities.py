@@ -18,19 +18,60 @@ under the License.
 
 import sys
 import os.path
+import threading
+import time
 
 
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import wait
 from uuid import uuid4
 from werkzeug import secure_filename
 from wand.image import Image
 
 
+from flask import abort
 from flask import current_app
 
 
 from rith import logger
 
 
+"""Square renditions from largest to smallest, each resized from the one
+before it: the key, filename suffix, and size in pixels."""
+RENDITIONS = [
+    ('square_retina', '_square@2x', 1280),
+    ('square', '_square', 640),
+    ('thumbnail_retina', '_thumbnail@2x', 512),
+    ('thumbnail', '_thumbnail', 256),
+    ('icon_retina', '_icon@2x', 128),
+    ('icon', '_icon', 64),
+]
+
+
+"""Seconds an upload may spend encoding its renditions on the worker pool,
+unless configured otherwise with `MEDIA_TIMEOUT`."""
+ENCODE_TIMEOUT = 30
+
+
+"""The JPEG quality of every saved image."""
+QUALITY = 75
+
+
+"""Colorspaces renditions keep, renditions of images in other colorspaces
+(e.g., CMYK) are converted to sRGB so that the RGB pixels handed to the
+worker pool, and the renditions saved serially, have the same colors."""
+RGB_COLORSPACES = [
+    'rgb',
+    'srgb',
+]
+
+
+"""The media worker pool of this process and the number of uploads it may
+still accept, created by `worker_pool`."""
+pools = {}
+pools_lock = threading.Lock()
+
+
 def allowed_file(filename):
     """Ensure file upload being attempted is of an allowed file type."""
     logger.debug('Checking if file name is valid')
@@ -39,13 +80,9 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1] in ALLOWED_EXTENSIONS
 
 
-def thumbnail(image, width=1280, height=1280):
-    """Create a square thumbnail based on an image, a width, and height."""
-    logger.debug('Thumbnail creation started')
-
-    dst_landscape = 1 > image.width / image.height
-
-    wh = image.width if dst_landscape else image.height
+def square(image):
+    """Crop an image to the largest centered square."""
+    wh = min(image.width, image.height)
 
     image.crop(
         left=int((image.width - wh) / 2),
@@ -54,6 +91,13 @@ def thumbnail(image, width=1280, height=1280):
         height=int(wh)
     )
 
+
+def thumbnail(image, width=1280, height=1280):
+    """Create a square thumbnail based on an image, a width, and height."""
+    logger.debug('Thumbnail creation started')
+
+    square(image)
+
     image.resize(width, height)
     logger.debug('[MEDIA utilities:thumbnail] Thumbnail creation completed')
 
@@ -76,10 +120,249 @@ def create(image, name, suffix, extension, directory, size={}):
     return filename
 
 
-def upload_image(source_file, acl='public-read'):
-    """Upload File Object."""
+def save(image, name, suffix, extension, directory):
+    """Save an image as is, without copying it."""
+    filename = name + suffix + extension
+    filepath = os.path.join(directory, 'images', filename)
+
+    image.save(filename=filepath)
+
+    logger.debug('Image creation completed with file:`%s`' % (filename))
+    return filename
+
+
+def cascade(image, name, extension, directory, output=save):
+    """Create every square rendition of an image.
+
+    The image is cropped to a square once, each rendition is then resized
+    from the previous, larger, rendition instead of the full resolution
+    image. Renditions larger than the square are resized from the square.
+    Renditions of images in other colorspaces (e.g., CMYK) are converted to
+    sRGB, the ICC profile of the source no longer describes their pixels.
+    Every rendition is handed to `output`, which saves it by default.
+    """
+    logger.debug('[MEDIA utilities:cascade] Rendition cascade started')
+
+    filenames = {}
+
+    with image.clone() as rendition:
+        square(rendition)
+
+        if rendition.colorspace not in RGB_COLORSPACES:
+            rendition.transform_colorspace('srgb')
+            if 'icc' in rendition.profiles:
+                del rendition.profiles['icc']
+
+        for key, suffix, size in RENDITIONS:
+            if size > rendition.width:
+                with rendition.clone() as upscaled:
+                    upscaled.resize(size, size)
+                    filenames[key] = output(upscaled, name, suffix,
+                                            extension, directory)
+                continue
+
+            rendition.resize(size, size)
+            filenames[key] = output(rendition, name, suffix, extension,
+                                    directory)
+
+    return filenames
+
+
+def encode(blob, width, height, profile, filepath):
+    """Encode and save the raw RGB pixels of a rendition as a JPEG.
+
+    Runs on the media worker pool, every argument is plain data.
+    """
+    with Image(blob=blob, format='rgb', width=width, height=height,
+               depth=8) as image:
+        if profile:
+            image.profiles['icc'] = profile
+
+        image.format = 'jpeg'
+        image.compression_quality = QUALITY
+        image.save(filename=filepath)
+
+
+def abort_timeout():
+    """Abort an upload whose renditions were not encoded in time."""
+    logger.error('Image renditions were not encoded in time')
+    abort(503, 'The image could not be processed in time, please try again')
+
+
+def verify_deadline(deadline):
+    """Abort an upload once the time it may spend encoding has passed.
+
+    :param float deadline: The `time.monotonic` by which every rendition
+        is encoded
+    """
+    if time.monotonic() > deadline:
+        abort_timeout()
+
+
+def remove(filepath):
+    """Remove a file written by an abandoned upload, if it was written."""
+    try:
+        os.remove(filepath)
+    except OSError:
+        pass
+
+
+def release_when_done(futures, semaphore):
+    """Release a worker pool slot once every future has finished.
+
+    Running futures cannot be cancelled, the slot of an abandoned upload is
+    only released once the pool has stopped working on it.
+
+    :param list futures: The futures of the upload
+    :param object semaphore: The semaphore counting the uploads the pool
+        may still accept
+    """
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def done(future):
+        with lock:
+            remaining[0] -= 1
+            finished = remaining[0] == 0
+
+        if finished:
+            semaphore.release()
+
+    if not futures:
+        semaphore.release()
+
+    for future in futures:
+        future.add_done_callback(done)
+
+
+def worker_pool():
+    """Retrieve the media worker pool of this process.
+
+    The pool has `MEDIA_WORKERS` processes, none when it is not set. Its
+    workers are started before the process decodes its first image, so
+    that they do not inherit the ImageMagick thread pools.
+
+    :return tuple: The ProcessPoolExecutor and the semaphore counting the
+        uploads it may still accept, or None
+    """
+    size = current_app.config.get('MEDIA_WORKERS', 0)
+    if not size:
+        return None
+
+    with pools_lock:
+        if os.getpid() not in pools:
+            """A pool inherited from a parent process belongs to it."""
+            pools.clear()
+
+            executor = ProcessPoolExecutor(size)
+            wait([executor.submit(os.getpid) for _ in range(size)])
+
+            pools[os.getpid()] = (executor, threading.BoundedSemaphore(size))
+
+        return pools[os.getpid()]
+
+
+def discard_pool(executor):
+    """Forget a broken worker pool, the next upload creates a new one."""
+    with pools_lock:
+        if pools.get(os.getpid(), (None,))[0] is executor:
+            del pools[os.getpid()]
+
+    executor.shutdown(wait=False)
+
+
+def parallel_cascade(pool, image, name, extension, directory, deadline):
+    """Create every square rendition of an image on the worker pool.
+
+    Renditions are resized on the request thread and their pixels handed to
+    the pool, which encodes them in parallel. Renditions the pool fails to
+    encode are encoded on the request thread. The pool slot the caller
+    acquired is released once the pool has finished every rendition.
+
+    :param tuple pool: The ProcessPoolExecutor and its semaphore
+    :param float deadline: The `time.monotonic` by which every rendition
+        is encoded, or abort
+
+    :return tuple: The filenames by rendition key, and the function waiting
+        for the renditions to be encoded, or with `abandon` removing them
+    """
+    executor = pool[0]
+    jobs = []
+
+    def output(rendition, name, suffix, extension, directory):
+        filename = name + suffix + extension
+
+        rendition.depth = 8
+        jobs.append((rendition.make_blob('rgb'), rendition.width,
+                     rendition.height, rendition.profiles.get('icc'),
+                     os.path.join(directory, 'images', filename)))
+
+        return filename
+
+    try:
+        filenames = cascade(image, name, extension, directory, output)
+    except Exception:
+        pool[1].release()
+        raise
+
+    try:
+        futures = [executor.submit(encode, *job) for job in jobs]
+    except Exception:
+        logger.warning('Media worker pool is unavailable, encoding serially')
+        discard_pool(executor)
+        futures = []
+
+    release_when_done(futures, pool[1])
+
+    def finish(abandon=False):
+        if abandon:
+            for index, job in enumerate(jobs):
+                if index >= len(futures) or futures[index].cancel():
+                    remove(job[4])
+                else:
+                    futures[index].add_done_callback(
+                        lambda future, filepath=job[4]: remove(filepath))
+            return
+
+        done, pending = wait(futures,
+                             timeout=max(0, deadline - time.monotonic()))
+
+        if pending:
+            abort_timeout()
+
+        for job, future in zip(jobs, futures):
+            try:
+                future.result()
+            except Exception as error:
+                logger.warning('Media worker failed, encoding serially: %s'
+                               % (error))
+                discard_pool(executor)
+                verify_deadline(deadline)
+                encode(*job)
+
+        for job in jobs[len(futures):]:
+            verify_deadline(deadline)
+            encode(*job)
+
+    return filenames, finish
+
+
+def upload_image(source_file, acl='public-read', progress=None):
+    """Upload File Object.
+
+    :param function progress: Called with the number of images saved and
+        the total once the original and each rendition are saved
+    """
     logger.debug('[MEDIA utilities:upload_image] Image upload process started')
 
+    saved = []
+
+    def report(filename):
+        saved.append(filename)
+        if progress is not None:
+            progress(len(saved), len(RENDITIONS) + 1)
+        return filename
+
     basepath = current_app.config['MEDIA_BASE_PATH'] + 'images/'
     directory = current_app.config['MEDIA_DIRECTORY']
 
@@ -91,10 +374,14 @@ def upload_image(source_file, acl='public-read'):
 
     destination_filename = uuid4().hex
 
+    deadline = time.monotonic() + current_app.config.get('MEDIA_TIMEOUT',
+                                                         ENCODE_TIMEOUT)
+    pool = worker_pool()
+
     try:
         image = Image(file=source_file)
         image.format = 'jpeg'
-        image.compression_quality = 75
+        image.compression_quality = QUALITY
         logger.debug('Completed creating image object `%s`' % (image))
     except Exception:
         logger.debug('Couldn\'t create transformable image object')
@@ -126,17 +413,6 @@ def upload_image(source_file, acl='public-read'):
         elif _orientation == '8':
             image.rotate(270)
 
-        """
-        ORIGINAL:
-        """
-        original_filename = create(**{
-            'image': image,
-            'name': destination_filename,
-            'suffix': '_original',
-            'extension': source_extension,
-            'directory': directory
-        })
-
         logger.debug('Completed rotating original orientation')
     except Exception:
         logger.debug('Exception raised trying to rotate original orientation')
@@ -144,99 +420,55 @@ def upload_image(source_file, acl='public-read'):
 
     try:
         """
-        SQUARE: We save this at @2x of 640px (1280px)
+        ORIGINAL, and the SQUARE, THUMBNAIL, and ICON renditions, each saved
+        at @2x too. With a media worker pool the renditions are encoded in
+        parallel while the original is saved, uploads arriving while the pool
+        is busy are saved serially. Either way the upload is abandoned once
+        `MEDIA_TIMEOUT` has passed.
         """
-        square_retina_filename = create(**{
+        original = {
             'image': image,
             'name': destination_filename,
-            'suffix': '_square@2x',
-            'extension': source_extension,
-            'size': {
-                'width': 1280,
-                'height': 1280
-            },
-            'directory': directory
-        })
-
-        square_filename = create(**{
-            'image': image,
-            'name': destination_filename,
-            'suffix': '_square',
-            'extension': source_extension,
-            'size': {
-                'width': 640,
-                'height': 640
-            },
-            'directory': directory
-        })
-
-        """
-        THUMBNAIL: We save this at @2x of 256px (512px)
-        """
-        thumbnail_retina_filename = create(**{
-            'image': image,
-            'name': destination_filename,
-            'suffix': '_thumbnail@2x',
-            'extension': source_extension,
-            'size': {
-                'width': 512,
-                'height': 512
-            },
-            'directory': directory
-        })
-
-        thumbnail_filename = create(**{
-            'image': image,
-            'name': destination_filename,
-            'suffix': '_thumbnail',
-            'extension': source_extension,
-            'size': {
-                'width': 256,
-                'height': 256
-            },
-            'directory': directory
-        })
-
-        """
-        Icon: We save this at @2x of 64px (128px)
-        """
-        icon_retina_filename = create(**{
-            'image': image,
-            'name': destination_filename,
-            'suffix': '_icon@2x',
+            'suffix': '_original',
             'extension': source_extension,
-            'size': {
-                'width': 128,
-                'height': 128
-            },
             'directory': directory
-        })
+        }
 
-        icon_filename = create(**{
-            'image': image,
-            'name': destination_filename,
-            'suffix': '_icon',
-            'extension': source_extension,
-            'size': {
-                'width': 64,
-                'height': 64
-            },
-            'directory': directory
-        })
+        if pool is not None and pool[1].acquire(blocking=False):
+            filenames, finish = parallel_cascade(
+                pool, image, destination_filename, source_extension,
+                directory, deadline)
+            try:
+                original_filename = report(save(**original))
+                finish()
+            except Exception:
+                finish(abandon=True)
+                raise
+
+            for key, _, _ in RENDITIONS:
+                report(filenames[key])
+        else:
+            def output(*args):
+                verify_deadline(deadline)
+                return report(save(*args))
+
+            original_filename = report(save(**original))
+            filenames = cascade(image, destination_filename,
+                                source_extension, directory, output)
 
         logger.debug('Image upload process complete')
-        return {
-            'original': os.path.join(basepath, original_filename),
-            'square': os.path.join(basepath, square_filename),
-            'square_retina': os.path.join(basepath, square_retina_filename),
-            'thumbnail': os.path.join(basepath, thumbnail_filename),
-            'thumbnail_retina': os.path.join(basepath,
-                                             thumbnail_retina_filename),
-            'icon': os.path.join(basepath, icon_filename),
-            'icon_retina': os.path.join(basepath, icon_retina_filename)
+        output = {
+            'original': os.path.join(basepath, original_filename)
         }
+
+        for key, filename in filenames.items():
+            output[key] = os.path.join(basepath, filename)
+
+        return output
     except Exception:
         logger.debug('Exception raised trying to create multiple formats')
+        for filename in saved:
+            remove(os.path.join(directory, 'images', filename))
         raise
 
 
@@ -24,27 +24,95 @@ from flask import current_app
 from flask import jsonify
 from flask import request
 from flask import send_from_directory
+from flask import url_for
 
 
 from rith import db
 from rith import logger
 from rith import oauth
+from rith import responses
+from rith import serializers
 
 
 from . import module
 
 
+from .jobs import enqueue
 from .utilities import upload_file
 from .utilities import upload_image
 
 
 from rith.schema.file import File
 from rith.schema.image import Image
+from rith.schema.image_job import ImageJob
 
 
 from rith.permissions import verify_authorization
 
 
+"""The fields of the Image returned once an image is uploaded."""
+IMAGE_FIELDS = [
+    'id',
+    'created_on',
+    'modified_on',
+    'creator_id',
+    'original',
+    'square',
+    'square_retina',
+    'thumbnail',
+    'thumbnail_retina',
+    'icon',
+    'icon_retina',
+    'filename',
+    'filetype',
+    'filesize',
+    'caption',
+    'caption_link',
+    'status',
+]
+
+
+"""The fields of the ImageJob reported by the job status endpoint."""
+JOB_FIELDS = [
+    'id',
+    'image_id',
+    'status',
+    'progress',
+    'attempts',
+    'error',
+    'not_before',
+    'created_on',
+    'started_on',
+    'finished_on',
+]
+
+
+def prefers_async():
+    """Determine whether the client asked for an asynchronous response.
+
+    Clients opt in with the `Prefer: respond-async` header (RFC 7240), which
+    is honored when `MEDIA_ASYNC` is set.
+    """
+    preferences_ = [preference_.strip().lower() for preference_ in
+                    request.headers.get('Prefer', '').split(',')]
+
+    return current_app.config.get('MEDIA_ASYNC', False) and \
+        'respond-async' in preferences_
+
+
+"""The fields of the File returned once a file is uploaded."""
+FILE_FIELDS = [
+    'id',
+    'created_on',
+    'modified_on',
+    'creator_id',
+    'filepath',
+    'filename',
+    'filetype',
+    'filesize',
+]
+
+
 @module.route('/v1/media/image', methods=['POST'])
 @oauth.require_oauth()
 def image_post(oauth_request):
@@ -65,6 +133,25 @@ def image_post(oauth_request):
     _file = request.files['image']
     logger.debug('request.files with value of `%s`' % (_file))
 
+    """
+    Accept the upload and create the renditions in the background, when the
+    client prefers an asynchronous response
+    """
+    if prefers_async():
+        job = enqueue(_file, oauth_request.user)
+        location = url_for('.job_get', job_id=job.id)
+
+        logger.debug('Image job %d accepted' % (job.id))
+        return responses.status_202({
+            'job': job.id,
+            'image': job.image_id,
+            'status': job.status,
+            'location': location
+        }), 202, {
+            'Location': location,
+            'Preference-Applied': 'respond-async'
+        }
+
     """
     Upload the file to our server
     """
@@ -94,7 +181,8 @@ def image_post(oauth_request):
         'filetype': _file.mimetype,
         'filesize': _file.content_length,
         'created_on': datetime.now().isoformat(),
-        'creator_id': oauth_request.user.id
+        'creator_id': oauth_request.user.id,
+        'status': 'complete'
     })
     logger.debug('Image object created successfully `%s`' % (media))
 
@@ -106,29 +194,35 @@ def image_post(oauth_request):
     """
     Return the finalized Image resource
     """
-    _return_value = {
-        'id': media.id,
-        'created_on': media.created_on,
-        'modified_on': media.modified_on,
-        'creator_id': media.creator_id,
-        'original': media.original,
-        'square': media.square,
-        'square_retina': media.square_retina,
-        'thumbnail': media.thumbnail,
-        'thumbnail_retina': media.thumbnail_retina,
-        'icon': media.icon,
-        'icon_retina': media.icon_retina,
-        'filename': media.filename,
-        'filetype': media.filetype,
-        'filesize': media.filesize,
-        'caption': media.caption,
-        'caption_link': media.caption_link
-    }
+    _return_value = serializers.to_dict(media, include=IMAGE_FIELDS)
 
     logger.debug('Completed processing image processing request')
     return jsonify(**_return_value), 200
 
 
+@module.route('/v1/media/jobs/<int:job_id>', methods=['GET'])
+@oauth.require_oauth()
+def job_get(oauth_request, job_id):
+    """Report the progress of an asynchronous image upload.
+
+    Only the user who uploaded the image may follow its job.
+
+    :param int job_id: The id returned when the upload was accepted
+
+    :return object: The ImageJob, and its Image once complete
+    """
+    job = ImageJob.query.get(job_id)
+
+    if job is None or job.creator_id != oauth_request.user.id:
+        abort(404, 'The image job does not exist')
+
+    _return_value = serializers.to_dict(job, include=JOB_FIELDS)
+    _return_value['image'] = serializers.to_dict(job.image,
+                                                 include=IMAGE_FIELDS)
+
+    return jsonify(**_return_value), 200
+
+
 @module.route('/v1/media/file', methods=['POST'])
 @oauth.require_oauth()
 def file_post(oauth_request):
@@ -168,13 +262,4 @@ def file_post(oauth_request):
     """
     Return the finalized Image resource
     """
-    return jsonify(**{
-        'id': media.id,
-        'created_on': media.created_on,
-        'modified_on': media.modified_on,
-        'creator_id': media.creator_id,
-        'filepath': media.filepath,
-        'filename': media.filename,
-        'filetype': media.filetype,
-        'filesize': media.filesize
-    }), 200
+    return jsonify(**serializers.to_dict(media, include=FILE_FIELDS)), 200
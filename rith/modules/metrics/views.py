@@ -0,0 +1,45 @@
+"""Arithmetic Metrics Module.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+from flask import abort
+from flask import current_app
+
+
+from rith import metrics
+
+
+from . import module
+
+
+@module.route('/metrics', methods=['GET'])
+def metrics_get():
+    """Report request and connection pool metrics.
+
+    Served in the Prometheus text exposition format, summed across every
+    worker sharing the `METRICS_DIRECTORY`. The endpoint is not authorized,
+    restrict access to it at the proxy.
+    """
+    if not current_app.config.get('METRICS_ENABLED', False):
+        abort(404)
+
+    aggregated_ = metrics.aggregate(metrics.collect(
+        current_app.config.get('METRICS_DIRECTORY')))
+
+    return current_app.response_class(
+        metrics.exposition(aggregated_),
+        content_type='text/plain; version=0.0.4; charset=utf-8')
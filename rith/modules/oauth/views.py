@@ -23,6 +23,7 @@ from datetime import timedelta
 from flask import abort
 from flask import after_this_request
 from flask import current_app
+from flask import g
 from flask import jsonify
 from flask import request
 from flask import render_template
@@ -251,9 +252,17 @@ def load_token(access_token=None, refresh_token=None):
     See the official Flask OAuthlib documentation for more information
     https://flask-oauthlib.readthedocs.org/en/latest/oauth2.html\
     #token-getter-and-setter
+
+    Access tokens are remembered for the rest of the application context, so
+    that the sub-requests of a batch request are authorized with a single
+    lookup.
     """
     if access_token:
-        return Token.query.filter_by(access_token=access_token).first()
+        tokens_ = g.setdefault('oauth_tokens', {})
+        if access_token not in tokens_:
+            tokens_[access_token] = Token.query.\
+                filter_by(access_token=access_token).first()
+        return tokens_[access_token]
     elif refresh_token:
         return Token.query.filter_by(refresh_token=refresh_token).first()
 
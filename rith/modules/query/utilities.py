@@ -0,0 +1,585 @@
+"""Arithmetic Query Module.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+import json
+import re
+
+
+from flask import abort
+from flask import current_app
+from flask import g
+from flask_restless import helpers
+from sqlalchemy import inspect
+
+
+from rith import db
+from rith import scope
+from rith.includes import available_relationships
+from rith.serializers import serializer
+from rith.serializers import write_only_fields
+
+
+"""The deepest relationship nesting a query may select, unless configured
+otherwise with `QUERY_MAX_DEPTH`."""
+MAX_DEPTH = 4
+
+
+"""The largest estimated number of rows a query may select, unless
+configured otherwise with `QUERY_MAX_COST`."""
+MAX_COST = 5000
+
+
+"""The number of rows a collection relationship is assumed to hold for
+every parent row when estimating the cost of a query."""
+COLLECTION_FANOUT = 10
+
+
+"""The braces and brackets a query may nest beyond its deepest selection,
+leaving room for the lists and objects of `filters` arguments."""
+NESTING_MARGIN = 8
+
+
+"""The number of rows per collection, unless the client requests fewer."""
+MAX_RESULTS_PER_PAGE = 100
+
+
+"""Arguments accepted by a collection selected at the root of a query."""
+ROOT_ARGUMENTS = [
+    'id',
+    'filters',
+    'order_by',
+    'limit',
+    'offset',
+]
+
+
+"""Tokens of the query language, commas are insignificant as in GraphQL."""
+TOKENS = re.compile(r'''
+    (?P<ignored>[\s,]+|\#[^\n]*)|
+    (?P<punctuator>[{}()\[\]:])|
+    (?P<name>[_A-Za-z][_0-9A-Za-z]*)|
+    (?P<number>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)|
+    (?P<string>"(?:[^"\\\n]|\\.)*")
+''', re.VERBOSE)
+
+
+"""Names parsed as constant values."""
+CONSTANTS = {
+    'true': True,
+    'false': False,
+    'null': None,
+}
+
+
+class QueryError(ValueError):
+    """A query that cannot be parsed or is not allowed by the schema."""
+
+
+def tokenize(document):
+    """Split a query document into tokens.
+
+    :param string document: The query document
+
+    :return list: The kind and text of every significant token
+    """
+    tokens_ = []
+    position_ = 0
+
+    while position_ < len(document):
+        match_ = TOKENS.match(document, position_)
+        if match_ is None:
+            raise QueryError('Unexpected character `%s` at position %d' %
+                             (document[position_], position_))
+
+        if match_.lastgroup != 'ignored':
+            tokens_.append((match_.lastgroup, match_.group()))
+
+        position_ = match_.end()
+
+    return tokens_
+
+
+class Parser(object):
+    """Parse the subset of GraphQL understood by the query endpoint.
+
+    A document holds a single, optionally named, `query` operation made of
+    fields with optional aliases, arguments and nested selections. Variables,
+    fragments and directives are not supported.
+    """
+
+    def __init__(self, document, max_nesting=MAX_DEPTH + NESTING_MARGIN):
+        """Tokenize a query document.
+
+        :param string document: The query document
+        :param int max_nesting: The deepest braces and brackets may nest
+        """
+        self.tokens = tokenize(document)
+        self.position = 0
+        self.nesting = 0
+        self.max_nesting = max_nesting
+
+    def peek(self):
+        """Look at the next token without consuming it."""
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None)
+
+    def take(self, kind=None, text=None):
+        """Consume the next token, verifying its kind and text.
+
+        :param string kind: The expected kind of token
+        :param string text: The expected text of the token
+
+        :return string: The text of the token
+        """
+        kind_, text_ = self.peek()
+
+        if kind_ is None or (kind is not None and kind_ != kind) or \
+                (text is not None and text_ != text):
+            raise QueryError('Expected `%s` but found `%s`' %
+                             (text or kind, text_ or 'the end of the query'))
+
+        self.position += 1
+        return text_
+
+    def accept(self, text):
+        """Consume the next token when it is the punctuator `text`."""
+        if self.peek() == ('punctuator', text):
+            self.position += 1
+            return True
+        return False
+
+    def enter(self):
+        """Nest one level deeper, refusing documents nested too deeply.
+
+        The parser recurses once per level, so the limit is checked while
+        parsing rather than after the selections are built.
+        """
+        self.nesting += 1
+
+        if self.nesting > self.max_nesting:
+            raise QueryError('The query may nest at most %d levels' %
+                             (self.max_nesting))
+
+    def leave(self):
+        """Return from a nested level."""
+        self.nesting -= 1
+
+    def document(self):
+        """Parse the query document.
+
+        :return list: The selections at the root of the query
+        """
+        if self.peek() == ('name', 'query'):
+            self.take()
+            if self.peek()[0] == 'name':
+                self.take()
+
+        selections_ = self.selection_set()
+
+        if self.peek()[0] is not None:
+            raise QueryError('A query may contain a single operation')
+
+        return selections_
+
+    def selection_set(self):
+        """Parse the fields between braces."""
+        self.take('punctuator', '{')
+        self.enter()
+
+        selections_ = []
+        while not self.accept('}'):
+            selections_.append(self.field())
+
+        if not selections_:
+            raise QueryError('A selection may not be empty')
+
+        self.leave()
+        return selections_
+
+    def field(self):
+        """Parse a field with its alias, arguments and selections."""
+        name_ = self.take('name')
+        alias_ = name_
+
+        if self.accept(':'):
+            name_ = self.take('name')
+
+        arguments_ = {}
+        if self.accept('('):
+            while not self.accept(')'):
+                argument_ = self.take('name')
+                self.take('punctuator', ':')
+                arguments_[argument_] = self.value()
+
+        selections_ = None
+        if self.peek() == ('punctuator', '{'):
+            selections_ = self.selection_set()
+
+        return {
+            'name': name_,
+            'alias': alias_,
+            'arguments': arguments_,
+            'selections': selections_
+        }
+
+    def value(self):
+        """Parse a constant argument value."""
+        kind_, text_ = self.peek()
+
+        if self.accept('['):
+            self.enter()
+            values_ = []
+            while not self.accept(']'):
+                values_.append(self.value())
+            self.leave()
+            return values_
+
+        if self.accept('{'):
+            self.enter()
+            values_ = {}
+            while not self.accept('}'):
+                key_ = self.take('name')
+                self.take('punctuator', ':')
+                values_[key_] = self.value()
+            self.leave()
+            return values_
+
+        self.take()
+
+        if kind_ == 'string':
+            return json.loads(text_)
+
+        if kind_ == 'number':
+            return json.loads(text_)
+
+        if kind_ == 'name':
+            return CONSTANTS.get(text_, text_)
+
+        raise QueryError('Unexpected `%s`' % (text_))
+
+
+def parse(document, max_depth=MAX_DEPTH):
+    """Parse a query document.
+
+    :param string document: The query document
+    :param int max_depth: The deepest nesting of selections allowed
+
+    :return list: The selections at the root of the query
+    """
+    return Parser(document, max_depth + NESTING_MARGIN).document()
+
+
+def registered_collection(Model):
+    """Find the collection that serves a model.
+
+    :param object Model: The SQLAlchemy model
+
+    :return tuple: The name and collection, or None and None
+    """
+    for name_, collection_ in \
+            current_app.extensions.get('collections', {}).items():
+        if collection_['model'] is Model:
+            return name_, collection_
+
+    return None, None
+
+
+def readable_fields(Model, arguments):
+    """List the columns an endpoint serializes for a model.
+
+    :param object Model: The SQLAlchemy model
+    :param dict arguments: The Flask Restless arguments of the endpoint
+
+    :return list: The names of the readable columns
+    """
+    include_columns_ = arguments.get('include_columns')
+    exclude_columns_ = arguments.get('exclude_columns') or []
+    write_only_ = write_only_fields(Model)
+
+    return [key_ for key_ in inspect(Model).column_attrs.keys()
+            if not key_.startswith('__') and
+            key_ not in helpers.COLUMN_BLACKLIST and
+            key_ not in write_only_ and
+            key_ not in exclude_columns_ and
+            (include_columns_ is None or key_ in include_columns_)]
+
+
+def describe(Model, arguments):
+    """Describe the type of a model in the query schema.
+
+    :param object Model: The SQLAlchemy model
+    :param dict arguments: The Flask Restless arguments of the endpoint
+
+    :return dict: The readable fields and relationships of the model
+    """
+    mapper_ = inspect(Model)
+    relationships_ = {}
+
+    for key_ in available_relationships(Model, arguments):
+        property_ = mapper_.relationships[key_]
+        relationships_[key_] = {
+            'type': property_.mapper.class_.__name__,
+            'collection': registered_collection(property_.mapper.class_)[0],
+            'list': property_.uselist
+        }
+
+    return {
+        'fields': readable_fields(Model, arguments),
+        'relationships': relationships_
+    }
+
+
+def schema():
+    """Build the query schema from the registered collections.
+
+    :return dict: The type of every collection, keyed by collection name
+    """
+    schema_ = {}
+
+    for name_, collection_ in \
+            current_app.extensions.get('collections', {}).items():
+        Model = collection_['model']
+        schema_[name_] = dict(describe(Model, collection_['arguments']), **{
+            'type': Model.__name__,
+            'display_name': getattr(Model, '__def__', {}).get('display_name')
+        })
+
+    return schema_
+
+
+def arguments_for(Model):
+    """Retrieve the Flask Restless arguments that apply to a model."""
+    collection_ = registered_collection(Model)[1]
+
+    return collection_['arguments'] if collection_ else {}
+
+
+def estimate(Model, arguments, selections, rows, depth, max_depth):
+    """Validate the selections of a model and estimate their cost.
+
+    :param object Model: The SQLAlchemy model being selected
+    :param dict arguments: The Flask Restless arguments of the endpoint
+    :param list selections: The selections of the model
+    :param int rows: The number of rows of the model selected
+    :param int depth: The nesting of the model in the query
+    :param int max_depth: The deepest nesting allowed
+
+    :return int: The estimated number of rows selected
+    """
+    if depth > max_depth:
+        raise QueryError('The query may nest at most %d levels' %
+                         (max_depth))
+
+    if not selections:
+        raise QueryError('Please select the fields of `%s`' %
+                         (Model.__name__))
+
+    fields_ = readable_fields(Model, arguments)
+    relationships_ = available_relationships(Model, arguments)
+    mapper_ = inspect(Model)
+    cost_ = rows
+
+    for selection_ in selections:
+        name_ = selection_['name']
+
+        if name_ in relationships_:
+            if selection_['arguments']:
+                raise QueryError('The `%s` relationship takes no arguments' %
+                                 (name_))
+
+            property_ = mapper_.relationships[name_]
+            Target = property_.mapper.class_
+            rows_ = rows * (COLLECTION_FANOUT if property_.uselist else 1)
+
+            cost_ += estimate(Target, arguments_for(Target),
+                              selection_['selections'], rows_, depth + 1,
+                              max_depth)
+
+        elif name_ in fields_:
+            if selection_['arguments'] or selection_['selections']:
+                raise QueryError('The `%s` field has no selections' %
+                                 (name_))
+
+        else:
+            raise QueryError('`%s` has no readable field `%s`' %
+                             (Model.__name__, name_))
+
+    return cost_
+
+
+def column_key(Model, column):
+    """Find the mapped attribute of a column."""
+    return inspect(Model).get_property_by_column(column).key
+
+
+def batch_load(property_, instances, live=True):
+    """Load a relationship of many instances with a single `IN` query.
+
+    Relationships of a single column, directly or through a secondary table,
+    are batched, others are loaded one instance at a time. When `live` is
+    set, related rows of scoped models are only loaded when they are live.
+
+    :param object property_: The SQLAlchemy relationship property
+    :param list instances: The instances whose relationship is loaded
+    :param bool live: Leave deleted and archived related rows out
+
+    :return dict: The related instance, or list of instances, keyed by the
+        `id` of each instance
+    """
+    Parent = property_.parent.class_
+    Target = property_.mapper.class_
+
+    if property_.secondary is not None:
+        pairs_ = property_.synchronize_pairs
+        target_pairs_ = property_.secondary_synchronize_pairs
+    else:
+        pairs_ = property_.local_remote_pairs
+        target_pairs_ = None
+
+    if len(pairs_) != 1 or (target_pairs_ is not None and
+                            len(target_pairs_) != 1):
+        return dict([(id(instance_), getattr(instance_, property_.key))
+                     for instance_ in instances])
+
+    local_, remote_ = pairs_[0]
+    local_key_ = column_key(Parent, local_)
+
+    keys_ = set([getattr(instance_, local_key_) for instance_ in instances])
+    keys_.discard(None)
+
+    related_ = {}
+
+    if keys_:
+        if target_pairs_ is not None:
+            target_, secondary_ = target_pairs_[0]
+            query_ = db.session.query(remote_, Target).\
+                join(property_.secondary, target_ == secondary_).\
+                filter(remote_.in_(keys_))
+        else:
+            remote_key_ = column_key(Target, remote_)
+            query_ = db.session.query(getattr(Target, remote_key_), Target).\
+                filter(getattr(Target, remote_key_).in_(keys_))
+
+        if live and scope.is_scoped(Target):
+            query_ = query_.filter(scope.criterion(Target))
+
+        if property_.uselist:
+            query_ = query_.order_by(*inspect(Target).primary_key)
+
+        for key_, target_instance_ in query_:
+            if property_.uselist:
+                related_.setdefault(key_, []).append(target_instance_)
+            else:
+                related_[key_] = target_instance_
+
+    empty_ = [] if property_.uselist else None
+
+    return dict([(id(instance_),
+                  related_.get(getattr(instance_, local_key_), empty_))
+                 for instance_ in instances])
+
+
+def resolve(Model, instances, selections, live=True):
+    """Serialize the selections of many instances of a model.
+
+    Every relationship is loaded for all instances at once, so a query
+    issues a single query per selected relationship and nesting level.
+
+    :param object Model: The SQLAlchemy model of the instances
+    :param list instances: The instances to serialize
+    :param list selections: The validated selections of the model
+    :param bool live: Leave deleted and archived related rows out
+
+    :return list: The serialized instances
+    """
+    mapper_ = inspect(Model)
+
+    columns_ = [selection_ for selection_ in selections
+                if selection_['name'] not in mapper_.relationships]
+    serialize_ = serializer(Model, include=sorted(set(
+        [selection_['name'] for selection_ in columns_])))
+
+    results_ = []
+    for instance_ in instances:
+        serialized_ = serialize_(instance_)
+        results_.append(dict([(selection_['alias'],
+                               serialized_[selection_['name']])
+                              for selection_ in columns_]))
+
+    for selection_ in selections:
+        if selection_['name'] not in mapper_.relationships:
+            continue
+
+        property_ = mapper_.relationships[selection_['name']]
+        related_ = batch_load(property_, instances, live)
+
+        targets_ = []
+        for value_ in related_.values():
+            for target_ in (value_ if property_.uselist else [value_]):
+                if target_ is not None:
+                    targets_.append(target_)
+
+        targets_ = list(dict([(id(target_), target_)
+                              for target_ in targets_]).values())
+
+        rendered_ = dict(zip(
+            [id(target_) for target_ in targets_],
+            resolve(property_.mapper.class_, targets_,
+                    selection_['selections'], live)))
+
+        for instance_, result_ in zip(instances, results_):
+            value_ = related_[id(instance_)]
+
+            if property_.uselist:
+                result_[selection_['alias']] = [rendered_[id(target_)]
+                                                for target_ in value_]
+            elif value_ is None:
+                result_[selection_['alias']] = None
+            else:
+                result_[selection_['alias']] = rendered_[id(value_)]
+
+    return results_
+
+
+def reset_globals():
+    """Forget the state stored by the preprocessors of another collection."""
+    for key_ in [key_ for key_ in vars(g) if key_.startswith('data_')]:
+        delattr(g, key_)
+
+
+def search_parameters(arguments):
+    """Create the Flask Restless search parameters of a root selection.
+
+    :param dict arguments: The arguments of the root selection
+
+    :return dict: The search parameters or abort
+    """
+    for argument_ in arguments:
+        if argument_ not in ROOT_ARGUMENTS:
+            abort(400, 'Unknown argument `%s`' % (argument_))
+
+    search_params_ = {}
+
+    for key_ in ['filters', 'order_by']:
+        if key_ in arguments:
+            if not isinstance(arguments[key_], list):
+                abort(400, 'The `%s` must be a list' % (key_))
+            search_params_[key_] = arguments[key_]
+
+    return search_params_
@@ -0,0 +1,257 @@
+"""Arithmetic Query Module.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+from flask import abort
+from flask import current_app
+from flask import jsonify
+from flask import request
+from flask_restless.search import create_query
+from sqlalchemy.exc import SQLAlchemyError
+
+
+from rith import db
+from rith import governor
+from rith import logger
+from rith import scope
+from rith.permissions import verify_collection
+
+
+from . import module
+
+
+from .utilities import estimate
+from .utilities import MAX_COST
+from .utilities import MAX_DEPTH
+from .utilities import MAX_RESULTS_PER_PAGE
+from .utilities import parse
+from .utilities import QueryError
+from .utilities import reset_globals
+from .utilities import resolve
+from .utilities import schema
+from .utilities import search_parameters
+
+
+def verify_enabled():
+    """Abort unless the query endpoint is enabled with `QUERY_ENABLED`."""
+    if not current_app.config.get('QUERY_ENABLED', False):
+        abort(404)
+
+
+def verify_number(arguments, name, default, maximum=None):
+    """Read a non-negative number argument of a root selection.
+
+    :param dict arguments: The arguments of the root selection
+    :param string name: The name of the argument
+    :param int default: The value when the argument is omitted
+    :param int maximum: The largest value returned
+
+    :return int: The number or abort
+    """
+    value_ = arguments.get(name, default)
+
+    if not isinstance(value_, int) or isinstance(value_, bool) or \
+            value_ < 0:
+        abort(400, 'The `%s` must be a positive number' % (name))
+
+    return min(value_, maximum) if maximum is not None else value_
+
+
+def live_scope(collection, query):
+    """Restrict a query to the live rows of a collection.
+
+    :param dict collection: The registered collection
+    :param object query: The SQLAlchemy query of the collection model
+
+    :return object query: The query, restricted when the `live_scope` option
+        of the collection applies to its model
+    """
+    Model = collection['model']
+
+    if not collection['options'].get('live_scope') or \
+            not scope.is_scoped(Model):
+        return query
+
+    return query.filter(scope.criterion(Model))
+
+
+def govern(collection):
+    """Apply the `statement_timeout` of the collection query governor.
+
+    :param dict collection: The registered collection
+    """
+    governor_ = collection['options'].get('query_governor')
+    if governor_:
+        governor.statement_timeout(governor_.get('statement_timeout'))()
+
+
+def select(selection):
+    """Authorize and load the rows of a root selection.
+
+    The request is authorized by the GET_SINGLE preprocessors of the module
+    that defines the collection when an `id` is selected, and by its
+    GET_MANY preprocessors otherwise. Rows are selected within the live
+    scope and `statement_timeout` of the collection, as a Flask Restless
+    request would be.
+
+    :param dict selection: The root selection
+
+    :return tuple: The collection and its selected rows
+    """
+    arguments_ = selection['arguments']
+    search_params_ = search_parameters(arguments_)
+
+    reset_globals()
+
+    if 'id' in arguments_:
+        collection_ = verify_collection(selection['name'], 'GET_SINGLE',
+                                        instance_id=arguments_['id'])
+        Model = collection_['model']
+        govern(collection_)
+
+        instance_ = live_scope(collection_, Model.query.filter(
+            Model.id == arguments_['id'])).first()
+
+        return collection_, [instance_] if instance_ is not None else []
+
+    collection_ = verify_collection(selection['name'],
+                                    search_params=search_params_)
+    Model = collection_['model']
+    govern(collection_)
+
+    limit_ = verify_number(arguments_, 'limit', MAX_RESULTS_PER_PAGE,
+                           MAX_RESULTS_PER_PAGE)
+    offset_ = verify_number(arguments_, 'offset', 0)
+
+    try:
+        query_ = live_scope(collection_, create_query(
+            db.session, Model, search_params_))
+        instances_ = query_.limit(limit_).offset(offset_).all()
+    except (AttributeError, KeyError, TypeError, ValueError,
+            SQLAlchemyError) as error:
+        logger.warning('Query of `%s` failed: %s' %
+                       (selection['name'], error))
+        abort(400, 'The `filters` or `order_by` of `%s` are invalid' %
+              (selection['alias']))
+
+    return collection_, instances_
+
+
+@module.route('/v1/query', methods=['OPTIONS'])
+def query_options():
+    """Define default query preflight check."""
+    return jsonify(**{
+        'meta': {
+            'status': 200
+        }
+    })
+
+
+@module.route('/v1/query', methods=['GET'])
+def query_schema():
+    """Describe the collections, fields and relationships a query selects.
+
+    :return object: The type of every collection, keyed by collection name
+    """
+    verify_enabled()
+
+    return jsonify(**{
+        'meta': {
+            'status': 200
+        },
+        'schema': schema()
+    }), 200
+
+
+@module.route('/v1/query', methods=['POST'])
+def query_post():
+    """Select nested collections and relationships in a single request.
+
+    The query is written in a subset of GraphQL, for example
+
+        { file(limit: 10) { id filename created_by { id email } } }
+
+    Root fields name a collection and accept `id`, `filters`, `order_by`,
+    `limit` and `offset` arguments with the meaning Flask Restless gives
+    them. Relationships are loaded with one query per relationship and
+    nesting level, regardless of the number of rows.
+
+    :param string query: The query document
+
+    :return object: The selected rows, keyed by the alias of each root field
+    """
+    verify_enabled()
+
+    document_ = (request.get_json(silent=True) or {}).get('query')
+    if not isinstance(document_, str):
+        abort(400, 'Please provide the query document as a string `query`')
+
+    max_depth_ = current_app.config.get('QUERY_MAX_DEPTH', MAX_DEPTH)
+    max_cost_ = current_app.config.get('QUERY_MAX_COST', MAX_COST)
+
+    try:
+        selections_ = parse(document_, max_depth_)
+    except QueryError as error:
+        abort(400, str(error))
+
+    collections_ = current_app.extensions.get('collections', {})
+    cost_ = 0
+
+    for selection_ in selections_:
+        collection_ = collections_.get(selection_['name'])
+        if collection_ is None:
+            abort(404, 'The `%s` collection does not exist' %
+                  (selection_['name']))
+
+        rows_ = 1 if 'id' in selection_['arguments'] else \
+            verify_number(selection_['arguments'], 'limit',
+                          MAX_RESULTS_PER_PAGE, MAX_RESULTS_PER_PAGE)
+
+        try:
+            cost_ += estimate(collection_['model'], collection_['arguments'],
+                              selection_['selections'], rows_, 1, max_depth_)
+        except QueryError as error:
+            abort(400, str(error))
+
+    if cost_ > max_cost_:
+        abort(400, 'The query may select at most %d rows, please select'
+                   ' fewer' % (max_cost_))
+
+    data_ = {}
+
+    for selection_ in selections_:
+        collection_, instances_ = select(selection_)
+
+        results_ = resolve(collection_['model'], instances_,
+                           selection_['selections'],
+                           bool(collection_['options'].get('live_scope')))
+
+        if 'id' in selection_['arguments']:
+            results_ = results_[0] if results_ else None
+
+        data_[selection_['alias']] = results_
+
+    logger.debug('Query selected %d root fields at a cost of %d' %
+                 (len(selections_), cost_))
+
+    return jsonify(**{
+        'meta': {
+            'status': 200,
+            'cost': cost_
+        },
+        'data': data_
+    }), 200
@@ -268,3 +268,16 @@ class Seed(Endpoint):
         'allow_functions': True,
         'allow_patch_many': False
     }
+
+    """Arithmetic Endpoint Options.
+
+    These options enable the layers the Application wraps around the
+    Flask-Restless endpoint. See `Endpoint.__options__` for the defaults.
+    """
+    __options__ = {
+        'conditional_requests': True,
+        'cache': {
+            'ttl': 30,
+            'max_size': 256
+        }
+    }
@@ -0,0 +1,143 @@
+"""Arithmetic Search Utilities.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+import base64
+import json
+import re
+
+
+from sqlalchemy import and_
+from sqlalchemy import cast
+from sqlalchemy import func
+from sqlalchemy import Numeric
+from sqlalchemy import or_
+
+
+from rith import db
+from rith import scope
+from rith.schema.file import File
+from rith.schema.image import Image
+from rith.serializers import to_dict
+
+
+"""Collections available to the search endpoint, keyed by collection name."""
+SEARCHABLE = {
+    'file': File,
+    'image': Image
+}
+
+
+"""Columns never returned by the search endpoint."""
+EXCLUDED_COLUMNS = [
+    'search_vector',
+]
+
+
+"""Letters and digits typed by the client, every other character separates
+the terms of the search."""
+TERM_PATTERN = re.compile(r'[^\W_]+', re.UNICODE)
+
+
+def prefix_query(text):
+    """Convert the text typed by a client into a prefix text search query.
+
+    Each term must be present, and the last term typed is usually incomplete,
+    so every term is matched as a prefix (e.g., `sun bea` becomes
+    `sun:* & bea:*`).
+
+    :param string text: The text typed by the client
+
+    :return string: The `to_tsquery` compatible query, or None without terms
+    """
+    terms_ = TERM_PATTERN.findall((text or '').lower())
+
+    if not terms_:
+        return None
+
+    return ' & '.join(['%s:*' % (term_) for term_ in terms_])
+
+
+def encode_cursor(rank, instance_id):
+    """Encode the position of the last result of a page.
+
+    :param float rank: The rank of the last result
+    :param int instance_id: The primary key of the last result
+
+    :return string: An opaque, URL safe, cursor
+    """
+    position_ = json.dumps([rank, instance_id]).encode('utf-8')
+
+    return base64.urlsafe_b64encode(position_).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Decode the position encoded by `encode_cursor`.
+
+    :param string cursor: The opaque cursor supplied by the client
+
+    :return tuple: The rank and primary key, or None when invalid
+    """
+    try:
+        rank_, instance_id_ = json.loads(
+            base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        return float(rank_), int(instance_id_)
+    except (TypeError, ValueError):
+        return None
+
+
+def search(Model, text, limit=25, cursor=None):
+    """Search the metadata of a collection.
+
+    Results are ordered by rank and then by primary key, both descending, so
+    that the position of the last result of a page identifies where the next
+    page begins without an OFFSET. The `real` rank is compared as `numeric`,
+    whose text form round trips through the cursor exactly.
+
+    :param object Model: The SQLAlchemy model to search
+    :param string text: The prefix text search query
+    :param int limit: The number of results per page
+    :param tuple cursor: The rank and primary key of the previous page end
+
+    :return tuple: The page of results and the cursor of the next page
+    """
+    tsquery_ = func.to_tsquery('simple', text)
+    rank_ = cast(func.ts_rank_cd(Model.search_vector, tsquery_), Numeric)
+
+    query_ = db.session.query(Model, rank_).\
+        filter(Model.search_vector.op('@@')(tsquery_)).\
+        filter(scope.criterion(Model, 'live'))
+
+    if cursor is not None:
+        last_rank_, last_id_ = cursor
+        query_ = query_.filter(or_(
+            rank_ < last_rank_,
+            and_(rank_ == last_rank_, Model.id < last_id_)
+        ))
+
+    rows_ = query_.order_by(rank_.desc(), Model.id.desc()).\
+        limit(limit + 1).all()
+
+    next_cursor_ = None
+    if len(rows_) > limit:
+        rows_ = rows_[:limit]
+        next_cursor_ = encode_cursor(float(rows_[-1][1]), rows_[-1][0].id)
+
+    objects_ = [to_dict(instance_, exclude=EXCLUDED_COLUMNS)
+                for instance_, rank_ in rows_]
+
+    return objects_, next_cursor_
@@ -0,0 +1,99 @@
+"""Arithmetic Search Module.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+from flask import abort
+from flask import jsonify
+from flask import request
+
+
+from rith import logger
+from rith.permissions import verify_collection
+
+
+from . import module
+
+
+from .utilities import decode_cursor
+from .utilities import prefix_query
+from .utilities import search
+from .utilities import SEARCHABLE
+
+
+"""The number of results per page, unless the client requests fewer."""
+MAX_RESULTS_PER_PAGE = 100
+
+
+@module.route('/v1/search/<string:collection>', methods=['OPTIONS'])
+def search_options(collection):
+    """Define default search preflight check."""
+    return jsonify(**{
+        'meta': {
+            'status': 200
+        }
+    })
+
+
+@module.route('/v1/search/<string:collection>', methods=['GET'])
+def search_get(collection):
+    """Search the metadata of a collection.
+
+    The request is authorized by the GET_MANY preprocessors of the module
+    that defines the collection, exactly as a list request would be.
+
+    :param string collection: The name of the collection to search
+    :param string q: The text typed by the client
+    :param int limit: The number of results per page
+    :param string cursor: The `next_cursor` of the previous page
+
+    :return object: The ranked page of results
+    """
+    if collection not in SEARCHABLE:
+        abort(404, 'The `%s` collection cannot be searched' % (collection))
+
+    verify_collection(collection, search_params={})
+
+    text_ = prefix_query(request.args.get('q'))
+    if text_ is None:
+        abort(400, 'Please provide the text to search for with `q`')
+
+    try:
+        limit_ = int(request.args.get('limit', 25))
+    except ValueError:
+        abort(400, 'The `limit` must be a number')
+
+    limit_ = max(1, min(limit_, MAX_RESULTS_PER_PAGE))
+
+    cursor_ = None
+    if request.args.get('cursor'):
+        cursor_ = decode_cursor(request.args.get('cursor'))
+        if cursor_ is None:
+            abort(400, 'The `cursor` is invalid')
+
+    logger.debug('Searching `%s` for `%s`' % (collection, text_))
+
+    objects_, next_cursor_ = search(SEARCHABLE[collection], text_, limit_,
+                                    cursor_)
+
+    return jsonify(**{
+        'meta': {
+            'status': 200
+        },
+        'num_results': len(objects_),
+        'next_cursor': next_cursor_,
+        'objects': objects_
+    }), 200
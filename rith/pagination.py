@@ -0,0 +1,152 @@
+"""Arithmetic Approximate Pagination Counts.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+from flask import g
+from flask import has_request_context
+from flask_restless import views
+from sqlalchemy import func
+from sqlalchemy import select
+from sqlalchemy import text
+
+
+from . import logger
+
+
+"""The exact count Flask Restless uses for `num_results` and `total_pages`."""
+exact_count = views.count
+
+
+"""Read the planner row estimate of a table maintained by ANALYZE."""
+ESTIMATE_STATEMENT = text('SELECT reltuples::bigint FROM pg_class '
+                          'WHERE oid = CAST(:table AS regclass)')
+
+
+"""Totals beyond this number of rows are approximated by default."""
+CAP = 10000
+
+
+def estimated_count(session, table):
+    """Retrieve the planner estimate of the number of rows in a table.
+
+    :param object session: The SQLAlchemy session of the request
+    :param string table: The name of the table
+
+    :return int: The estimated number of rows, or None when unavailable
+    """
+    if session.get_bind().dialect.name != 'postgresql':
+        return None
+
+    return session.execute(ESTIMATE_STATEMENT, {'table': table}).scalar()
+
+
+def bounded_count(session, query, cap):
+    """Count the rows of a query, stopping once `cap` has been exceeded.
+
+    :param object session: The SQLAlchemy session of the request
+    :param object query: The SQLAlchemy query of the request
+    :param int cap: The largest number of rows that will be counted
+
+    :return int: The number of rows, at most `cap` + 1
+    """
+    rows_ = query.order_by(None).limit(cap + 1).subquery()
+
+    return session.execute(select([func.count()]).select_from(rows_)).scalar()
+
+
+def count(session, query):
+    """Count the results of a Flask Restless GET_MANY request.
+
+    Requests to endpoints without the `approximate_count` option receive the
+    exact Flask Restless count. Otherwise unfiltered collections are counted
+    from the table statistics, and filtered collections are counted up to the
+    configured cap. Small tables and tables without statistics are always
+    counted exactly. Table statistics ignore the live scope, estimates
+    include archived and deleted rows.
+
+    :param object session: The SQLAlchemy session of the request
+    :param object query: The SQLAlchemy query of the request
+
+    :return int: The number of results
+    """
+    settings_ = getattr(g, 'data_count', None) if has_request_context() \
+        else None
+
+    if not settings_ or query._limit:
+        return exact_count(session, query)
+
+    cap_ = settings_['cap']
+
+    if settings_['filtered']:
+        num_results_ = bounded_count(session, query, cap_)
+        if num_results_ <= cap_:
+            return num_results_
+        num_results_ = cap_
+    else:
+        num_results_ = estimated_count(session, settings_['table'])
+        if num_results_ is None or num_results_ < cap_:
+            return exact_count(session, query)
+
+    logger.info('`%s` total estimated at %d results' %
+                (settings_['table'], num_results_))
+
+    g.data_count_approximate = True
+
+    return num_results_
+
+
+def install():
+    """Replace the Flask Restless count with the approximate count."""
+    views.count = count
+
+
+def processors(Model, cap=CAP):
+    """Create the approximate count processors for a model.
+
+    :param object Model: The SQLAlchemy model being requested
+    :param int cap: Totals beyond this number of rows are approximated
+
+    :return tuple: Flask Restless preprocessors and postprocessors
+    """
+    def approximate_preprocessor_get_many(search_params=None, **kw):
+        """Create an approximate count GET_MANY preprocessor.
+
+        Accepts a single argument, `search_params`, which is a dictionary
+        containing the search parameters for the request.
+        """
+        g.data_count = {
+            'table': Model.__table__.name,
+            'cap': cap,
+            'filtered': bool((search_params or {}).get('filters'))
+        }
+
+    def approximate_postprocessor_get_many(result=None, search_params=None,
+                                           **kw):
+        """Create an approximate count GET_MANY postprocessor.
+
+        Accepts two arguments, `result`, which is the dictionary
+        representation of the JSON response which will be returned to the
+        client, and `search_params`, which is a dictionary containing the
+        search parameters for the request.
+        """
+        result['num_results_approximate'] = \
+            getattr(g, 'data_count_approximate', False)
+
+    return (
+        {'GET_MANY': [approximate_preprocessor_get_many]},
+        {'GET_MANY': [approximate_postprocessor_get_many]}
+    )
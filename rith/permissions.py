@@ -16,6 +16,7 @@ under the License.
 """
 
 from flask import abort
+from flask import current_app
 
 
 from rith import logger
@@ -74,3 +75,28 @@ def check_roles(role_required, role_list):
             return True
 
     return False
+
+
+def verify_collection(name, method='GET_MANY', **kw):
+    """Authorize a request with the preprocessors of a data collection.
+
+    System endpoints that expose collection data outside of Flask Restless
+    (e.g., aggregation) run the preprocessors the module defined for the
+    equivalent Flask Restless request.
+
+    :param string name: The name of the collection
+    :param string method: The Flask Restless method whose preprocessors run
+    :param dict kw: The arguments passed to each preprocessor
+
+    :return dict collection: The registered collection or abort
+    """
+    collection = current_app.extensions.get('collections', {}).get(name)
+
+    if collection is None:
+        abort(404, 'The `%s` collection does not exist' % (name))
+
+    for preprocessor in collection['arguments'].\
+            get('preprocessors', {}).get(method, []):
+        preprocessor(**kw)
+
+    return collection
@@ -0,0 +1,207 @@
+"""Arithmetic Connection Pools.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+import threading
+import time
+import weakref
+
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import QueuePool
+
+
+"""Pool options and the configuration keys that set them. PgBouncer pools
+connections itself, these options are ignored in its compatibility mode."""
+POOL_OPTIONS = [
+    ('pool_size', 'SQLALCHEMY_POOL_SIZE'),
+    ('max_overflow', 'SQLALCHEMY_MAX_OVERFLOW'),
+    ('pool_timeout', 'SQLALCHEMY_POOL_TIMEOUT'),
+    ('pool_recycle', 'SQLALCHEMY_POOL_RECYCLE'),
+]
+
+
+"""Upper bounds, in seconds, of the checkout wait histogram buckets."""
+WAIT_BUCKETS = [0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0]
+
+
+"""Statistics of every pool, keyed by pool name."""
+statistics_lock = threading.Lock()
+statistics = {}
+
+
+"""The live pool of every name, for the current size and checkouts."""
+pools = weakref.WeakValueDictionary()
+
+
+def new_statistics():
+    """Create the empty statistics of a pool.
+
+    :return dict: The counters and histogram of a pool
+    """
+    return {
+        'checkouts': 0,
+        'timeouts': 0,
+        'connects': 0,
+        'disconnects': 0,
+        'invalidations': 0,
+        'wait_seconds': 0.0,
+        'wait_buckets': [0] * (len(WAIT_BUCKETS) + 1)
+    }
+
+
+def record(name, counter, wait=None):
+    """Record an event of a pool.
+
+    :param string name: The name of the pool
+    :param string counter: The counter to increment
+    :param float wait: The seconds a checkout waited for a connection
+    """
+    with statistics_lock:
+        statistics_ = statistics.setdefault(name, new_statistics())
+        statistics_[counter] += 1
+
+        if wait is not None:
+            statistics_['wait_seconds'] += wait
+
+            bucket_ = len(WAIT_BUCKETS)
+            for index_, bound_ in enumerate(WAIT_BUCKETS):
+                if wait <= bound_:
+                    bucket_ = index_
+                    break
+
+            statistics_['wait_buckets'][bucket_] += 1
+
+
+class MeteredPool(object):
+    """Record the checkouts, waits and connection churn of a pool."""
+
+    def __init__(self, *args, **kw):
+        """Register the pool and its connection events."""
+        super(MeteredPool, self).__init__(*args, **kw)
+
+        pools[self.name] = self
+
+        """A recreated pool inherits the events of the pool it replaces."""
+        if kw.get('_dispatch') is None:
+            name_ = self.name
+
+            event.listen(self, 'connect',
+                         lambda *args: record(name_, 'connects'))
+            event.listen(self, 'close',
+                         lambda *args: record(name_, 'disconnects'))
+            event.listen(self, 'invalidate',
+                         lambda *args: record(name_, 'invalidations'))
+
+    @property
+    def name(self):
+        """Name the pool after its engine, see `engine_options`."""
+        return getattr(self, 'logging_name', None) or 'primary'
+
+    def connect(self):
+        """Check a connection out, timing the wait for it."""
+        started_ = time.perf_counter()
+
+        try:
+            connection_ = super(MeteredPool, self).connect()
+        except TimeoutError:
+            record(self.name, 'timeouts')
+            raise
+
+        record(self.name, 'checkouts', time.perf_counter() - started_)
+
+        return connection_
+
+
+class MeteredQueuePool(MeteredPool, QueuePool):
+    """A `QueuePool` recording its statistics."""
+
+
+class MeteredNullPool(MeteredPool, NullPool):
+    """A `NullPool` recording its statistics."""
+
+
+def engine_options(config, name='primary'):
+    """Create the pool options of an engine from the configuration.
+
+    `SQLALCHEMY_POOL_PRE_PING` (default true) tests connections before they
+    are checked out. `SQLALCHEMY_PGBOUNCER` opens a new connection for every
+    checkout, leaving pooling to PgBouncer in transaction mode.
+
+    :param dict config: The Flask application configuration
+    :param string name: The name the statistics of the pool are kept under
+
+    :return dict: The keyword arguments of `sqlalchemy.create_engine`
+    """
+    options_ = {
+        'pool_logging_name': name
+    }
+
+    if config.get('SQLALCHEMY_PGBOUNCER'):
+        options_['poolclass'] = MeteredNullPool
+        return options_
+
+    options_['poolclass'] = MeteredQueuePool
+    options_['pool_pre_ping'] = bool(
+        config.get('SQLALCHEMY_POOL_PRE_PING', True))
+
+    for option_, key_ in POOL_OPTIONS:
+        if config.get(key_) is not None:
+            options_[option_] = config[key_]
+
+    return options_
+
+
+def snapshot():
+    """Summarize the statistics of every pool.
+
+    :return dict: The counters, cumulative wait histogram and current
+        checkouts of every pool, keyed by pool name
+    """
+    with statistics_lock:
+        names_ = set(statistics) | set(pools.keys())
+        recorded_ = dict([(name_, dict(statistics.get(name_) or
+                                       new_statistics()))
+                          for name_ in names_])
+
+    summary_ = {}
+
+    for name_, statistics_ in recorded_.items():
+        buckets_ = statistics_.pop('wait_buckets')
+        histogram_ = {}
+        total_ = 0
+
+        for bound_, count_ in zip(WAIT_BUCKETS + ['+Inf'], buckets_):
+            total_ += count_
+            histogram_[str(bound_)] = total_
+
+        statistics_['wait_histogram'] = histogram_
+
+        pool_ = pools.get(name_)
+        if isinstance(pool_, QueuePool):
+            statistics_['size'] = pool_.size()
+            statistics_['checked_out'] = pool_.checkedout()
+            statistics_['overflow'] = max(0, pool_.overflow())
+        else:
+            statistics_['checked_out'] = max(
+                0, statistics_['connects'] - statistics_['disconnects'])
+
+        summary_[name_] = statistics_
+
+    return summary_
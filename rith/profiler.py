@@ -0,0 +1,243 @@
+"""Arithmetic SQL Profiler.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+import heapq
+import threading
+import time
+
+
+from contextlib import contextmanager
+
+
+from flask import g
+from flask import has_app_context
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+from . import logger
+
+
+"""The number of slowest statements kept for every profile."""
+SLOWEST_STATEMENTS = 3
+
+
+"""Statements are shortened to this many characters in logs and errors."""
+STATEMENT_LENGTH = 200
+
+
+"""Query budgets active in the current thread, see `query_budget`."""
+budgets = threading.local()
+
+
+"""Functions called with the connection, statement, parameters, executemany
+flag and seconds of every statement (e.g., the slow query log)."""
+observers = []
+
+
+class Profile(object):
+    """The statements executed while profiling.
+
+    :param int slowest: The number of slowest statements to keep
+    """
+
+    def __init__(self, slowest=SLOWEST_STATEMENTS):
+        """Start an empty profile."""
+        self.count = 0
+        self.seconds = 0.0
+        self.slowest_size = slowest
+        self.statements = []
+
+    def record(self, statement, seconds):
+        """Record an executed statement.
+
+        :param string statement: The SQL statement
+        :param float seconds: The execution time of the statement
+        """
+        self.count += 1
+        self.seconds += seconds
+
+        entry_ = (seconds, self.count, statement[:STATEMENT_LENGTH])
+
+        if len(self.statements) < self.slowest_size:
+            heapq.heappush(self.statements, entry_)
+        elif self.statements and seconds > self.statements[0][0]:
+            heapq.heapreplace(self.statements, entry_)
+
+    @property
+    def slowest(self):
+        """List the slowest statements, slowest first.
+
+        :return list: The seconds and SQL of each statement
+        """
+        return [(seconds_, statement_) for seconds_, _, statement_ in
+                sorted(self.statements, reverse=True)]
+
+
+def active_profiles():
+    """List the profiles recording the statements of the current thread.
+
+    :return list: The request profile and any active query budgets
+    """
+    profiles_ = list(getattr(budgets, 'profiles', []))
+
+    if has_app_context() and getattr(g, 'sql_profile', None) is not None:
+        profiles_.append(g.sql_profile)
+
+    return profiles_
+
+
+def before_cursor_execute(connection, cursor, statement, parameters,
+                          context, executemany):
+    """Remember when a statement started."""
+    connection.info.setdefault('profiler_started', []).\
+        append(time.perf_counter())
+
+
+def after_cursor_execute(connection, cursor, statement, parameters,
+                         context, executemany):
+    """Record a statement in every active profile and observer.
+
+    Statements executed on a connection with the `profiler_ignored`
+    execution option (e.g., the slow query log EXPLAIN) are not recorded.
+    """
+    started_ = connection.info.get('profiler_started')
+    if not started_:
+        return
+
+    seconds_ = time.perf_counter() - started_.pop()
+
+    if connection.get_execution_options().get('profiler_ignored'):
+        return
+
+    for profile_ in active_profiles():
+        profile_.record(statement, seconds_)
+
+    for observer_ in observers:
+        observer_(connection, statement, parameters, executemany, seconds_)
+
+
+def handle_error(exception_context):
+    """Forget when a failed statement started.
+
+    Failed statements never reach `after_cursor_execute`, the start times
+    of their connection would otherwise be attributed to the next statement.
+    Errors raised before the execution context of the statement was created
+    happen before a start time is pushed.
+    """
+    connection_ = exception_context.connection
+    if connection_ is None or exception_context.execution_context is None:
+        return
+
+    started_ = connection_.info.get('profiler_started')
+    if started_:
+        started_.pop()
+
+
+def install():
+    """Listen for the statements executed by every engine."""
+    for name_, listener_ in [
+        ('before_cursor_execute', before_cursor_execute),
+        ('after_cursor_execute', after_cursor_execute),
+        ('handle_error', handle_error)
+    ]:
+        if not event.contains(Engine, name_, listener_):
+            event.listen(Engine, name_, listener_)
+
+
+def start_profile():
+    """Start profiling a request.
+
+    Registered as a Flask `before_request` hook when `SQL_PROFILER` is set.
+    """
+    g.sql_profile = Profile()
+
+
+def report_profile(response):
+    """Report the statements executed by a request.
+
+    Registered as a Flask `after_request` hook when `SQL_PROFILER` is set.
+    The query count and database time are added to the response as the
+    `X-Query-Count` and `Server-Timing` headers, and logged with the slowest
+    statements.
+
+    :param object response: The Flask response
+
+    :return object: The Flask response
+    """
+    profile_ = getattr(g, 'sql_profile', None)
+    if profile_ is None:
+        return response
+
+    milliseconds_ = profile_.seconds * 1000
+
+    response.headers['X-Query-Count'] = str(profile_.count)
+    response.headers.add('Server-Timing', 'db;dur=%.1f;desc="%d queries"' %
+                         (milliseconds_, profile_.count))
+
+    logger.debug('SQL profile of `%s %s`: %d queries in %.1fms, slowest %s' %
+                 (request.method, request.path, profile_.count,
+                  milliseconds_, ['%.1fms %s' % (seconds_ * 1000, statement_)
+                                  for seconds_, statement_ in
+                                  profile_.slowest]))
+
+    return response
+
+
+def init_app(app):
+    """Profile every request of an application when `SQL_PROFILER` is set.
+
+    :param object app: The Flask application
+    """
+    install()
+
+    if app.config.get('SQL_PROFILER', False):
+        app.before_request(start_profile)
+        app.after_request(report_profile)
+
+
+@contextmanager
+def query_budget(maximum):
+    """Assert that a block executes at most a number of statements.
+
+    Intended for tests, e.g., to catch N+1 queries in serialization::
+
+        with rith.profiler.query_budget(3):
+            client.get('/v1/data/file')
+
+    :param int maximum: The largest number of statements allowed
+
+    :return object: The profile of the block
+    """
+    profile_ = Profile(slowest=maximum + 1)
+
+    if not hasattr(budgets, 'profiles'):
+        budgets.profiles = []
+
+    budgets.profiles.append(profile_)
+    try:
+        yield profile_
+    finally:
+        budgets.profiles.remove(profile_)
+
+    if profile_.count > maximum:
+        raise AssertionError('%d queries executed, the budget is %d: %s' %
+                             (profile_.count, maximum,
+                              [statement_ for _, statement_ in
+                               profile_.slowest]))
@@ -0,0 +1,287 @@
+"""Arithmetic Read Replicas.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+import itertools
+import threading
+import time
+
+
+from flask import current_app
+from flask import has_app_context
+from flask import has_request_context
+from flask import request
+from flask_sqlalchemy import SignallingSession
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import create_engine
+from sqlalchemy import event
+from sqlalchemy import orm
+from sqlalchemy.exc import SQLAlchemyError
+
+
+from . import pool
+
+
+"""Requests using these methods never write, their reads may be served by a
+replica."""
+READ_METHODS = [
+    'GET',
+    'HEAD',
+    'OPTIONS',
+]
+
+
+"""Replicas lagging further behind the primary, in seconds, are skipped."""
+MAX_LAG_SECONDS = 5
+
+
+"""Seconds the measured lag of a replica is trusted before measuring it
+again."""
+LAG_CHECK_SECONDS = 5
+
+
+"""Seconds behind the primary, zero for an idle replica or a database that
+is not replicating at all."""
+LAG_STATEMENT = '''
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN %(receive)s() = %(replay)s() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+'''
+
+
+"""The WAL location functions of PostgreSQL 10 and later, which renamed
+the `xlog` functions of earlier versions."""
+WAL_FUNCTIONS = {
+    'receive': 'pg_last_wal_receive_lsn',
+    'replay': 'pg_last_wal_replay_lsn'
+}
+
+
+"""The WAL location functions of PostgreSQL 9.6 and earlier."""
+XLOG_FUNCTIONS = {
+    'receive': 'pg_last_xlog_receive_location',
+    'replay': 'pg_last_xlog_replay_location'
+}
+
+
+def lag_statement(server_version):
+    """Create the lag statement for a version of PostgreSQL.
+
+    :param tuple server_version: The version of the replica, e.g., (9, 6, 3)
+
+    :return string: The lag statement
+    """
+    if server_version and server_version[0] < 10:
+        return LAG_STATEMENT % XLOG_FUNCTIONS
+
+    return LAG_STATEMENT % WAL_FUNCTIONS
+
+
+class Replicas(object):
+    """The read replica engines of an application.
+
+    :param list engines: The SQLAlchemy engines of the replicas
+    :param float max_lag: The seconds a usable replica may lag behind
+    """
+
+    def __init__(self, engines, max_lag=MAX_LAG_SECONDS):
+        """Keep the engines of the replicas."""
+        self.engines = engines
+        self.max_lag = max_lag
+
+        self.lock = threading.Lock()
+        self.measured = {}
+        self.rotation = itertools.cycle(range(len(self.engines)))
+
+    def lag(self, engine):
+        """Measure how far a replica lags behind the primary.
+
+        :param object engine: The SQLAlchemy engine of the replica
+
+        :return float: The lag in seconds, infinite when unreachable
+        """
+        if engine.dialect.name != 'postgresql':
+            return 0.0
+
+        try:
+            with engine.connect() as connection_:
+                statement_ = lag_statement(
+                    connection_.dialect.server_version_info)
+                return float(connection_.execute(statement_).scalar())
+        except (SQLAlchemyError, TypeError) as error:
+            from . import logger
+            logger.warning('Replica `%s` is unavailable: %s' %
+                           (engine.url, error))
+            return float('inf')
+
+    def is_usable(self, index):
+        """Determine whether a replica is close enough to the primary.
+
+        :param int index: The position of the replica
+
+        :return bool: True when the replica lags less than `max_lag`
+        """
+        now_ = time.monotonic()
+
+        with self.lock:
+            measured_at_, lag_ = self.measured.get(index, (None, None))
+
+        if measured_at_ is None or now_ - measured_at_ > LAG_CHECK_SECONDS:
+            lag_ = self.lag(self.engines[index])
+
+            with self.lock:
+                self.measured[index] = (now_, lag_)
+
+        return lag_ <= self.max_lag
+
+    def select(self):
+        """Select the next usable replica in rotation.
+
+        :return object: The SQLAlchemy engine, or None to use the primary
+        """
+        for _ in range(len(self.engines)):
+            with self.lock:
+                index_ = next(self.rotation)
+
+            if self.is_usable(index_):
+                return self.engines[index_]
+
+        return None
+
+
+def init_app(app):
+    """Create the read replicas configured for an application.
+
+    Replicas are listed in `SQLALCHEMY_REPLICA_URIS` and skipped once they
+    lag more than `SQLALCHEMY_REPLICA_MAX_LAG` seconds behind the primary.
+    Their pools are configured like the pool of the primary.
+
+    :param object app: The Flask application
+    """
+    uris_ = app.config.get('SQLALCHEMY_REPLICA_URIS') or []
+
+    engines_ = [create_engine(uri_, **pool.engine_options(
+        app.config, 'replica_%d' % (index_)))
+        for index_, uri_ in enumerate(uris_)]
+
+    app.extensions['replicas'] = Replicas(
+        engines_,
+        app.config.get('SQLALCHEMY_REPLICA_MAX_LAG', MAX_LAG_SECONDS))
+
+
+def is_read_only():
+    """Determine whether the current request may read from a replica.
+
+    :return bool: True inside a request using a read method
+    """
+    return has_request_context() and request.method in READ_METHODS
+
+
+class RoutingSession(SignallingSession):
+    """Route the reads of read only requests to a replica.
+
+    Writes, and every read once the session has written, use the primary, so
+    that a request always reads what it wrote. Each session uses a single
+    replica, so that its reads are consistent with each other.
+    """
+
+    def get_bind(self, mapper=None, clause=None):
+        """Select the engine of a statement.
+
+        :param object mapper: The mapper of the statement, if any
+        :param object clause: The statement, if any
+
+        :return object: The SQLAlchemy engine
+        """
+        if not self._flushing and not self.info.get('pinned') and \
+                is_read_only() and not bind_key(mapper):
+            engine_ = self.replica()
+            if engine_ is not None:
+                return engine_
+
+        return super(RoutingSession, self).get_bind(mapper, clause)
+
+    def replica(self):
+        """Select the replica of the session.
+
+        :return object: The SQLAlchemy engine, or None to use the primary
+        """
+        if 'replica' not in self.info:
+            replicas_ = current_app.extensions.get('replicas') \
+                if has_app_context() else None
+
+            self.info['replica'] = replicas_.select() \
+                if replicas_ and replicas_.engines else None
+
+        return self.info['replica']
+
+
+def bind_key(mapper):
+    """Find the Flask SQLAlchemy bind key of a mapper.
+
+    Replicas only mirror the primary database, models bound to another
+    database are never routed.
+
+    :param object mapper: The mapper of the statement, if any
+
+    :return string: The bind key, or None for the primary database
+    """
+    if mapper is None:
+        return None
+
+    return getattr(mapper.persist_selectable, 'info', {}).get('bind_key')
+
+
+def pin(session):
+    """Read from the primary for the rest of a session.
+
+    Views that must never read rows older than the primary holds (e.g., the
+    change feed, whose cursors would skip rows a lagging replica has not
+    replayed yet) pin their session before their first statement.
+
+    :param object session: The SQLAlchemy session of the request
+    """
+    session.info['pinned'] = True
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def pin_session(session, flush_context):
+    """Read from the primary once the session has written."""
+    pin(session)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """Flask SQLAlchemy using the replica routing session."""
+
+    def apply_pool_defaults(self, app, options):
+        """Configure and meter the pool of the primary engine.
+
+        :param object app: The Flask application
+        :param dict options: The keyword arguments of `create_engine`
+        """
+        options.update(pool.engine_options(app.config))
+
+    def create_session(self, options):
+        """Create the session factory of the scoped session.
+
+        :param dict options: The keyword arguments of the session class
+
+        :return object: The session factory
+        """
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
@@ -16,9 +16,14 @@ under the License.
 """
 
 
+from datetime import datetime
+
+
 from rith import db
 
 
+from sqlalchemy import DDL
+from sqlalchemy import event
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.orm.collections import InstrumentedList
 
@@ -26,6 +31,35 @@ from sqlalchemy.orm.collections import InstrumentedList
 from rith.schema.user import User
 
 
+"""Sort keys indexed for the rows that have not been deleted."""
+LIVE_INDEX_COLUMNS = [
+    'id',
+    'created_on',
+    'modified_on',
+]
+
+
+def search_trigger(*columns):
+    """Create the trigger maintaining the `search_vector` of a table.
+
+    The vector is rebuilt by PostgreSQL on every INSERT and UPDATE using the
+    `simple` text search configuration, which does not stem words, so that
+    prefix searches behave predictably for filenames and captions. The
+    columns are kept in the `context` of the DDL element, `rith.upgrade`
+    builds the vectors of existing rows from them.
+
+    :param list columns: The names of the text columns to index
+
+    :return object: A DDL element to execute after the table is created
+    """
+    return DDL(
+        'CREATE TRIGGER %(table)s_search_vector_update BEFORE INSERT OR '
+        'UPDATE ON %(table)s FOR EACH ROW EXECUTE PROCEDURE '
+        'tsvector_update_trigger(search_vector, \'pg_catalog.simple\', '
+        '%(columns)s)', context={'columns': ', '.join(columns)}
+    ).execute_if(dialect='postgresql')
+
+
 class BaseMixin(db.Model):
     """BaseMixin definition.
 
@@ -44,9 +78,14 @@ class BaseMixin(db.Model):
     has_been_archived = db.Column(db.Boolean)
     has_been_deleted = db.Column(db.Boolean)
 
-    """Feature Timestamps."""
+    """Feature Timestamps.
+
+    The `modified_on` timestamp is refreshed on every UPDATE so that it can be
+    relied upon to validate cached representations (e.g., entity tags).
+    """
     created_on = db.Column(db.DateTime)
-    modified_on = db.Column(db.DateTime)
+    modified_on = db.Column(db.DateTime, default=datetime.now,
+                            onupdate=datetime.now)
 
     """Define attributes that create relationships for us.
 
@@ -166,3 +205,25 @@ class BaseMixin(db.Model):
                 list_.append(r_)
 
         return list_
+
+
+@event.listens_for(BaseMixin, 'instrument_class', propagate=True)
+def create_live_indexes(mapper, cls):
+    """Create partial indexes of the rows that have not been deleted.
+
+    Data endpoints only list live rows, restricting these indexes to them
+    keeps deleted rows from being read by list queries at all. The change
+    feed index covers every row so that tombstones can be found.
+
+    :param object mapper: The SQLAlchemy mapper of the model
+    :param object cls: The model extending `BaseMixin`
+    """
+    table_ = cls.__table__
+
+    for column_ in LIVE_INDEX_COLUMNS:
+        db.Index('ix_%s_live_%s' % (table_.name, column_), table_.c[column_],
+                 postgresql_where=table_.c.has_been_deleted.isnot(True))
+
+    """The change feed walks every row, deleted or not, in this order."""
+    db.Index('ix_%s_changes' % (table_.name), table_.c.modified_on,
+             table_.c.id)
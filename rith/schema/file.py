@@ -19,7 +19,11 @@ under the License.
 from rith import db
 
 
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+
 from rith.schema.base import BaseMixin
+from rith.schema.base import search_trigger
 
 
 class File(BaseMixin):
@@ -34,8 +38,109 @@ class File(BaseMixin):
     """
 
     __tablename__ = 'file'
-    __table_args__ = {
-        'extend_existing': True
+    __table_args__ = (
+        db.Index('ix_file_search_vector', 'search_vector',
+                 postgresql_using='gin'),
+        {
+            'extend_existing': True
+        }
+    )
+
+    __def__ = {
+        "access": "private",
+        "fields": {
+            "filename": {
+                "field_label": "Filename",
+                "field_help": "",
+                "field_order": 1,
+                "component": {
+                    "name": "textfield",
+                    "options": {},
+                    "group": "File Information"
+                },
+                "is_editable": True,
+                "is_required": True,
+            },
+            "filetype": {
+                "field_label": "File Type",
+                "field_help": "",
+                "field_order": 2,
+                "component": {
+                    "name": "textfield",
+                    "options": {},
+                    "group": "File Information"
+                },
+                "is_editable": False,
+                "is_required": False,
+                "is_filterable": True,
+                "is_groupable": True,
+            },
+            "filesize": {
+                "field_label": "File Size",
+                "field_help": "",
+                "field_order": 3,
+                "component": {
+                    "name": "textfield",
+                    "options": {},
+                    "group": "File Information"
+                },
+                "is_editable": False,
+                "is_required": False,
+            },
+            "caption": {
+                "field_label": "Caption",
+                "field_help": "",
+                "field_order": 1,
+                "component": {
+                    "name": "textarea",
+                    "options": {},
+                    "group": "Caption"
+                },
+                "is_editable": True,
+                "is_required": False,
+            },
+            "caption_link": {
+                "field_label": "Caption Link",
+                "field_help": "",
+                "field_order": 2,
+                "component": {
+                    "name": "textfield",
+                    "options": {},
+                    "group": "Caption"
+                },
+                "is_editable": True,
+                "is_required": False,
+            },
+            "creator_id": {
+                "field_label": "Created By",
+                "field_help": "",
+                "field_order": 1,
+                "component": {
+                    "name": "relationship",
+                    "options": {},
+                    "group": "File History"
+                },
+                "is_editable": False,
+                "is_required": False,
+                "is_filterable": True,
+                "is_groupable": True,
+            },
+            "created_on": {
+                "field_label": "Created On",
+                "field_help": "",
+                "field_order": 2,
+                "component": {
+                    "name": "datetime",
+                    "options": {},
+                    "group": "File History"
+                },
+                "is_editable": False,
+                "is_required": False,
+                "is_filterable": True,
+                "is_groupable": True,
+                "is_aggregatable": True,
+            }
+        }
     }
 
     filepath = db.Column(db.String)
@@ -45,3 +150,14 @@ class File(BaseMixin):
 
     caption = db.Column(db.String)
     caption_link = db.Column(db.String)
+
+    """Full Text Search.
+
+    Maintained by the `file_search_vector_update` trigger from the `filename`
+    and `caption`, and indexed with GIN for the search endpoint.
+    """
+    search_vector = db.Column(TSVECTOR)
+
+
+db.event.listen(File.__table__, 'after_create',
+                search_trigger('filename', 'caption'))
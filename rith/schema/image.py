@@ -19,7 +19,11 @@ under the License.
 from rith import db
 
 
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+
 from rith.schema.base import BaseMixin
+from rith.schema.base import search_trigger
 
 
 class Image(BaseMixin):
@@ -34,9 +38,13 @@ class Image(BaseMixin):
     """
 
     __tablename__ = 'image'
-    __table_args__ = {
-        'extend_existing': True
-    }
+    __table_args__ = (
+        db.Index('ix_image_search_vector', 'search_vector',
+                 postgresql_using='gin'),
+        {
+            'extend_existing': True
+        }
+    )
 
     original = db.Column(db.String)
 
@@ -55,3 +63,21 @@ class Image(BaseMixin):
 
     caption = db.Column(db.String)
     caption_link = db.Column(db.String)
+
+    """Processing Status.
+
+    Images uploaded asynchronously are `pending` until an `ImageJob` has
+    created their renditions, then `complete`, or `failed`.
+    """
+    status = db.Column(db.String)
+
+    """Full Text Search.
+
+    Maintained by the `image_search_vector_update` trigger from the `filename`
+    and `caption`, and indexed with GIN for the search endpoint.
+    """
+    search_vector = db.Column(TSVECTOR)
+
+
+db.event.listen(Image.__table__, 'after_create',
+                search_trigger('filename', 'caption'))
@@ -0,0 +1,68 @@
+"""Arithmetic Image Job Data Model Class.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+from rith import db
+
+
+from rith.schema.image import Image
+from rith.schema.user import User
+
+
+class ImageJob(db.Model):
+    """Image processing job definition.
+
+    An uploaded image waiting for its renditions, processed by the media job
+    runner. Jobs are `pending`, `processing`, `complete`, or `failed`.
+
+    :param object db.Model: SQLAlchemy declarative base
+
+    See the official Flask SQLAlchemy documentation for more information
+    https://pythonhosted.org/Flask-SQLAlchemy/models.html
+    """
+
+    __tablename__ = 'image_job'
+    __table_args__ = (
+        db.Index('ix_image_job_status', 'status', 'id'),
+        {
+            'extend_existing': True
+        }
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    image_id = db.Column(db.Integer, db.ForeignKey('image.id'),
+                         nullable=False)
+    image = db.relationship(Image)
+
+    creator_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_by = db.relationship(User)
+
+    """The path of the uploaded file, removed once processed."""
+    source = db.Column(db.String)
+
+    status = db.Column(db.String, default='pending')
+    progress = db.Column(db.Integer, default=0)
+    attempts = db.Column(db.Integer, default=0)
+    error = db.Column(db.String)
+
+    """The earliest time a failed job is attempted again."""
+    not_before = db.Column(db.DateTime)
+
+    created_on = db.Column(db.DateTime)
+    started_on = db.Column(db.DateTime)
+    finished_on = db.Column(db.DateTime)
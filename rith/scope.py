@@ -0,0 +1,137 @@
+"""Arithmetic Live Row Scope.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+from flask import abort
+from flask import g
+from flask import has_request_context
+from flask import request
+from sqlalchemy import and_
+from sqlalchemy import event
+from sqlalchemy.orm import Query
+
+
+"""Scopes a client may request with the `scope` argument."""
+SCOPES = [
+    'live',
+    'archived',
+]
+
+
+def is_scoped(Model):
+    """Determine whether a model tracks deleted and archived rows.
+
+    :param object Model: The SQLAlchemy model being requested
+
+    :return bool: True when the model extends `BaseMixin`
+    """
+    return hasattr(Model, 'has_been_deleted') and \
+        hasattr(Model, 'has_been_archived')
+
+
+def criterion(Model, scope='live'):
+    """Create the criterion selecting the rows of a scope.
+
+    Deleted rows are never part of a scope. The `live` scope holds the rows
+    that have not been archived, the `archived` scope those that have.
+
+    :param object Model: The SQLAlchemy model being requested
+    :param string scope: The name of the scope
+
+    :return object: The SQLAlchemy criterion
+    """
+    if scope == 'archived':
+        archived_ = Model.has_been_archived.is_(True)
+    else:
+        archived_ = Model.has_been_archived.isnot(True)
+
+    return and_(Model.has_been_deleted.isnot(True), archived_)
+
+
+def apply_scope(query):
+    """Restrict a query to the scope requested by the current request.
+
+    Only queries selecting the requested model itself are restricted, these
+    include the page, count and single instance queries of Flask Restless.
+
+    :param object query: The SQLAlchemy query about to be compiled
+
+    :return object query: The query restricted to the scope
+    """
+    scope_ = getattr(g, 'data_scope', None) if has_request_context() \
+        else None
+
+    if not scope_:
+        return query
+
+    Model, name_ = scope_
+    descriptions_ = query.column_descriptions
+
+    if len(descriptions_) != 1 or descriptions_[0]['type'] is not Model:
+        return query
+
+    return query.enable_assertions(False).filter(criterion(Model, name_))
+
+
+def install():
+    """Listen for queries compiled during data endpoint requests."""
+    listener_ = (Query, 'before_compile', apply_scope)
+
+    if not event.contains(*listener_):
+        event.listen(*listener_, retval=True)
+
+
+def preprocessors(Model):
+    """Create the live row scope preprocessors for a model.
+
+    Clients may list archived rows instead with `?scope=archived`.
+
+    :param object Model: The SQLAlchemy model being requested
+
+    :return dict: Flask Restless preprocessors keyed by method
+    """
+    if not is_scoped(Model):
+        return {}
+
+    def select():
+        scope_ = request.args.get('scope', 'live')
+
+        if scope_ not in SCOPES:
+            abort(400, 'The `scope` must be one of %s' % (', '.join(SCOPES)))
+
+        g.data_scope = (Model, scope_)
+
+    def scope_preprocessor_get_single(instance_id=None, **kw):
+        """Create a scope GET_SINGLE preprocessor.
+
+        Accepts a single argument, `instance_id`, the primary key of the
+        instance of the model to get.
+        """
+        select()
+
+    def scope_preprocessor_get_many(search_params=None, **kw):
+        """Create a scope GET_MANY preprocessor.
+
+        Accepts a single argument, `search_params`, which is a dictionary
+        containing the search parameters for the request.
+        """
+        select()
+
+    return {
+        'GET_SINGLE': [scope_preprocessor_get_single],
+        'GET_MANY': [scope_preprocessor_get_many]
+    }
@@ -0,0 +1,245 @@
+"""Arithmetic Compiled Serializers.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+import uuid
+
+
+from datetime import date
+from datetime import time
+from operator import attrgetter
+
+
+from flask_restless import helpers
+from flask_restless import views
+from sqlalchemy import inspect
+from sqlalchemy.ext import hybrid
+from sqlalchemy.orm import Query
+
+
+"""The reflection based serializer of Flask Restless, used for anything the
+compiled serializers do not cover (e.g., `include_methods`)."""
+reflected_to_dict = helpers.to_dict
+
+
+"""Model `__def__` components whose values are written but never read."""
+WRITE_ONLY_COMPONENTS = [
+    'password',
+]
+
+
+"""Compiled serializers, keyed by model and serialization arguments."""
+compiled = {}
+
+
+def isoformat(value):
+    """Convert a date or time to ISO 8601."""
+    return value.isoformat()
+
+
+def reflected(value):
+    """Convert a value of unknown type the way Flask Restless does."""
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+
+    if isinstance(value, uuid.UUID):
+        return str(value)
+
+    if helpers.is_mapped_class(type(value)):
+        return reflected_to_dict(value)
+
+    return value
+
+
+def converter(column):
+    """Select the conversion of the values of a column.
+
+    :param object column: The SQLAlchemy column
+
+    :return function: The conversion, or None when values are kept as is
+    """
+    try:
+        python_type_ = column.type.python_type
+    except NotImplementedError:
+        return reflected
+
+    if issubclass(python_type_, (date, time)):
+        return isoformat
+
+    if issubclass(python_type_, uuid.UUID):
+        return str
+
+    return None
+
+
+def write_only_fields(Model):
+    """List the fields the model `__def__` marks as write only.
+
+    :param object Model: The SQLAlchemy model
+
+    :return set: The names of the fields never serialized
+    """
+    fields_ = getattr(Model, '__def__', {}).get('fields', {})
+
+    return set([name_ for name_, field_ in fields_.items()
+                if (field_.get('component') or {}).get('name') in
+                WRITE_ONLY_COMPONENTS])
+
+
+def compile_serializer(Model, deep=None, exclude=None, include=None,
+                       exclude_relations=None, include_relations=None):
+    """Compile the serializer of a model.
+
+    The columns, their conversions and the relationships to follow are
+    resolved once, leaving a single `attrgetter` call and the conversion of
+    dates, times and UUIDs for every row.
+
+    :param object Model: The SQLAlchemy model
+    :param dict deep: The relationships to serialize, see `to_dict`
+    :param list exclude: The columns left out
+    :param list include: The only columns serialized
+    :param dict exclude_relations: The columns left out of each relationship
+    :param dict include_relations: The only columns of each relationship
+
+    :return function: The serializer, or None when it cannot be compiled
+    """
+    mapper_ = inspect(Model)
+    deep = deep or {}
+
+    hybrids_ = [key_ for key_, descriptor_ in
+                mapper_.all_orm_descriptors.items()
+                if descriptor_.extension_type == hybrid.HYBRID_PROPERTY and
+                key_ not in deep]
+
+    names_ = [key_ for key_ in mapper_.column_attrs.keys() + hybrids_
+              if not key_.startswith('__') and
+              key_ not in helpers.COLUMN_BLACKLIST and
+              key_ not in write_only_fields(Model) and
+              (exclude is None or key_ not in exclude) and
+              (include is None or key_ in include)]
+
+    conversions_ = []
+    for name_ in names_:
+        if name_ in hybrids_:
+            conversions_.append((name_, reflected))
+            continue
+
+        convert_ = converter(mapper_.column_attrs[name_].columns[0])
+        if convert_ is not None:
+            conversions_.append((name_, convert_))
+
+    relations_ = []
+    for relation_, rdeep_ in deep.items():
+        if relation_ not in mapper_.relationships:
+            return None
+
+        property_ = mapper_.relationships[relation_]
+
+        serializer_ = serializer(
+            property_.mapper.class_, rdeep_,
+            exclude=(exclude_relations or {}).get(relation_),
+            include=(include_relations or {}).get(relation_)
+            if not (exclude_relations or {}).get(relation_) else None)
+
+        if serializer_ is None:
+            return None
+
+        relations_.append((relation_, property_.uselist, serializer_))
+
+    getter_ = attrgetter(*names_) if names_ else (lambda instance: ())
+    single_ = len(names_) == 1
+
+    def serialize(instance):
+        values_ = getter_(instance)
+        result_ = dict(zip(names_, (values_,) if single_ else values_))
+
+        for name_, convert_ in conversions_:
+            value_ = result_[name_]
+            if value_ is not None:
+                result_[name_] = convert_(value_)
+
+        for relation_, uselist_, serializer_ in relations_:
+            related_ = getattr(instance, relation_)
+
+            if related_ is None:
+                result_[relation_] = None
+            elif uselist_:
+                result_[relation_] = [serializer_(item_)
+                                      for item_ in related_]
+            else:
+                if isinstance(related_, Query):
+                    related_ = related_.one()
+                result_[relation_] = serializer_(related_)
+
+        return result_
+
+    return serialize
+
+
+def serializer(Model, deep=None, exclude=None, include=None,
+               exclude_relations=None, include_relations=None):
+    """Retrieve the compiled serializer of a model, compiling it once.
+
+    :param object Model: The SQLAlchemy model
+
+    :return function: The serializer, or None when it cannot be compiled
+    """
+    key_ = (Model, repr(deep), repr(exclude), repr(include),
+            repr(exclude_relations), repr(include_relations))
+
+    if key_ not in compiled:
+        compiled[key_] = compile_serializer(
+            Model, deep, exclude=exclude, include=include,
+            exclude_relations=exclude_relations,
+            include_relations=include_relations)
+
+    return compiled[key_]
+
+
+def to_dict(instance, deep=None, exclude=None, include=None,
+            exclude_relations=None, include_relations=None,
+            include_methods=None):
+    """Serialize an instance with its compiled serializer.
+
+    A drop-in replacement of the Flask Restless `to_dict`, which it falls
+    back to for anything other than a mapped instance without
+    `include_methods`.
+
+    :param object instance: The instance to serialize
+
+    :return dict: The serialized instance
+    """
+    if include_methods is None and \
+            helpers.is_mapped_class(type(instance)):
+        serializer_ = serializer(type(instance), deep, exclude=exclude,
+                                 include=include,
+                                 exclude_relations=exclude_relations,
+                                 include_relations=include_relations)
+
+        if serializer_ is not None:
+            return serializer_(instance)
+
+    return reflected_to_dict(instance, deep, exclude=exclude,
+                             include=include,
+                             exclude_relations=exclude_relations,
+                             include_relations=include_relations,
+                             include_methods=include_methods)
+
+
+def install():
+    """Replace the Flask Restless serializer with the compiled serializers."""
+    views.to_dict = to_dict
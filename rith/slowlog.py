@@ -0,0 +1,201 @@
+"""Arithmetic Slow Query Log.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+import json
+import logging
+import os
+import re
+
+
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+
+from flask import has_request_context
+from flask import request
+from sqlalchemy.exc import SQLAlchemyError
+
+
+from . import logger
+from . import profiler
+
+
+"""Statements worth explaining, EXPLAIN without ANALYZE never runs them."""
+EXPLAINABLE = re.compile(r'^\s*(SELECT|WITH|UPDATE|DELETE)\b', re.IGNORECASE)
+
+
+"""Literals inlined in a statement, replaced when normalizing it."""
+LITERALS = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\s+'), ' '),
+]
+
+
+def normalize(statement):
+    """Normalize a statement so that equivalent statements read the same.
+
+    :param string statement: The SQL statement
+
+    :return string: The statement with literals replaced and whitespace
+        collapsed
+    """
+    for pattern_, replacement_ in LITERALS:
+        statement = pattern_.sub(replacement_, statement)
+
+    return statement.strip()
+
+
+def redact(parameters, executemany=False):
+    """Replace the values of statement parameters with their types.
+
+    :param object parameters: The DBAPI parameters of the statement
+    :param bool executemany: Whether the parameters hold many rows
+
+    :return object: The parameters, holding only the names of their types
+    """
+    if executemany:
+        return {
+            'rows': len(parameters or []),
+            'first': redact(parameters[0]) if parameters else None
+        }
+
+    if isinstance(parameters, dict):
+        return dict([(name_, type(value_).__name__)
+                     for name_, value_ in parameters.items()])
+
+    if isinstance(parameters, (list, tuple)):
+        return [type(value_).__name__ for value_ in parameters]
+
+    return None
+
+
+def endpoint():
+    """Describe the request executing a statement.
+
+    :return dict: The endpoint, method and path, or None outside a request
+    """
+    if not has_request_context():
+        return None
+
+    return {
+        'endpoint': request.endpoint,
+        'method': request.method,
+        'path': request.path
+    }
+
+
+def explain(connection, statement, parameters):
+    """Ask PostgreSQL for the plan of a statement in a side connection.
+
+    :param object connection: The SQLAlchemy connection of the statement
+    :param string statement: The SQL statement
+    :param object parameters: The DBAPI parameters of the statement
+
+    :return object: The JSON plan, or None when it cannot be explained
+    """
+    if connection.dialect.name != 'postgresql' or \
+            not EXPLAINABLE.match(statement):
+        return None
+
+    try:
+        with connection.engine.connect() as side_:
+            side_ = side_.execution_options(profiler_ignored=True)
+            return side_.execute('EXPLAIN (FORMAT JSON) ' + statement,
+                                 parameters).scalar()
+    except SQLAlchemyError as error:
+        logger.warning('Slow statement could not be explained: %s' % (error))
+        return None
+
+
+class SlowQueryLog(object):
+    """Write statements slower than a threshold to a rotating file.
+
+    :param float seconds: Statements taking longer are recorded
+    :param string filepath: The path of the log file
+    :param bool explain: Capture the plan of every recorded statement
+    :param int max_bytes: The size at which the log file is rotated
+    :param int backups: The number of rotated files kept
+    """
+
+    def __init__(self, seconds, filepath, explain=True,
+                 max_bytes=10485760, backups=5):
+        """Open the rotating log file."""
+        self.seconds = seconds
+        self.explain = explain
+
+        directory_ = os.path.dirname(filepath)
+        if directory_ and not os.path.isdir(directory_):
+            os.makedirs(directory_)
+
+        handler_ = RotatingFileHandler(filepath, maxBytes=max_bytes,
+                                       backupCount=backups)
+        handler_.setFormatter(logging.Formatter('%(message)s'))
+
+        self.logger = logging.getLogger('%s.slow_queries' % (logger.name))
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.logger.handlers = [handler_]
+
+    def __call__(self, connection, statement, parameters, executemany,
+                 seconds):
+        """Record a statement when it was slow, see `profiler.observers`."""
+        if seconds < self.seconds:
+            return
+
+        entry_ = {
+            'recorded_on': datetime.utcnow().isoformat(),
+            'milliseconds': round(seconds * 1000, 1),
+            'statement': normalize(statement),
+            'parameters': redact(parameters, executemany),
+            'request': endpoint(),
+            'plan': None
+        }
+
+        if self.explain and not executemany:
+            entry_['plan'] = explain(connection, statement, parameters)
+
+        self.logger.info(json.dumps(entry_, default=str))
+
+
+def init_app(app):
+    """Record slow statements when `SLOW_QUERY_SECONDS` is set.
+
+    The log is written to `SLOW_QUERY_LOG`, by default `slow_queries.log` in
+    the instance folder. `SLOW_QUERY_EXPLAIN` (default true) captures the
+    PostgreSQL plan of every recorded statement.
+
+    :param object app: The Flask application
+    """
+    seconds_ = app.config.get('SLOW_QUERY_SECONDS')
+    if not seconds_:
+        return
+
+    slow_query_log_ = SlowQueryLog(
+        float(seconds_),
+        app.config.get('SLOW_QUERY_LOG') or
+        os.path.join(app.instance_path, 'slow_queries.log'),
+        explain=app.config.get('SLOW_QUERY_EXPLAIN', True),
+        max_bytes=app.config.get('SLOW_QUERY_LOG_BYTES', 10485760),
+        backups=app.config.get('SLOW_QUERY_LOG_BACKUPS', 5))
+
+    profiler.install()
+
+    profiler.observers[:] = [observer_ for observer_ in profiler.observers
+                             if not isinstance(observer_, SlowQueryLog)]
+    profiler.observers.append(slow_query_log_)
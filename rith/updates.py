@@ -0,0 +1,93 @@
+"""Arithmetic Diffed Updates.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+from flask_restless.helpers import strings_to_dates
+from sqlalchemy import inspect
+
+
+from . import db
+from . import logger
+
+
+"""Fields stamped by the system on every update. An update changing only
+these fields has nothing to record and is left out entirely."""
+STAMPED_FIELDS = [
+    'modified_on',
+    'last_modified_by_id',
+]
+
+
+def unchanged_fields(instance, data):
+    """List the submitted fields whose values equal the stored values.
+
+    Relationships and unknown fields are never reported as unchanged, they
+    are left for Flask Restless to update or reject.
+
+    :param object instance: The stored instance of the model
+    :param dict data: The fields to change on the instance
+
+    :return list: The names of the unchanged fields
+    """
+    mapper_ = inspect(instance.__class__)
+    columns_ = set([attribute_.key for attribute_ in mapper_.column_attrs])
+
+    submitted_ = strings_to_dates(instance.__class__, dict([
+        (field_, value_) for field_, value_ in data.items()
+        if field_ in columns_
+    ]))
+
+    return [field_ for field_, value_ in submitted_.items()
+            if getattr(instance, field_) == value_]
+
+
+def preprocessors(Model):
+    """Create the diffed update preprocessors for a model.
+
+    :param object Model: The SQLAlchemy model being requested
+
+    :return dict: Flask Restless preprocessors keyed by method
+    """
+    def updates_preprocessor_update_single(instance_id=None, data=None,
+                                           **kw):
+        """Create a diffed PATCH_SINGLE and PUT_SINGLE preprocessor.
+
+        Removes the fields that would not change from `data`, so that only
+        the modified columns are written. When nothing but the stamped fields
+        would change, `data` is emptied and the request completes without
+        writing to the database.
+        """
+        if not data or instance_id is None:
+            return
+
+        instance_ = db.session.query(Model).get(instance_id)
+        if instance_ is None:
+            return
+
+        for field_ in unchanged_fields(instance_, data):
+            del data[field_]
+
+        if set(data).issubset(STAMPED_FIELDS):
+            data.clear()
+
+            logger.debug('Update of `%s` %s changed nothing' %
+                         (Model.__tablename__, instance_id))
+
+    return {
+        'PATCH_SINGLE': [updates_preprocessor_update_single],
+        'PUT_SINGLE': [updates_preprocessor_update_single]
+    }
@@ -0,0 +1,270 @@
+"""Arithmetic Schema Upgrades.
+
+Created by Joshua Powell on 02/02/2019.
+
+Copyright (c) 2019 Joshua Powell, L.L.C. All rights reserved.
+
+For license and copyright information please see the LICENSE.md (the "License")
+document packaged with this software. This file and all other files included in
+this packaged software may not be used in any manner except in compliance with
+the License. Software distributed under this License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTY, OR CONDITIONS OF ANY KIND, either express or
+implied.
+
+See the License for the specific language governing permission and limitations
+under the License.
+"""
+
+
+import click
+import re
+import warnings
+
+
+from flask.cli import with_appcontext
+from sqlalchemy import inspect
+from sqlalchemy import text
+from sqlalchemy.exc import SAWarning
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.schema import DDLElement
+
+
+from . import db
+from . import logger
+
+
+"""The name of the trigger a DDL statement creates."""
+TRIGGER_NAME = re.compile(r'CREATE TRIGGER (\w+)', re.IGNORECASE)
+
+
+"""The triggers created by the database users."""
+TRIGGERS_STATEMENT = text('SELECT tgname FROM pg_trigger '
+                          'WHERE NOT tgisinternal')
+
+
+def existing_tables(inspector):
+    """List the tables of the models that exist in the database.
+
+    :param object inspector: The SQLAlchemy inspector of the connection
+
+    :return list: The SQLAlchemy tables
+    """
+    tables_ = inspector.get_table_names()
+
+    return [table_ for table_ in db.metadata.sorted_tables
+            if table_.name in tables_]
+
+
+def missing_columns(connection, inspector):
+    """List the statements adding the columns missing from the database.
+
+    Columns are added without constraints other than their type, defaults
+    and nullability, a column that may not be null must have a default.
+
+    :param object connection: The SQLAlchemy connection to the database
+    :param object inspector: The SQLAlchemy inspector of the connection
+
+    :return list: The ALTER TABLE statements
+    """
+    statements_ = []
+    preparer_ = connection.dialect.identifier_preparer
+
+    for table_ in existing_tables(inspector):
+        existing_ = [column_['name'] for column_ in
+                     inspector.get_columns(table_.name)]
+
+        for column_ in table_.columns:
+            if column_.name not in existing_:
+                statements_.append('ALTER TABLE %s ADD COLUMN %s' % (
+                    preparer_.format_table(table_),
+                    CreateColumn(column_).compile(
+                        dialect=connection.dialect)))
+
+    return statements_
+
+
+def missing_indexes(connection, inspector):
+    """List the statements creating the indexes missing from the database.
+
+    Indexes are compared by name, an index whose definition changed keeps
+    its name and is left alone.
+
+    :param object connection: The SQLAlchemy connection to the database
+    :param object inspector: The SQLAlchemy inspector of the connection
+
+    :return list: The CREATE INDEX statements
+    """
+    statements_ = []
+
+    for table_ in existing_tables(inspector):
+        """Only the names are compared, the predicates of partial indexes
+        SQLAlchemy does not reflect are of no interest.
+        """
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', SAWarning)
+            existing_ = [index_['name'] for index_ in
+                         inspector.get_indexes(table_.name)]
+
+        for index_ in sorted(table_.indexes, key=lambda index_: index_.name):
+            if index_.name not in existing_:
+                statements_.append(str(CreateIndex(index_).compile(
+                    dialect=connection.dialect)))
+
+    return statements_
+
+
+def missing_triggers(connection, inspector):
+    """List the statements creating the triggers missing from the database.
+
+    The triggers are those `db.create_all` creates after a table (e.g., the
+    `search_vector` triggers of `search_trigger`), only PostgreSQL tables
+    have them.
+
+    :param object connection: The SQLAlchemy connection to the database
+    :param object inspector: The SQLAlchemy inspector of the connection
+
+    :return list: The CREATE TRIGGER statements
+    """
+    if connection.dialect.name != 'postgresql':
+        return []
+
+    existing_ = [row_[0] for row_ in connection.execute(TRIGGERS_STATEMENT)]
+    statements_ = []
+
+    for table_ in existing_tables(inspector):
+        for listener_ in table_.dispatch.after_create:
+            if not isinstance(listener_, DDLElement):
+                continue
+
+            statement_ = str(listener_.against(table_).compile(
+                dialect=connection.dialect))
+            name_ = TRIGGER_NAME.search(statement_)
+
+            if name_ and name_.group(1) not in existing_:
+                statements_.append(statement_)
+
+    return statements_
+
+
+def empty_search_vectors(connection, inspector):
+    """List the statements building the search vectors of existing rows.
+
+    The `search_vector` triggers only build the vectors of the rows inserted
+    or updated after they are created, and skip updates leaving their
+    columns unchanged. The vectors of every other row are built from the
+    columns of the trigger instead. Large tables are rewritten in a single
+    transaction.
+
+    :param object connection: The SQLAlchemy connection to the database
+    :param object inspector: The SQLAlchemy inspector of the connection
+
+    :return list: The UPDATE statements
+    """
+    if connection.dialect.name != 'postgresql':
+        return []
+
+    statements_ = []
+    preparer_ = connection.dialect.identifier_preparer
+
+    for table_ in existing_tables(inspector):
+        triggers_ = [listener_ for listener_ in table_.dispatch.after_create
+                     if isinstance(listener_, DDLElement) and
+                     'search_vector_update' in listener_.statement]
+        if not triggers_:
+            continue
+
+        columns_ = [column_['name'] for column_ in
+                    inspector.get_columns(table_.name)]
+
+        if 'search_vector' in columns_ and connection.execute(
+                table_.select().with_only_columns([table_.c.id]).
+                where(table_.c.search_vector.is_(None)).limit(1)).first() \
+                is None:
+            continue
+
+        statements_.append(
+            'UPDATE %s SET search_vector = to_tsvector(\'pg_catalog.simple\','
+            ' concat_ws(\' \', %s)) WHERE search_vector IS NULL' %
+            (preparer_.format_table(table_), triggers_[0].context['columns']))
+
+    return statements_
+
+
+def image_statuses(connection, inspector):
+    """List the statements completing the images uploaded before statuses.
+
+    Images uploaded before the `status` column was added were processed
+    during their upload, they are `complete`.
+
+    :param object connection: The SQLAlchemy connection to the database
+    :param object inspector: The SQLAlchemy inspector of the connection
+
+    :return list: The UPDATE statements
+    """
+    from .schema.image import Image
+
+    table_ = Image.__table__
+
+    if table_ not in existing_tables(inspector):
+        return []
+
+    columns_ = [column_['name'] for column_ in
+                inspector.get_columns(table_.name)]
+
+    if 'status' in columns_ and connection.execute(
+            table_.select().with_only_columns([table_.c.id]).
+            where(table_.c.status.is_(None)).limit(1)).first() is None:
+        return []
+
+    return ['UPDATE %s SET status = \'complete\' WHERE status IS NULL' %
+            (connection.dialect.identifier_preparer.format_table(table_))]
+
+
+"""The upgrade steps, in the order their statements are executed."""
+STEPS = [
+    missing_columns,
+    missing_indexes,
+    missing_triggers,
+    empty_search_vectors,
+    image_statuses,
+]
+
+
+def upgrade(connection, execute=True):
+    """Bring the schema of an existing database up to date.
+
+    `db.create_all` only creates the tables missing from the database, it
+    never changes a table that already exists. Every step compares the
+    models with the database and lists the statements the database is
+    missing, so that running the upgrade again executes nothing.
+
+    :param object connection: The SQLAlchemy connection to the database
+    :param bool execute: Execute the statements, or only list them
+
+    :return list: The statements of every step
+    """
+    statements_ = []
+
+    for step_ in STEPS:
+        for statement_ in step_(connection, inspect(connection)):
+            statements_.append(statement_)
+
+            if execute:
+                logger.info('Upgrading schema: %s' % (statement_))
+                connection.execute(statement_)
+
+    return statements_
+
+
+@click.command('upgrade')
+@click.option('--sql', is_flag=True,
+              help='Print the statements instead of executing them.')
+@with_appcontext
+def upgrade_command(sql):
+    """Bring the schema of an existing database up to date."""
+    with db.engine.begin() as connection_:
+        statements_ = upgrade(connection_, execute=not sql)
+
+    for statement_ in statements_:
+        click.echo('%s;' % (statement_.strip()))
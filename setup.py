@@ -34,6 +34,7 @@ setup(
         "flask-oauthlib",
         "requests",
         "psycopg2-binary",
+        "sqlalchemy>=1.3",
         "Wand"
     ],
     extras_require={
@@ -11,16 +11,93 @@ limitations under the License.
 """
 
 
+import flask_restless
+import functools
+import gzip
+import io
+import json
+import os
 import rith
+import sqlalchemy
+import tempfile
+import threading
+import time
 import unittest
 
 
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import HTTPException
+
+
+class FakeImage(object):
+
+    def __init__(self, colorspace="srgb"):
+        self.width, self.height, self.colorspace = 4000, 3000, colorspace
+        self.operations, self.metadata = [], {}
+        self.profiles = {"icc": b"profile"}
+
+    def clone(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def crop(self, left, top, width, height):
+        self.operations.append(("crop", left, top, width))
+        self.width = self.height = width
+
+    def resize(self, width, height):
+        self.operations.append(("resize", self.width, width))
+        self.width = self.height = width
+
+    def transform_colorspace(self, colorspace):
+        self.operations.append(("colorspace", colorspace))
+        self.colorspace = colorspace
+
+    def make_blob(self, format):
+        return b""
+
+    def save(self, filename):
+        pass
+
+
 class AppTestCase(unittest.TestCase):
 
     def setUp(self):
         self.app = rith.create_application(environment="testing")
         self.client = self.app.test_client()
 
+    def register_collection(self, name, Model, preprocessors=None,
+                            options=None):
+        self.app.extensions["collections"][name] = {
+            "model": Model,
+            "arguments": {"preprocessors": preprocessors or {}},
+            "options": options or {}
+        }
+
+    def create_files(self, prefix, count):
+        with self.app.app_context():
+            rith.db.create_all()
+            stamp_ = datetime.now().strftime("%H%M%S%f")
+            files_ = []
+            for index_ in range(count):
+                user_ = rith.schema.user.User(
+                    email="%s-%s-%d@rith.io" % (prefix, stamp_, index_))
+                files_.append(rith.schema.file.File(
+                    filename="%s-%s-%d" % (prefix, stamp_, index_),
+                    filetype="image/png", created_by=user_))
+            rith.db.session.add_all(files_)
+            rith.db.session.commit()
+            return "%s-%s" % (prefix, stamp_), [file_.id for file_ in files_]
+
     """Default Viable Data Tests."""
     def test_api_index(self):
         _response = self.client.get("/v1")
@@ -65,6 +142,1042 @@ class AppTestCase(unittest.TestCase):
         _response = self.client.get("/v1/data/user/1")
         self.assertEqual(_response.status_code, 403)
 
+    def test_conditional_file_get_many_unauthorized(self):
+        _response = self.client.get("/v1/data/file", headers={
+            "If-None-Match": "*"
+        })
+        self.assertEqual(_response.status_code, 403)
+
+    def test_cache_evicts_least_recently_used(self):
+        cache_ = rith.cache.__class__()
+        cache_.register(rith.schema.role.Role, "role", ttl=30, max_size=2)
+        cache_.set("role", "a", b"a", [])
+        cache_.set("role", "b", b"b", [])
+        cache_.get("role", "a")
+        cache_.set("role", "c", b"c", [])
+        self.assertIsNone(cache_.get("role", "b"))
+        self.assertEqual(cache_.get("role", "a"), (b"a", []))
+
+    def test_cache_invalidated_by_writes(self):
+        prefix_, ids_ = self.create_files("cached", 2)
+        File = rith.schema.file.File
+        rith.cache.register(File, "cached_file")
+        flask_restless.APIManager(flask_sqlalchemy_db=rith.db).create_api(
+            File, app=self.app, url_prefix="/cached",
+            preprocessors=rith.cache.preprocessors("cached_file"))
+        url_ = "/cached/file?q=%s" % (json.dumps({"filters": [{
+            "name": "filename", "op": "like", "val": "%s-%%" % (prefix_)}],
+            "order_by": [{"field": "id", "direction": "asc"}]}))
+
+        def captions():
+            _response = self.client.get(url_)
+            return [object_["caption"] for object_ in
+                    json.loads(_response.data.decode())["objects"]]
+
+        self.assertEqual(captions(), [None, None])
+        with self.app.app_context():
+            rith.db.engine.execute(
+                "UPDATE file SET caption = 'unseen' WHERE id = %d" %
+                (ids_[0]))
+            self.assertEqual(captions(), [None, None])
+            File.query.get(ids_[1]).caption = "updated"
+            rith.db.session.commit()
+            self.assertEqual(captions(), ["unseen", "updated"])
+            rith.db.session.add(File(filename="%s-9" % (prefix_),
+                                     caption="inserted"))
+            rith.db.session.commit()
+            self.assertEqual(captions(), ["unseen", "updated", "inserted"])
+            rith.db.session.delete(File.query.get(ids_[0]))
+            rith.db.session.commit()
+            self.assertEqual(captions(), ["updated", "inserted"])
+
+    def test_cache_keyed_by_role(self):
+        from flask import request
+        cache_ = rith.cache.__class__()
+        cache_.register(rith.schema.role.Role, "role")
+        keys_ = []
+        for roles_ in [["editor", "admin"], ["editor"], None]:
+            with self.app.test_request_context("/v1/data/role?page=1"):
+                if roles_ is not None:
+                    request.oauth = SimpleNamespace(user=SimpleNamespace(
+                        roles=[rith.schema.role.Role(name=name_)
+                               for name_ in roles_]))
+                keys_.append(cache_.key())
+        self.assertEqual([key_[2] for key_ in keys_],
+                         ["admin,editor", "editor", "anonymous"])
+        cache_.set("role", keys_[0], b"admin", [])
+        self.assertIsNone(cache_.get("role", keys_[1]))
+        self.assertIsNone(cache_.get("role", keys_[2]))
+
+    def test_cache_bypass(self):
+        from flask import g
+        cache_ = rith.cache.__class__()
+        cache_.register(rith.schema.role.Role, "role")
+        lookup_ = cache_.preprocessors("role")["GET_MANY"][0]
+        with self.app.test_request_context("/v1/data/role"):
+            cache_.set("role", cache_.key(), b"cached", [])
+            g.cache_bypass = True
+            lookup_()
+            self.assertIsNone(getattr(g, "data_cache", None))
+            g.cache_bypass = False
+            with self.assertRaises(HTTPException) as raised_:
+                lookup_()
+            self.assertEqual(raised_.exception.response.get_data(),
+                             b"cached")
+
+    def test_includes_available_relationships(self):
+        relationships_ = rith.includes.available_relationships(
+            rith.schema.file.File, {"exclude_columns": ["created_by"]})
+        self.assertEqual(relationships_, ["last_modified_by"])
+
+    def test_includes_query_budget(self):
+        prefix_, ids_ = self.create_files("included", 3)
+        File = rith.schema.file.File
+        preprocessors_, postprocessors_ = rith.includes.processors(
+            File, {}, default=[])
+        manager_ = flask_restless.APIManager(flask_sqlalchemy_db=rith.db)
+        manager_.create_api(File, app=self.app, url_prefix="/included",
+                            preprocessors=preprocessors_,
+                            postprocessors=postprocessors_)
+        manager_.create_api(File, app=self.app, url_prefix="/lazy")
+        query_ = "q=%s" % (json.dumps({"filters": [{
+            "name": "filename", "op": "like", "val": "%s-%%" % (prefix_)}]}))
+        with rith.profiler.query_budget(2):
+            _response = self.client.get("/included/file?%s" % (query_))
+        objects_ = json.loads(_response.data.decode())["objects"]
+        self.assertEqual(len(objects_), 3)
+        self.assertNotIn("created_by", objects_[0])
+        with rith.profiler.query_budget(2):
+            _response = self.client.get(
+                "/included/file?include=created_by,last_modified_by&%s" %
+                (query_))
+        objects_ = json.loads(_response.data.decode())["objects"]
+        self.assertEqual(len(set([object_["created_by"]["email"]
+                                  for object_ in objects_])), 3)
+        with self.assertRaises(AssertionError):
+            with rith.profiler.query_budget(2):
+                self.client.get("/lazy/file?%s" % (query_))
+
+    def test_hooks_is_trivial(self):
+        endpoint_ = rith.endpoint.Endpoint
+        self.assertTrue(rith.hooks.is_trivial(
+            endpoint_.base_preprocessor_get_single))
+        self.assertFalse(rith.hooks.is_trivial(
+            rith.permissions.verify_roles))
+
+    def test_hooks_decorated_not_trivial(self):
+        def guarded(function):
+            @functools.wraps(function)
+            def guarded_hook(**kw):
+                raise PermissionError()
+            return guarded_hook
+
+        def hook(**kw):
+            pass
+
+        @guarded
+        def decorated_hook(**kw):
+            pass
+
+        self.assertTrue(rith.hooks.is_trivial(hook))
+        self.assertFalse(rith.hooks.is_trivial(decorated_hook))
+
+    def test_hooks_snapshot(self):
+        def hook(**kw):
+            time.sleep(0.001)
+
+        timed_ = rith.hooks.timed(hook)
+        timed_()
+        timed_()
+        statistics_ = rith.hooks.snapshot()["%s.%s" % (
+            hook.__module__, hook.__qualname__)]
+        self.assertEqual(statistics_["calls"], 2)
+        self.assertGreaterEqual(statistics_["slowest_seconds"], 0.001)
+        self.assertAlmostEqual(statistics_["mean_seconds"],
+                               statistics_["total_seconds"] / 2)
+
+    def test_hooks_system_view_requires_admin(self):
+        from rith.modules.core.views import core_hooks_get
+        admin_ = SimpleNamespace(id=1, roles=[
+            rith.schema.role.Role(name="admin")])
+        with self.app.test_request_context():
+            _response = core_hooks_get.__wrapped__(
+                SimpleNamespace(user=admin_))
+            self.assertEqual(_response.status_code, 200)
+            self.assertIn("hooks", json.loads(_response.data.decode()))
+            with self.assertRaises(HTTPException):
+                core_hooks_get.__wrapped__(SimpleNamespace(
+                    user=SimpleNamespace(id=2, roles=[])))
+
+    def test_governor_filter_fields(self):
+        fields_ = rith.governor.filter_fields([
+            {"name": "id", "op": "gt", "val": 1},
+            {"or": [{"name": "created_by__email", "op": "eq", "val": "a"}]}
+        ])
+        self.assertEqual(sorted(fields_), ["created_by", "id"])
+
+    def governed_api(self, **options):
+        governor_ = dict(rith.endpoint.Endpoint.__options__["query_governor"],
+                         **options)
+        with self.app.app_context():
+            rith.db.create_all()
+            flask_restless.APIManager(flask_sqlalchemy_db=rith.db)\
+                .create_api(rith.schema.file.File, app=self.app,
+                            url_prefix="/governed",
+                            preprocessors=rith.governor.preprocessors(
+                                rith.schema.file.File, **governor_))
+
+    def test_governor_default_allows_existing_filters(self):
+        self.governed_api()
+        _response = self.client.get("/governed/file", query_string={
+            "q": json.dumps({
+                "filters": [{"name": "filename", "op": "ilike",
+                             "val": "%a%"}],
+                "order_by": [{"field": "caption", "direction": "asc"}]
+            })
+        })
+        self.assertEqual(_response.status_code, 200)
+
+    def test_governor_restrict_columns_opt_in(self):
+        self.governed_api(restrict_columns=True)
+        _response = self.client.get("/governed/file", query_string={
+            "q": json.dumps({
+                "filters": [{"name": "filename", "op": "ilike",
+                             "val": "%a%"}]
+            })
+        })
+        self.assertEqual(_response.status_code, 400)
+
+    def test_scope_is_scoped(self):
+        self.assertTrue(rith.scope.is_scoped(rith.schema.file.File))
+        self.assertFalse(rith.scope.is_scoped(rith.schema.role.Role))
+
+    def test_updates_unchanged_fields(self):
+        file_ = rith.schema.file.File(filename="a.png", filetype="png")
+        fields_ = rith.updates.unchanged_fields(file_, {
+            "filename": "a.png", "filetype": "jpg", "created_by": None
+        })
+        self.assertEqual(fields_, ["filename"])
+
+    def stamp_preprocessor(self, instance_id=None, data=None, **kw):
+        data["modified_on"] = datetime.now().isoformat()
+        data["last_modified_by_id"] = None
+
+    def test_updates_skip_unchanged_patch(self):
+        _, ids_ = self.create_files("diffed", 1)
+        File = rith.schema.file.File
+        diffed_ = rith.updates.preprocessors(File)["PATCH_SINGLE"][0]
+        manager_ = flask_restless.APIManager(flask_sqlalchemy_db=rith.db)
+        manager_.create_api(File, app=self.app, url_prefix="/diffed",
+                            methods=["PATCH"],
+                            preprocessors={"PATCH_SINGLE": [diffed_]})
+        manager_.create_api(File, app=self.app, url_prefix="/stamped",
+                            methods=["PATCH"], preprocessors={
+                                "PATCH_SINGLE": [self.stamp_preprocessor,
+                                                 diffed_]})
+        statements_ = []
+
+        def record(conn, cursor, statement, parameters, context, many):
+            statements_.append(statement)
+
+        def patch(data, prefix="/stamped"):
+            del statements_[:]
+            _response = self.client.patch(
+                "%s/file/%d" % (prefix, ids_[0]), data=json.dumps(data),
+                content_type="application/json")
+            self.assertEqual(_response.status_code, 200)
+            with self.app.app_context():
+                return File.query.get(ids_[0]).modified_on
+
+        with self.app.app_context():
+            engine_ = rith.db.engine
+            filename_ = File.query.get(ids_[0]).filename
+            modified_on_ = File.query.get(ids_[0]).modified_on
+        sqlalchemy.event.listen(engine_, "before_cursor_execute", record)
+        try:
+            for prefix_ in ["/diffed", "/stamped"]:
+                self.assertEqual(patch({"filename": filename_}, prefix_),
+                                 modified_on_)
+                self.assertFalse([statement_ for statement_ in statements_
+                                  if statement_.startswith("UPDATE")])
+            self.assertNotEqual(patch({"caption": "changed"}), modified_on_)
+            self.assertTrue([statement_ for statement_ in statements_
+                             if statement_.startswith("UPDATE")])
+        finally:
+            sqlalchemy.event.remove(engine_, "before_cursor_execute", record)
+
+    def test_compression_compress_gzip(self):
+        data_ = b"{}" * 1024
+        compressed_ = rith.compression.compress(data_, "gzip")
+        self.assertEqual(gzip.decompress(compressed_), data_)
+        self.assertEqual(rith.compression.compress(data_, "gzip"),
+                         compressed_)
+
+    def test_encoder_isoformat(self):
+        encoded_ = rith.encoder.select_encoder()().encode({
+            "created_on": datetime(2019, 2, 2, 12, 30)
+        })
+        self.assertEqual(json.loads(encoded_),
+                         {"created_on": "2019-02-02T12:30:00"})
+
+    def test_upgrade_creates_missing_indexes(self):
+        with self.app.app_context():
+            rith.db.create_all()
+            with rith.db.engine.begin() as connection_:
+                connection_.execute("DROP INDEX ix_file_live_id")
+                statements_ = rith.upgrade.upgrade(connection_)
+                self.assertEqual(len(statements_), 1)
+                self.assertIn("ix_file_live_id", statements_[0])
+                self.assertIn("WHERE", statements_[0])
+                self.assertEqual(rith.upgrade.upgrade(connection_), [])
+
+    def test_upgrade_adds_search_vectors(self):
+        _, ids_ = self.create_files("upgrade-search", 1)
+        with self.app.app_context():
+            with rith.db.engine.begin() as connection_:
+                connection_.execute(
+                    "DROP TRIGGER file_search_vector_update ON file")
+                connection_.execute(
+                    "ALTER TABLE file DROP COLUMN search_vector")
+                statements_ = rith.upgrade.upgrade(connection_, False)
+                self.assertTrue(statements_[0].startswith(
+                    "ALTER TABLE file ADD COLUMN search_vector"))
+                rith.upgrade.upgrade(connection_)
+                self.assertEqual(rith.upgrade.upgrade(connection_), [])
+                self.assertIn("'upgrade-search'", connection_.execute(
+                    "SELECT search_vector::text FROM file WHERE id = %d" %
+                    (ids_[0])).scalar())
+
+    def test_upgrade_completes_existing_images(self):
+        with self.app.app_context():
+            rith.db.create_all()
+            with rith.db.engine.begin() as connection_:
+                connection_.execute("ALTER TABLE image DROP COLUMN status")
+                connection_.execute("ALTER TABLE image_job "
+                                    "DROP COLUMN not_before")
+                image_id_ = connection_.execute(
+                    "INSERT INTO image (filename) VALUES ('legacy.png') "
+                    "RETURNING id").scalar()
+                statements_ = rith.upgrade.upgrade(connection_)
+                self.assertIn("ALTER TABLE image_job ADD COLUMN not_before "
+                              "TIMESTAMP WITHOUT TIME ZONE", statements_)
+                self.assertEqual(connection_.execute(
+                    "SELECT status FROM image WHERE id = %d" %
+                    (image_id_)).scalar(), "complete")
+                self.assertEqual(rith.upgrade.upgrade(connection_), [])
+
+    def test_upgrade_command_prints_statements(self):
+        with self.app.app_context():
+            rith.db.create_all()
+            rith.db.engine.execute("DROP INDEX ix_file_live_id")
+        result_ = self.app.test_cli_runner().invoke(args=["upgrade", "--sql"])
+        self.assertIn("CREATE INDEX ix_file_live_id", result_.output)
+        self.app.test_cli_runner().invoke(args=["upgrade"])
+        self.assertEqual(self.app.test_cli_runner().invoke(
+            args=["upgrade", "--sql"]).output, "")
+
+    def test_pool_engine_options_pgbouncer(self):
+        options_ = rith.pool.engine_options({
+            "SQLALCHEMY_POOL_SIZE": 5,
+            "SQLALCHEMY_PGBOUNCER": True
+        })
+        self.assertIs(options_["poolclass"], rith.pool.MeteredNullPool)
+        self.assertNotIn("pool_size", options_)
+
+    def test_profiler_query_budget(self):
+        engine_ = sqlalchemy.create_engine("sqlite://")
+        with rith.profiler.query_budget(1) as profile_:
+            engine_.execute("SELECT 1")
+        self.assertEqual(profile_.count, 1)
+        with self.assertRaises(AssertionError):
+            with rith.profiler.query_budget(1):
+                engine_.execute("SELECT 1")
+                engine_.execute("SELECT 2")
+
+    def test_profiler_forgets_failed_statements(self):
+        engine_ = sqlalchemy.create_engine("sqlite://")
+        with engine_.connect() as connection_:
+            with self.assertRaises(sqlalchemy.exc.OperationalError):
+                connection_.execute("SELECT * FROM missing")
+            self.assertEqual(connection_.info["profiler_started"], [])
+
+    def test_slowlog_normalize_and_redact(self):
+        self.assertEqual(rith.slowlog.normalize(
+            "SELECT *\n  FROM file WHERE filename = 'a''b' AND id > 12"),
+            "SELECT * FROM file WHERE filename = ? AND id > ?")
+        self.assertEqual(rith.slowlog.redact({"id_1": 1, "email": "a@b.c"}),
+                         {"id_1": "int", "email": "str"})
+
+    def test_metrics_aggregate(self):
+        registry_ = rith.metrics.Registry()
+        registry_.start(["endpoint=a"])
+        registry_.finish(["endpoint=a"], 0.2, 200)
+        snapshot_ = registry_.snapshot()
+        aggregated_ = rith.metrics.aggregate([snapshot_, snapshot_])
+        self.assertEqual(aggregated_["series"]["endpoint=a"]["count"], 2)
+        self.assertIn('rith_requests_total{endpoint="a",status="200"} 2',
+                      rith.metrics.exposition(aggregated_))
+
+    def test_serializers_match_reflection(self):
+        file_ = rith.schema.file.File(filename="a.png",
+                                      created_on=datetime(2019, 2, 2))
+        self.assertEqual(rith.serializers.to_dict(file_),
+                         rith.serializers.reflected_to_dict(file_))
+
+    def test_query_parse(self):
+        from rith.modules.query.utilities import parse
+        selections_ = parse('query { f: file(limit: 2, filters: '
+                            '[{name: "id", op: "gt", val: 1}]) { id } }')
+        self.assertEqual(selections_[0]["name"], "file")
+        self.assertEqual(selections_[0]["alias"], "f")
+        self.assertEqual(selections_[0]["arguments"], {
+            "limit": 2, "filters": [{"name": "id", "op": "gt", "val": 1}]
+        })
+        self.assertEqual(selections_[0]["selections"][0]["name"], "id")
+
+    def test_query_parse_nesting_limit(self):
+        from rith.modules.query.utilities import parse, QueryError
+        with self.assertRaises(QueryError):
+            parse("{ file(filters: %s) { id } }" % ("[" * 5000))
+        with self.assertRaises(QueryError):
+            parse("{ file %s" % ("{ a " * 5000))
+
+    def query(self, document):
+        return self.client.post("/v1/query", data=json.dumps({
+            "query": document
+        }), content_type="application/json")
+
+    def locked_preprocessor(self, **kw):
+        from flask import abort
+        abort(403)
+
+    def test_query_authorized_by_collection(self):
+        self.app.config["QUERY_ENABLED"] = True
+        self.create_files("query-auth", 1)
+        self.register_collection("open_file", rith.schema.file.File)
+        self.register_collection("locked_file", rith.schema.file.File, {
+            "GET_MANY": [self.locked_preprocessor]
+        })
+        self.assertEqual(self.query(
+            "{ locked_file(limit: 1) { id } }").status_code, 403)
+        self.assertEqual(self.query(
+            "{ open_file(limit: 1) { id } }").status_code, 200)
+
+    def test_query_rejects_depth_and_cost(self):
+        self.app.config["QUERY_ENABLED"] = True
+        self.register_collection("open_file", rith.schema.file.File)
+        self.app.config["QUERY_MAX_DEPTH"] = 1
+        self.assertEqual(self.query(
+            "{ open_file(limit: 1) { created_by { id } } }").status_code, 400)
+        self.assertEqual(self.query(
+            "{ open_file %s" % ("{ id " * 5000)).status_code, 400)
+        self.app.config["QUERY_MAX_COST"] = 5
+        self.assertEqual(self.query(
+            "{ open_file(limit: 10) { id } }").status_code, 400)
+
+    def test_query_batches_relationships(self):
+        self.app.config["QUERY_ENABLED"] = True
+        self.register_collection("open_file", rith.schema.file.File)
+        prefix_, ids_ = self.create_files("query-batch", 3)
+        document_ = ('{ open_file(filters: [{name: "filename", op: "like",'
+                     ' val: "%s-%%"}]) { id created_by { id email } } }' %
+                     (prefix_))
+        with rith.profiler.query_budget(2):
+            _response = self.query(document_)
+        self.assertEqual(_response.status_code, 200)
+        data_ = json.loads(_response.data.decode())["data"]["open_file"]
+        self.assertEqual(sorted([file_["id"] for file_ in data_]), ids_)
+        self.assertEqual(len(set([file_["created_by"]["id"]
+                                  for file_ in data_])), 3)
+
+    def test_query_live_scope_and_timeout(self):
+        self.app.config["QUERY_ENABLED"] = True
+        options_ = {"live_scope": True,
+                    "query_governor": {"statement_timeout": 1234}}
+        self.register_collection("live_file", rith.schema.file.File,
+                                 options=options_)
+        self.register_collection("live_job", rith.schema.image_job.ImageJob,
+                                 options=options_)
+        prefix_, ids_ = self.create_files("query-live", 3)
+        with self.app.app_context():
+            File = rith.schema.file.File
+            File.query.get(ids_[1]).has_been_deleted = True
+            File.query.get(ids_[2]).has_been_archived = True
+            job_ = rith.schema.image_job.ImageJob(
+                image=rith.schema.image.Image(has_been_deleted=True))
+            rith.db.session.add(job_)
+            rith.db.session.commit()
+            job_id_ = job_.id
+        with mock.patch.object(rith.governor, "statement_timeout",
+                               wraps=rith.governor.statement_timeout) as \
+                timeout_:
+            _response = self.query(
+                '{ files: live_file(filters: [{name: "filename", op: "like",'
+                ' val: "%s-%%"}]) { id } deleted: live_file(id: %d) { id }'
+                ' job: live_job(id: %d) { id image { id } } }' %
+                (prefix_, ids_[1], job_id_))
+        self.assertEqual(_response.status_code, 200)
+        data_ = json.loads(_response.data.decode())["data"]
+        self.assertEqual(data_["files"], [{"id": ids_[0]}])
+        self.assertIsNone(data_["deleted"])
+        self.assertEqual(data_["job"], {"id": job_id_, "image": None})
+        timeout_.assert_called_with(1234)
+
+    def batch(self, requests, atomic=False):
+        from rith.modules.batch.views import batch_post
+        with self.app.app_context():
+            rith.db.create_all()
+        rith.cache.register(rith.schema.file.File, "staged_file")
+        flask_restless.APIManager(flask_sqlalchemy_db=rith.db).create_api(
+            rith.schema.file.File, app=self.app, url_prefix="/v1/staged",
+            methods=["GET", "POST"],
+            preprocessors=rith.cache.preprocessors("staged_file"))
+        with self.app.test_request_context("/v1/batch", method="POST",
+                                           data=json.dumps({
+                                               "requests": requests,
+                                               "atomic": atomic
+                                           }),
+                                           content_type="application/json"):
+            _response, _status = batch_post.__wrapped__(None)
+        return json.loads(_response.data.decode())
+
+    def staged_search(self, filename):
+        return "/v1/staged/file?q=%s" % (json.dumps({
+            "filters": [{"name": "filename", "op": "eq", "val": filename}]
+        }))
+
+    def test_batch_sub_responses_uncompressed(self):
+        self.create_files("batch-gzip", 10)
+        result_ = self.batch([{
+            "method": "GET", "path": "/v1/staged/file",
+            "headers": {"Accept-Encoding": "gzip"}
+        }])
+        response_ = result_["responses"][0]
+        self.assertEqual(response_["status"], 200)
+        self.assertNotIn("Content-Encoding", response_["headers"])
+        self.assertEqual(len(response_["body"]["objects"]), 10)
+
+    def test_batch_responses_in_order(self):
+        prefix_, ids_ = self.create_files("batch-order", 2)
+        result_ = self.batch([
+            {"method": "GET", "path": "/v1/staged/file/%d" % (ids_[0])},
+            {"method": "GET", "path": "/v1/staged/file/999999999"},
+            {"method": "GET", "path": "/v1/staged/file/%d" % (ids_[1])}
+        ])
+        responses_ = result_["responses"]
+        self.assertEqual([response_["status"] for response_ in responses_],
+                         [200, 404, 200])
+        self.assertEqual([responses_[0]["body"]["id"],
+                          responses_[2]["body"]["id"]], ids_)
+        self.assertNotIn("committed", result_)
+
+    def test_batch_atomic_commits(self):
+        filename_ = "batch-commit-%s" % (datetime.now().strftime("%H%M%S%f"))
+        result_ = self.batch([
+            {"method": "POST", "path": "/v1/staged/file",
+             "body": {"filename": filename_}},
+            {"method": "POST", "path": "/v1/staged/file",
+             "body": {"filename": filename_}}
+        ], atomic=True)
+        self.assertTrue(result_["committed"])
+        with self.app.app_context():
+            self.assertEqual(rith.schema.file.File.query.filter_by(
+                filename=filename_).count(), 2)
+
+    def test_batch_atomic_rolls_back(self):
+        filename_ = "batch-rollback-%s" % (
+            datetime.now().strftime("%H%M%S%f"))
+        result_ = self.batch([
+            {"method": "POST", "path": "/v1/staged/file",
+             "body": {"filename": filename_}},
+            {"method": "GET", "path": self.staged_search(filename_)},
+            {"method": "POST", "path": "/v1/staged/file",
+             "body": {"unknown": filename_}},
+            {"method": "GET", "path": self.staged_search(filename_)}
+        ], atomic=True)
+        self.assertFalse(result_["committed"])
+        self.assertEqual([response_["status"] for response_ in
+                          result_["responses"]], [201, 200, 400])
+        self.assertEqual(result_["responses"][1]["body"]["num_results"], 1)
+        with self.app.app_context():
+            self.assertEqual(rith.schema.file.File.query.filter_by(
+                filename=filename_).count(), 0)
+        _response = self.client.get(self.staged_search(filename_))
+        self.assertEqual(json.loads(_response.data.decode())["num_results"],
+                         0)
+
+    def test_replica_lag_statement_by_version(self):
+        self.assertIn("pg_last_xlog_replay_location",
+                      rith.replicas.lag_statement((9, 6, 3)))
+        self.assertIn("pg_last_wal_replay_lsn",
+                      rith.replicas.lag_statement((10, 4)))
+
+    def route(self, method, lag=0.0):
+        replica_ = sqlalchemy.create_engine("sqlite://")
+        self.app.extensions["replicas"] = rith.replicas.Replicas([replica_])
+        with mock.patch.object(rith.replicas.Replicas, "lag",
+                               return_value=lag):
+            with self.app.test_request_context(method=method):
+                rith.db.create_all()
+                return replica_, rith.db.session.get_bind()
+
+    def test_replica_routes_reads(self):
+        replica_, bind_ = self.route("GET")
+        self.assertIs(bind_, replica_)
+        replica_, bind_ = self.route("POST")
+        self.assertIsNot(bind_, replica_)
+
+    def test_replica_skipped_when_lagging(self):
+        replica_, bind_ = self.route("GET", lag=60.0)
+        self.assertIsNot(bind_, replica_)
+
+    def test_replica_skipped_by_changes(self):
+        self.register_collection("changed_file", rith.schema.file.File)
+        replicas_ = rith.replicas.Replicas([sqlalchemy.create_engine(
+            "sqlite://")])
+        self.app.extensions["replicas"] = replicas_
+        with self.app.app_context():
+            rith.db.create_all()
+        with mock.patch.object(replicas_, "select") as select_:
+            _response = self.client.get("/v1/changes/changed_file")
+        self.assertEqual(_response.status_code, 200)
+        select_.assert_not_called()
+
+    def test_replica_session_pinned_after_flush(self):
+        replica_ = sqlalchemy.create_engine("sqlite://")
+        self.app.extensions["replicas"] = rith.replicas.Replicas([replica_])
+        with self.app.test_request_context(method="GET"):
+            self.assertIs(rith.db.session.get_bind(), replica_)
+            rith.db.create_all()
+            rith.db.session.add(rith.schema.role.Role(
+                name="pinned-%s" % (datetime.now().strftime("%H%M%S%f"))))
+            rith.db.session.flush()
+            self.assertTrue(rith.db.session.info["pinned"])
+            self.assertIsNot(rith.db.session.get_bind(), replica_)
+            rith.db.session.rollback()
+
+    def test_search_prefix_query(self):
+        from rith.modules.search.utilities import prefix_query
+        self.assertEqual(prefix_query("Sun, bea"), "sun:* & bea:*")
+        self.assertEqual(prefix_query("beach_2019"), "beach:* & 2019:*")
+        self.assertIsNone(prefix_query(" &|!:* "))
+        self.assertIsNone(prefix_query(None))
+
+    def test_search_decode_cursor(self):
+        from rith.modules.search.utilities import decode_cursor
+        from rith.modules.search.utilities import encode_cursor
+        self.assertEqual(decode_cursor(encode_cursor(0.25, 7)), (0.25, 7))
+        for cursor_ in ["", "not a cursor", "bnVsbA==", "WzFd", "é"]:
+            self.assertIsNone(decode_cursor(cursor_))
+
+    def create_searchable_files(self, count):
+        stamp_ = "k%s" % (datetime.now().strftime("%H%M%S%f"))
+        with self.app.app_context():
+            rith.db.create_all()
+            files_ = [rith.schema.file.File(
+                filename="keyset %s file%d" % (stamp_, index_))
+                for index_ in range(count)]
+            rith.db.session.add_all(files_)
+            rith.db.session.commit()
+            return "keyset %s" % (stamp_), [file_.id for file_ in files_]
+
+    def test_search_keyset_cursor(self):
+        from rith.modules.search.utilities import decode_cursor
+        from rith.modules.search.utilities import prefix_query
+        from rith.modules.search.utilities import search
+        text_, ids_ = self.create_searchable_files(3)
+        with self.app.app_context():
+            first_, cursor_ = search(rith.schema.file.File,
+                                     prefix_query(text_), limit=2)
+            self.assertEqual([object_["id"] for object_ in first_],
+                             ids_[::-1][:2])
+            second_, last_ = search(rith.schema.file.File,
+                                    prefix_query(text_), limit=2,
+                                    cursor=decode_cursor(cursor_))
+            self.assertEqual([object_["id"] for object_ in second_],
+                             ids_[:1])
+            self.assertIsNone(last_)
+
+    def test_search_authorized_by_collection(self):
+        text_, ids_ = self.create_searchable_files(1)
+        _response = self.client.get("/v1/search/file",
+                                    query_string={"q": text_})
+        self.assertEqual(_response.status_code, 403)
+        self.register_collection("file", rith.schema.file.File)
+        _response = self.client.get("/v1/search/file",
+                                    query_string={"q": text_})
+        self.assertEqual(_response.status_code, 200)
+        self.assertEqual(json.loads(_response.data.decode())["objects"][0][
+            "id"], ids_[0])
+
+    def aggregate(self, collection, **arguments):
+        _response = self.client.get("/v1/aggregate/%s" % (collection),
+                                    query_string=arguments)
+        return _response.status_code, json.loads(_response.data.decode())
+
+    def test_aggregate_authorized_by_collection(self):
+        self.register_collection("locked_file", rith.schema.file.File, {
+            "GET_MANY": [self.locked_preprocessor]
+        })
+        self.assertEqual(self.aggregate("file")[0], 403)
+        self.assertEqual(self.aggregate("locked_file")[0], 403)
+
+    def test_aggregate_rejects_fields(self):
+        self.register_collection("open_file", rith.schema.file.File)
+        for arguments_ in [{"group_by": "filename"},
+                           {"group_by": "unknown"},
+                           {"group_by": "filetype:month"},
+                           {"aggregate": "max:filename"},
+                           {"aggregate": "median:filesize"},
+                           {"q": json.dumps({"filters": [
+                               {"name": "caption", "op": "eq", "val": "a"}
+                           ]})}]:
+            self.assertEqual(self.aggregate("open_file", **arguments_)[0],
+                             400, arguments_)
+
+    def test_aggregate_results(self):
+        stamp_ = datetime.now().strftime("%H%M%S%f")
+        with self.app.app_context():
+            rith.db.create_all()
+            rith.db.session.add_all([rith.schema.file.File(
+                filename="aggregate", filetype="agg/%s-%s" % (stamp_, type_))
+                for type_ in ["a", "a", "b"]])
+            rith.db.session.commit()
+        self.register_collection("open_file", rith.schema.file.File, options={
+            "query_governor": {"statement_timeout": 1000}
+        })
+        with mock.patch.object(rith.governor, "statement_timeout",
+                               wraps=rith.governor.statement_timeout) as \
+                timeout_:
+            status_, result_ = self.aggregate(
+                "open_file", group_by="filetype", q=json.dumps({"filters": [
+                    {"name": "filetype", "op": "like",
+                     "val": "agg/%s-%%" % (stamp_)}
+                ]}))
+        self.assertEqual(status_, 200)
+        self.assertEqual(result_["objects"], [
+            {"filetype": "agg/%s-a" % (stamp_), "count": 2},
+            {"filetype": "agg/%s-b" % (stamp_), "count": 1}
+        ])
+        timeout_.assert_called_once_with(1000)
+
+    def test_changes_cursor(self):
+        from rith.modules.changes.utilities import decode_cursor
+        from rith.modules.changes.utilities import encode_cursor
+        for modified_on_ in [datetime(2019, 2, 2, 10, 30, 15, 120),
+                             datetime(2019, 2, 2, 10, 30, 15)]:
+            self.assertEqual(decode_cursor(encode_cursor(modified_on_, 7)),
+                             (modified_on_, 7))
+        for cursor_ in ["", "not a cursor", "WyJ5ZXN0ZXJkYXkiLCAxXQ=="]:
+            self.assertIsNone(decode_cursor(cursor_))
+
+    def test_changes_feed(self):
+        from rith.modules.changes.utilities import changes
+        from rith.modules.changes.utilities import decode_cursor
+        base_ = datetime.now() - timedelta(hours=1)
+        with self.app.app_context():
+            rith.db.create_all()
+            files_ = [rith.schema.file.File(filename="changes",
+                                            modified_on=modified_on_,
+                                            has_been_deleted=deleted_)
+                      for modified_on_, deleted_ in [
+                          (base_, False), (base_, False),
+                          (base_ + timedelta(seconds=1), True),
+                          (datetime.now(), False)]]
+            rith.db.session.add_all(files_)
+            rith.db.session.commit()
+            ids_ = [file_.id for file_ in files_]
+
+            first_ = changes(rith.schema.file.File,
+                             (base_ - timedelta(microseconds=1), 0), 2)
+            self.assertEqual([object_["id"] for object_ in
+                              first_["objects"]], ids_[:2])
+            self.assertTrue(first_["has_more"])
+
+            second_ = changes(rith.schema.file.File,
+                              decode_cursor(first_["next_cursor"]), 1)
+            self.assertEqual(second_["objects"], [])
+            self.assertEqual(second_["tombstones"], [{
+                "id": ids_[2],
+                "modified_on": (base_ + timedelta(seconds=1)).isoformat()
+            }])
+
+            rest_ = changes(rith.schema.file.File,
+                            decode_cursor(second_["next_cursor"]), 10000)
+            self.assertNotIn(ids_[3], [object_["id"] for object_ in
+                                       rest_["objects"]])
+
+    def counted_search(self, cap=None):
+        stamp_ = datetime.now().strftime("%H%M%S%f")
+        with self.app.app_context():
+            rith.db.create_all()
+            rith.db.session.add_all([rith.schema.file.File(
+                filename="counted", filetype="count/%s" % (stamp_))
+                for _ in range(3)])
+            rith.db.session.commit()
+        preprocessors_, postprocessors_ = \
+            rith.pagination.processors(rith.schema.file.File, cap) \
+            if cap is not None else ({}, {})
+        flask_restless.APIManager(flask_sqlalchemy_db=rith.db).create_api(
+            rith.schema.file.File, app=self.app, url_prefix="/counted",
+            preprocessors=preprocessors_, postprocessors=postprocessors_)
+        _response = self.client.get("/counted/file", query_string={
+            "q": json.dumps({"filters": [{"name": "filetype", "op": "eq",
+                                          "val": "count/%s" % (stamp_)}]})
+        })
+        return json.loads(_response.data.decode())
+
+    def test_pagination_exact_without_option(self):
+        result_ = self.counted_search()
+        self.assertEqual(result_["num_results"], 3)
+        self.assertNotIn("num_results_approximate", result_)
+
+    def test_pagination_exact_below_cap(self):
+        result_ = self.counted_search(cap=5)
+        self.assertEqual(result_["num_results"], 3)
+        self.assertFalse(result_["num_results_approximate"])
+
+    def test_pagination_approximate_above_cap(self):
+        result_ = self.counted_search(cap=2)
+        self.assertEqual(result_["num_results"], 2)
+        self.assertTrue(result_["num_results_approximate"])
+
+    def test_conditional_etag_revalidation(self):
+        prefix_, ids_ = self.create_files("etag", 2)
+        File = rith.schema.file.File
+        flask_restless.APIManager(flask_sqlalchemy_db=rith.db).create_api(
+            File, app=self.app, url_prefix="/conditional",
+            preprocessors=rith.conditional.preprocessors(File))
+        many_ = "/conditional/file?q=%s" % (json.dumps({"filters": [{
+            "name": "filename", "op": "like", "val": "%s-%%" % (prefix_)}]}))
+        single_ = "/conditional/file/%d" % (ids_[0])
+        etags_ = {}
+        for url_ in [many_, single_]:
+            _response = self.client.get(url_)
+            self.assertEqual(_response.status_code, 200)
+            etag_ = _response.headers["ETag"]
+            self.assertTrue(etag_.startswith('W/"'))
+            _response = self.client.get(url_, headers={
+                "If-None-Match": etag_})
+            self.assertEqual(_response.status_code, 304)
+            self.assertEqual(_response.headers["ETag"], etag_)
+            etags_[url_] = etag_
+        with self.app.app_context():
+            File.query.get(ids_[0]).caption = "revised"
+            rith.db.session.commit()
+        for url_ in [many_, single_]:
+            _response = self.client.get(url_, headers={
+                "If-None-Match": etags_[url_]})
+            self.assertEqual(_response.status_code, 200)
+            self.assertNotEqual(_response.headers["ETag"], etags_[url_])
+
+    def test_conditional_approximate_count_is_bounded(self):
+        prefix_, ids_ = self.create_files("etag-count", 3)
+        File = rith.schema.file.File
+        preprocessors_, postprocessors_ = rith.pagination.processors(File, 2)
+        preprocessors_["GET_MANY"] = rith.conditional.preprocessors(
+            File, 2)["GET_MANY"] + preprocessors_["GET_MANY"]
+        flask_restless.APIManager(flask_sqlalchemy_db=rith.db).create_api(
+            File, app=self.app, url_prefix="/tagged",
+            exclude_columns=["created_by", "last_modified_by"],
+            preprocessors=preprocessors_, postprocessors=postprocessors_)
+        statements_ = []
+
+        def record(conn, cursor, statement, parameters, context, many):
+            statements_.append(" ".join(statement.split()))
+
+        with self.app.app_context():
+            engine_ = rith.db.engine
+        sqlalchemy.event.listen(engine_, "before_cursor_execute", record)
+        try:
+            with rith.profiler.query_budget(3):
+                _response = self.client.get("/tagged/file", query_string={
+                    "q": json.dumps({"filters": [{
+                        "name": "filename", "op": "like",
+                        "val": "%s-%%" % (prefix_)}]})
+                })
+        finally:
+            sqlalchemy.event.remove(engine_, "before_cursor_execute", record)
+        self.assertEqual(_response.status_code, 200)
+        self.assertTrue(_response.headers["ETag"])
+        self.assertEqual(json.loads(_response.data.decode())["num_results"],
+                         2)
+        counts_ = [statement_ for statement_ in statements_
+                   if "count(" in statement_.lower()]
+        self.assertEqual(len(counts_), 2)
+        for statement_ in counts_:
+            self.assertIn("LIMIT", statement_)
+
+    def test_search_image(self):
+        stamp_ = "k%s" % (datetime.now().strftime("%H%M%S%f"))
+        with self.app.app_context():
+            rith.db.create_all()
+            image_ = rith.schema.image.Image(filename="photo %s" % (stamp_),
+                                             status="complete")
+            rith.db.session.add(image_)
+            rith.db.session.commit()
+            image_id_ = image_.id
+        _response = self.client.get("/v1/search/image",
+                                    query_string={"q": stamp_})
+        self.assertEqual(_response.status_code, 403)
+        self.register_collection("image", rith.schema.image.Image)
+        _response = self.client.get("/v1/search/image",
+                                    query_string={"q": stamp_})
+        self.assertEqual(_response.status_code, 200)
+        objects_ = json.loads(_response.data.decode())["objects"]
+        self.assertEqual([object_["id"] for object_ in objects_],
+                         [image_id_])
+        self.assertNotIn("search_vector", objects_[0])
+
+    def test_events_dispatch(self):
+        listener_ = rith.events.Listener("postgresql://")
+        subscription_ = rith.events.Subscription(["file"])
+        listener_.subscriptions.add(subscription_)
+        for table_ in ["file", "user"]:
+            listener_.dispatch(json.dumps({
+                "table": table_, "operation": "update", "ids": [1]
+            }))
+        self.assertEqual(subscription_.events.get_nowait()["table"], "file")
+        self.assertTrue(subscription_.events.empty())
+
+    def test_media_cascade(self):
+        from rith.modules.media.utilities import cascade
+        image_ = FakeImage()
+        filenames_ = cascade(image_, "a", ".jpg", "/tmp")
+        self.assertEqual(filenames_["icon"], "a_icon.jpg")
+        self.assertEqual(image_.operations, [
+            ("crop", 500, 0, 3000), ("resize", 3000, 1280),
+            ("resize", 1280, 640), ("resize", 640, 512),
+            ("resize", 512, 256), ("resize", 256, 128), ("resize", 128, 64)
+        ])
+
+    def test_media_icc_profile_only_for_rgb(self):
+        from rith.modules.media.utilities import parallel_cascade
+        for colorspace_, profile_ in [("srgb", b"profile"), ("cmyk", None)]:
+            executor_, image_ = mock.Mock(), FakeImage(colorspace_)
+            parallel_cascade((executor_, None), image_, "a", ".jpg", "/tmp",
+                             time.monotonic() + 30)
+            self.assertEqual(set([call_[0][4] for call_ in
+                                  executor_.submit.call_args_list]),
+                             set([profile_]))
+            self.assertEqual(image_.colorspace, "srgb")
+        self.assertIn(("colorspace", "srgb"), image_.operations)
+
+    def test_media_pool_timeout_waits_for_workers(self):
+        from rith.modules.media import utilities
+        directory_ = tempfile.mkdtemp()
+        os.mkdir(os.path.join(directory_, "images"))
+        self.app.config.update(MEDIA_TIMEOUT=0.05, MEDIA_BASE_PATH="/",
+                               MEDIA_DIRECTORY=directory_)
+        executor_ = ThreadPoolExecutor(2)
+        semaphore_ = threading.BoundedSemaphore(1)
+        encoding_ = threading.Event()
+
+        def encode(blob, width, height, profile, filepath):
+            encoding_.wait(5)
+            open(filepath, "w").close()
+
+        with self.app.app_context(), \
+                mock.patch.object(utilities, "Image",
+                                  lambda file: FakeImage()), \
+                mock.patch.object(utilities, "encode", encode), \
+                mock.patch.object(utilities, "worker_pool",
+                                  lambda: (executor_, semaphore_)):
+            with self.assertRaises(HTTPException) as raised_:
+                utilities.upload_image(FileStorage(
+                    stream=io.BytesIO(b"image"), filename="upload.jpg"))
+        self.assertEqual(raised_.exception.code, 503)
+        self.assertFalse(semaphore_.acquire(blocking=False))
+        encoding_.set()
+        executor_.shutdown(wait=True)
+        self.assertTrue(semaphore_.acquire(blocking=False))
+        self.assertEqual(os.listdir(os.path.join(directory_, "images")), [])
+
+    def test_media_serial_upload_timeout(self):
+        from rith.modules.media import utilities
+        self.app.config.update(MEDIA_TIMEOUT=-1, MEDIA_BASE_PATH="/",
+                               MEDIA_DIRECTORY=tempfile.mkdtemp())
+        with self.app.app_context(), mock.patch.object(
+                utilities, "Image", lambda file: FakeImage()):
+            with self.assertRaises(HTTPException) as raised_:
+                utilities.upload_image(FileStorage(
+                    stream=io.BytesIO(b"image"), filename="upload.jpg"))
+        self.assertEqual(raised_.exception.code, 503)
+
+    def test_media_worker_pool_disabled(self):
+        from rith.modules.media.utilities import worker_pool
+        with self.app.app_context():
+            self.assertIsNone(worker_pool())
+
+    def test_media_prefers_async(self):
+        from rith.modules.media.views import prefers_async
+        headers_ = {"Prefer": "return=minimal, respond-async"}
+        with self.app.test_request_context(headers=headers_):
+            self.assertFalse(prefers_async())
+            self.app.config["MEDIA_ASYNC"] = True
+            self.assertTrue(prefers_async())
+
+    def enqueue_image_job(self):
+        from rith.modules.media import jobs
+        self.app.config["MEDIA_DIRECTORY"] = tempfile.mkdtemp()
+        rith.db.create_all()
+        user_ = rith.schema.user.User(
+            email="media-%s@rith.io" % datetime.now().strftime("%H%M%S%f"))
+        rith.db.session.add(user_)
+        rith.db.session.commit()
+        return user_, jobs.enqueue(FileStorage(
+            stream=io.BytesIO(b"image"), filename="upload.png",
+            content_type="image/png"), user_)
+
+    def test_media_job_retries_then_fails(self):
+        from rith.modules.media import jobs
+        from rith.modules.media.views import job_get
+        with self.app.test_request_context():
+            user_, job_ = self.enqueue_image_job()
+            with mock.patch.object(jobs, "upload_image",
+                                   side_effect=IOError("corrupt upload")):
+                for attempt_ in range(1, jobs.MAX_ATTEMPTS + 1):
+                    self.assertEqual(jobs.claim().id, job_.id)
+                    self.assertEqual(job_.attempts, attempt_)
+                    jobs.process(job_)
+                    if attempt_ < jobs.MAX_ATTEMPTS:
+                        self.assertEqual(job_.status, "pending")
+                        self.assertGreater(job_.not_before, datetime.now())
+                        self.assertIsNone(jobs.claim())
+                        job_.not_before = datetime.now()
+                        rith.db.session.commit()
+            _response, _status = job_get.__wrapped__(
+                SimpleNamespace(user=user_), job_.id)
+            status_ = json.loads(_response.data.decode())
+            self.assertEqual(status_["status"], "failed")
+            self.assertEqual(status_["error"], "corrupt upload")
+            self.assertEqual(status_["image"]["status"], "failed")
+
+    def test_media_job_completes(self):
+        from rith.modules.media import jobs
+        with self.app.test_request_context():
+            user_, job_ = self.enqueue_image_job()
+            with mock.patch.object(jobs, "upload_image", return_value={
+                    "original": "https://example.com/upload.png"}):
+                jobs.process(jobs.claim())
+            self.assertEqual(job_.status, "complete")
+            self.assertEqual(job_.image.status, "complete")
+            self.assertEqual(job_.image.original,
+                             "https://example.com/upload.png")
+
+    def test_media_job_abandoned_fails(self):
+        from rith.modules.media import jobs
+        with self.app.test_request_context():
+            user_, job_ = self.enqueue_image_job()
+            job_.status = "processing"
+            job_.attempts = jobs.MAX_ATTEMPTS
+            job_.started_on = datetime.now() - timedelta(
+                seconds=jobs.STALE_SECONDS + 1)
+            rith.db.session.commit()
+            self.assertIsNone(jobs.claim())
+            self.assertEqual(job_.status, "failed")
+            self.assertEqual(job_.image.status, "failed")
+
 
     """System-specific unit tests."""
     def test_schema_file(self):